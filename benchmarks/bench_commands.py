@@ -0,0 +1,346 @@
+"""
+Drive the real commands and views offline and measure them.
+
+Every scenario calls the command functions with fake contexts,
+interactions and messages (see benchmarks.fakes). It runs in a scratch
+directory filled with synthetic savefiles for the given number of
+servers and characters per server.
+Reports throughput, p50/p99 latency and allocations per operation, and
+writes them as JSON. That file can be compared against a later run.
+
+Run from the repository root:
+    python -m benchmarks.bench_commands --guilds 10 --characters 200 --output before.json
+    python -m benchmarks.bench_commands --compare before.json
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+import zlib
+from benchmarks.fakes import FakeBot, FakeContext, FakeGuild, FakeInteraction, FakeUser, click
+from commands.characters import Characters
+from commands.dice import Dice
+from components.lvl_buttons import MyView
+from services.character_index import characters, saves_dir, SAVE_SUFFIX
+from services.edit_queue import edit_queue
+
+
+FIELDNAMES = ["Name", "Race", "Class", "Attribute", "Value", "Modifier", "CreatorID", "Level", "Health"]
+ATTRIBUTES = ["Strength", "Dexterity", "Intelligence", "Constitution", "Charisma", "Wisdom"]
+CLASSES = ["Barbarian", "Fighter", "Wizard", "Rogue", "Cleric", "Bard"]
+
+
+def write_character(server_id, name, creator_id, level=1):
+    """Write the savefile of a synthetic character."""
+    directory = saves_dir(server_id)
+    os.makedirs(directory, exist_ok=True)
+    # A stable hash, so every run and process gives a character the same class
+    dndclass = CLASSES[zlib.crc32(name.encode()) % len(CLASSES)]
+    with open(os.path.join(directory, f"{name}{SAVE_SUFFIX}"), "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for index, attribute in enumerate(ATTRIBUTES):
+            value = 8 + (index * 3 + len(name)) % 10
+            writer.writerow(
+                {
+                    "Name": name,
+                    "Race": "Elf",
+                    "Class": dndclass,
+                    "Attribute": attribute,
+                    "Value": value,
+                    "Modifier": (value - 10) // 2,
+                    "CreatorID": creator_id,
+                    "Level": level,
+                    "Health": 10,
+                }
+            )
+
+
+class Harness:
+    """The fake bot, servers and users the scenarios run against."""
+
+    def __init__(self, guilds, characters_per_guild, workers):
+        self.bot = FakeBot(workers=workers)
+        self.dice = Dice(self.bot)
+        self.characters = Characters(self.bot)
+        self.user = FakeUser(administrator=True)
+        self.guilds = [FakeGuild(guild_id) for guild_id in range(1, guilds + 1)]
+        self.characters_per_guild = characters_per_guild
+        self._names = 0
+
+    def populate(self):
+        """
+        Write the savefiles of every server and load the character indexes.
+
+        Called before every scenario, so characters created, leveled or
+        deleted by one scenario don't change the next one.
+        """
+        for guild in self.guilds:
+            shutil.rmtree(saves_dir(guild.id), ignore_errors=True)
+            characters.forget(guild.id)
+            for index in range(self.characters_per_guild):
+                write_character(guild.id, f"char{index}", self.user.id)
+        characters.warm(guild.id for guild in self.guilds)
+
+    def context(self, iteration):
+        """A fresh command context, the servers take turns."""
+        return FakeContext(self.bot, self.guilds[iteration % len(self.guilds)], self.user)
+
+    def check(self):
+        """
+        Make sure the last runs didn't end in an error message, and forget what was sent.
+
+        Raises:
+            RuntimeError: If a command answered with an error.
+        """
+        for guild in self.guilds:
+            for message in guild.channel.sent:
+                if isinstance(message.content, str) and message.content.startswith("An error occurred"):
+                    raise RuntimeError(message.content)
+            guild.channel.sent.clear()
+
+    def new_name(self):
+        """A character name no server has yet."""
+        self._names += 1
+        return f"bench{self._names}"
+
+
+async def scenario_roll(harness, iteration):
+    ctx = harness.context(iteration)
+    await harness.dice.norm_roll.callback(harness.dice, ctx, roll_input="4d6+2")
+
+
+async def scenario_roll_many(harness, iteration):
+    ctx = harness.context(iteration)
+    await harness.dice.norm_roll.callback(harness.dice, ctx, roll_input="100000d20")
+
+
+async def scenario_random(harness, iteration):
+    ctx = harness.context(iteration)
+    await harness.dice.random.callback(harness.dice, ctx, number="1-100 x10")
+
+
+async def scenario_roll_char(harness, iteration):
+    """/roll_char, then a race, a class and keeping the stats: RCView, CLView and YView."""
+    ctx = harness.context(iteration)
+    await harness.characters.roll.callback(harness.characters, ctx, "4d6", harness.new_name())
+    message = ctx.last_message
+    await click(message.view, "Elf", harness.user, message)
+    await click(message.view, "Wizard", harness.user, message)
+    await click(message.view, "nbutton", harness.user, message)
+
+
+async def scenario_lvl(harness, iteration):
+    """/lvl taking the average, spending both points in MyView if there is an ASI."""
+    ctx = harness.context(iteration)
+    name = f"char{iteration % harness.characters_per_guild}"
+
+    async def take_average():
+        return FakeInteraction(harness.user, ctx.last_message, "avgroll")
+
+    harness.bot.expect(take_average)
+    await harness.characters.lvl.callback(harness.characters, ctx, name=name)
+    message = ctx.last_message
+    if isinstance(message.view, MyView):
+        await click(message.view, "Strength", harness.user, message)
+        await click(message.view, "Wisdom", harness.user, message)
+
+
+async def scenario_showall(harness, iteration):
+    ctx = harness.context(iteration)
+    await harness.characters.showall.callback(harness.characters, ctx)
+
+
+async def scenario_rm(harness, iteration):
+    """/rm of a fresh character, confirming with the Yes button."""
+    ctx = harness.context(iteration)
+    name = harness.new_name()
+    write_character(ctx.guild.id, name, harness.user.id)
+    characters.add(ctx.guild.id, name)
+
+    async def confirm():
+        message = ctx.last_message
+        return await click(message.view, "ybutton", harness.user, message)
+
+    harness.bot.expect(confirm)
+    await harness.characters.rm.callback(harness.characters, ctx, name=name)
+
+
+SCENARIOS = {
+    "roll": scenario_roll,
+    "roll_many": scenario_roll_many,
+    "random": scenario_random,
+    "roll_char": scenario_roll_char,
+    "lvl": scenario_lvl,
+    "showall": scenario_showall,
+    "rm": scenario_rm,
+}
+
+
+def percentile(samples, fraction):
+    """The value below which `fraction` of the sorted samples lie."""
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+async def measure(harness, scenario, iterations, alloc_iterations):
+    """
+    Run a scenario and measure it.
+
+    Returns:
+        dict: Throughput, latency percentiles in microseconds and allocations per operation.
+    """
+    for iteration in range(min(20, iterations)):
+        await scenario(harness, iteration)
+        harness.check()
+    samples = []
+    for iteration in range(iterations):
+        before = time.perf_counter()
+        await scenario(harness, iteration)
+        samples.append(time.perf_counter() - before)
+        harness.check()
+    elapsed = sum(samples)
+    samples.sort()
+
+    tracemalloc.start()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    for iteration in range(alloc_iterations):
+        await scenario(harness, iteration)
+        harness.check()
+    _, peak = tracemalloc.get_traced_memory()
+    blocks = sum(
+        stat.count_diff
+        for stat in tracemalloc.take_snapshot().compare_to(snapshot, "lineno")
+        if stat.count_diff > 0
+    )
+    tracemalloc.stop()
+    return {
+        "iterations": iterations,
+        "ops_per_s": round(iterations / elapsed, 1),
+        "p50_us": round(percentile(samples, 0.5) * 1e6, 1),
+        "p99_us": round(percentile(samples, 0.99) * 1e6, 1),
+        "mean_us": round(statistics.fmean(samples) * 1e6, 1),
+        "retained_blocks_per_op": round(blocks / max(1, alloc_iterations), 1),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+async def run(guilds, characters_per_guild, iterations, selected, workers):
+    """
+    Run the selected scenarios in a scratch directory.
+
+    Returns:
+        dict: The settings and the results of every scenario.
+    """
+    harness = Harness(guilds, characters_per_guild, workers)
+    if any(name == "roll_many" for name in selected):
+        harness.bot.worker_pool.start()
+    results = {}
+    try:
+        for name in selected:
+            harness.populate()
+            results[name] = await measure(
+                harness, SCENARIOS[name], iterations, max(1, iterations // 10)
+            )
+            # Queued edits only wait for their rate limit, drop them between scenarios
+            for message_id in list(edit_queue._pending):
+                edit_queue.supersede(message_id)
+    finally:
+        harness.bot.worker_pool.shutdown()
+        for guild in harness.guilds:
+            characters.forget(guild.id)
+    return {
+        "settings": {
+            "guilds": guilds,
+            "characters": characters_per_guild,
+            "iterations": iterations,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, tolerance):
+    """
+    Print the change of every scenario against a baseline.
+
+    Returns:
+        bool: True if no scenario's p50 got slower by more than the tolerance.
+    """
+    ok = True
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        change = result["p50_us"] / before["p50_us"] - 1 if before["p50_us"] else 0.0
+        regressed = change > tolerance
+        ok = ok and not regressed
+        print(
+            f"{name:<12} p50 {before['p50_us']:>10.1f} -> {result['p50_us']:>10.1f} us "
+            f"({change:+.0%}){'  REGRESSION' if regressed else ''}"
+        )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the commands offline.")
+    parser.add_argument("--guilds", type=int, default=5)
+    parser.add_argument("--characters", type=int, default=100, help="characters per server")
+    parser.add_argument("--iterations", type=int, default=200, help="runs per scenario")
+    parser.add_argument("--workers", type=int, default=2, help="worker processes for large rolls")
+    parser.add_argument(
+        "--scenarios", default=",".join(SCENARIOS), help="comma separated, default all"
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare the p50 latencies with this JSON file")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="slowdown of p50 counted as a regression"
+    )
+    args = parser.parse_args()
+    selected = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    # The commands read and write relative to the working directory
+    scratch = tempfile.mkdtemp(prefix="dicebot-bench-")
+    cwd = os.getcwd()
+    os.chdir(scratch)
+    try:
+        report = asyncio.run(
+            run(args.guilds, args.characters, args.iterations, selected, args.workers)
+        )
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    print(f"{'scenario':<12} {'ops/s':>10} {'p50 us':>10} {'p99 us':>10} {'blocks/op':>10} {'peak KiB':>10}")
+    for name, result in report["results"].items():
+        print(
+            f"{name:<12} {result['ops_per_s']:>10.1f} {result['p50_us']:>10.1f} "
+            f"{result['p99_us']:>10.1f} {result['retained_blocks_per_op']:>10.1f} {result['peak_kib']:>10.1f}"
+        )
+    if output:
+        with open(output, "w") as file:
+            json.dump(report, file, indent=2)
+    if baseline_path:
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+        if not compare(baseline, report, args.tolerance):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Measure CPU time and allocations of building the creation flow's views.
+
+Compares building every button through its constructor, as the views did
+before, with copying the prebuilt layouts. Also compares building the help
+embed with sending the cached one.
+
+Run from the repository root:
+    python -m benchmarks.bench_layouts
+"""
+
+import asyncio
+import time
+import tracemalloc
+import types
+from commands.help import CustomHelpCommand
+from components.classbuttons import CLASS_LAYOUT, CLView
+from components.lvl_buttons import STAT_LAYOUT, MyView
+from components.racebuttons import RACE_LAYOUT, RCView
+from components.yn_buttons import YView
+from services.sessions import SessionStore
+
+
+def build_by_constructor(view, layout, **attrs):
+    """Add the buttons of a layout the old way, calling each button's constructor."""
+    for template in layout.templates:
+        button = template.cls.__new__(template.cls)
+        if template.cls is MyView.StatButton:
+            button.__init__(template.attrs["stat_name"], template.attrs["stat_name"], 2, view, None)
+        elif template.cls is CLView.ClassButton:
+            button.__init__(template.attrs["dndclass"], template.attrs["dndclass"], view)
+        else:
+            button.__init__(template.attrs["race"], template.attrs["race"], view)
+        button.__dict__.update(attrs)
+        view.add_item(button)
+
+
+def build_from_layout(view, layout, **attrs):
+    """Add the buttons of a layout by copying the templates."""
+    layout.add_to(view, **attrs)
+
+
+def make_flow(build):
+    """Create a function that builds all views of one character creation."""
+    store = SessionStore(ttl=3600, max_per_user=10**9)
+    ctx = types.SimpleNamespace(
+        guild=types.SimpleNamespace(id=1), author=types.SimpleNamespace(id=2)
+    )
+
+    def flow():
+        session = store.start(ctx, "bob", 4, 6)
+        build(RCView(session), RACE_LAYOUT)
+        build(CLView(session), CLASS_LAYOUT)
+        YView(session)
+        build(MyView(ctx, "bob", None), STAT_LAYOUT, max_clicks=2, stats_content="")
+        store.complete(session)
+
+    return flow
+
+
+def measure(func, number):
+    """
+    Time a function and count the memory blocks one call allocates.
+
+    Returns:
+        tuple: Microseconds per call and blocks allocated per call.
+    """
+    for _ in range(100):
+        func()
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    micros = (time.perf_counter() - start) / number * 1e6
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    func()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(
+        stat.count_diff for stat in after.compare_to(before, "lineno") if stat.count_diff > 0
+    )
+    return micros, blocks
+
+
+async def main(number=2000):
+    """
+    Print the cost of one creation flow and one /help before and after.
+
+    Args:
+        number (int): Number of calls per measurement.
+    """
+    help_command = CustomHelpCommand(types.SimpleNamespace(cogs={}))
+    await help_command.send_bot_help(None, None)
+    results = [
+        ("creation flow, constructors", measure(make_flow(build_by_constructor), number)),
+        ("creation flow, layouts", measure(make_flow(build_from_layout), number)),
+        ("help embed, built", measure(help_command.build_embed, number)),
+        (
+            "help embed, cached",
+            measure(lambda: help_command.send_bot_help(None, None).close(), number),
+        ),
+    ]
+    for name, (micros, blocks) in results:
+        print(f"{name:<30} {micros:9.1f} us  {blocks:5d} allocated blocks")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
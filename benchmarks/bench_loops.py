@@ -0,0 +1,159 @@
+"""
+Command dispatch throughput on the asyncio and the uvloop event loop.
+
+A fake gateway on localhost streams MESSAGE_CREATE style events as JSON
+lines. The client turns every event into a message and dispatches it as
+its own task through the real bot from bot_main, set up like GATEWAY=stub
+does: prefix, command parsing, checks, invoke hooks and the command
+itself. Whatever the command sends is written back to the gateway as the
+reply, the same round trip a command makes through the gateway and the
+HTTP API. uvloop is skipped if it isn't installed.
+
+Run from the repository root:
+    python -m benchmarks.bench_loops
+"""
+
+import asyncio
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import time
+import bot_main
+from benchmarks.fakes import FakeChannel, FakeGuild, FakeMessage, FakeUser
+from benchmarks.replay import ReplayContext
+from services.event_loop import LoopSettings
+
+
+# A single /coinflip waits for its gif to play, many flips answer right away
+COMMANDS = ["/roll 4d6+2", "/random 1-100", "/roll 2d20", "/coinflip 100"]
+# Servers and users the events are spread over
+GUILDS = 8
+USERS = 32
+
+
+async def fake_gateway(reader, writer, events):
+    """Send the events and read one reply per event."""
+    for index in range(events):
+        payload = {
+            "t": "MESSAGE_CREATE",
+            "s": index,
+            "d": {
+                "id": index,
+                "guild_id": index % GUILDS + 1,
+                "author": index % USERS,  # Index of the fake user
+                "content": COMMANDS[index % len(COMMANDS)],
+            },
+        }
+        writer.write(json.dumps(payload).encode() + b"\n")
+        if index % 64 == 0:
+            await writer.drain()
+    await writer.drain()
+    for _ in range(events):
+        await reader.readline()
+    writer.close()
+
+
+async def client(bot, host, port, events):
+    """
+    Dispatch every received event to the bot and send back what the command sent.
+
+    Returns:
+        int: Number of commands that failed or weren't found.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    guilds = {guild_id: FakeGuild(guild_id) for guild_id in range(1, GUILDS + 1)}
+    users = [FakeUser() for _ in range(USERS)]
+    failed = 0
+
+    async def dispatch(data):
+        nonlocal failed
+        guild = guilds[data["guild_id"]]
+        # A channel per event, so the reply holds only this command's messages
+        channel = FakeChannel(guild)
+        message = FakeMessage(channel, data["content"], author=users[data["author"]])
+        ctx = await bot.get_context(message, cls=ReplayContext)
+        await bot.invoke(ctx)
+        content = "\n".join(sent.content for sent in channel.sent if sent.content)
+        # The commands catch their own errors and reply with them
+        if ctx.command is None or ctx.command_failed or content.startswith("An error occurred"):
+            failed += 1
+        reply = {"channel_id": channel.id, "content": content}
+        writer.write(json.dumps(reply).encode() + b"\n")
+
+    tasks = set()
+    for _ in range(events):
+        event = json.loads(await reader.readline())
+        task = asyncio.create_task(dispatch(event["d"]))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    await writer.drain()
+    writer.close()
+    return failed
+
+
+async def session(events):
+    """
+    Set up the bot and run the fake gateway and the client against each other.
+
+    Returns:
+        tuple: Commands dispatched per second and the number of failed commands.
+    """
+    bot = bot_main.bot_setup()[0]
+    async with bot:
+        await bot.setup_hook()
+        # The user the bot is logged in as, normally set by the READY event
+        bot._connection.user = FakeUser()
+        done = asyncio.Event()
+
+        async def serve(reader, writer):
+            await fake_gateway(reader, writer, events)
+            done.set()
+
+        server = await asyncio.start_server(serve, "127.0.0.1", 0)
+        host, port = server.sockets[0].getsockname()[:2]
+        start = time.perf_counter()
+        failed = await client(bot, host, port, events)
+        await done.wait()
+        elapsed = time.perf_counter() - start
+        server.close()
+        await server.wait_closed()
+    return events / elapsed, failed
+
+
+def main(events=10000, repeat=3):
+    """
+    Print the dispatch throughput on every available loop.
+
+    Args:
+        events (int): Events per run.
+        repeat (int): Runs per loop, the best one counts.
+    """
+    # No connection and no recording, and whatever the commands write goes to a scratch directory
+    os.environ["GATEWAY"] = "stub"
+    os.environ.setdefault("DISCORD_TOKEN", "bench")
+    os.environ.pop("TRAFFIC_LOG", None)
+    # The monitor would report the flood of events as a blocked loop
+    os.environ["LOOP_LAG_MS"] = "0"
+    scratch = tempfile.mkdtemp(prefix="dicebot-loops-")
+    cwd = os.getcwd()
+    os.chdir(scratch)
+    try:
+        for name in ("asyncio", "uvloop"):
+            if name == "uvloop" and importlib.util.find_spec("uvloop") is None:
+                print(f"{name:<8} not installed, skipped")
+                continue
+            settings = LoopSettings(name)
+            runs = [settings.run(session(events)) for _ in range(repeat)]
+            best = max(rate for rate, _ in runs)
+            failed = sum(count for _, count in runs)
+            print(f"{name:<8} {best:10,.0f} commands/s, {failed} failed")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Microbenchmark of the stats table renderer against tabulate.
+
+Run from the repository root:
+    python -m benchmarks.bench_stat_table
+"""
+
+import random
+import timeit
+from tabulate import tabulate
+from services.stat_table import HEADERS, _render, format_modifier, render_stats_table
+
+
+ATTRIBUTES = ["Strength", "Dexterity", "Intelligence", "Constitution", "Charisma", "Wisdom"]
+
+
+def random_table():
+    """Build the rows of a random stats table."""
+    rows = []
+    for attribute in ATTRIBUTES:
+        value = random.randint(3, 20)
+        rows.append([attribute, value, format_modifier((value - 10) // 2)])
+    return rows
+
+
+def main(number=20000):
+    """
+    Time tabulate, the uncached renderer and the memoized renderer.
+
+    Args:
+        number (int): Number of tables rendered per measurement.
+    """
+    tables = [random_table() for _ in range(256)]
+    cells = [tuple(tuple(str(cell) for cell in row) for row in table) for table in tables]
+    # Make sure the renderer really is a drop-in replacement
+    for table in tables:
+        assert render_stats_table(table) == tabulate(table, headers=HEADERS, tablefmt="grid")
+
+    def run_tabulate():
+        for table in tables:
+            tabulate(table, headers=HEADERS, tablefmt="grid")
+
+    def run_uncached():
+        for table in cells:
+            _render.__wrapped__(table)
+
+    def run_memoized():
+        for table in tables:
+            render_stats_table(table)
+
+    rounds = max(1, number // len(tables))
+    results = {}
+    for name, func in [
+        ("tabulate", run_tabulate),
+        ("renderer", run_uncached),
+        ("renderer (memoized)", run_memoized),
+    ]:
+        seconds = min(timeit.repeat(func, number=rounds, repeat=3))
+        results[name] = seconds / (rounds * len(tables)) * 1e6
+    for name, micros in results.items():
+        speedup = results["tabulate"] / micros
+        print(f"{name:<20} {micros:8.2f} us/table  {speedup:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Lightweight stand-ins for the Discord objects the commands and views use.
+
+They implement just enough of discord.py's interface to drive the real
+command and callback functions without a connection: sending returns a
+FakeMessage, responses are recorded, and `wait_for` answers from a script.
+"""
+
+import asyncio
+import itertools
+import types
+import discord
+from services.sessions import SessionStore
+from services.workers import WorkerPool
+
+
+_ids = itertools.count(10**17)
+
+
+class FakeChannel:
+    """A text channel that records what is sent to it."""
+
+    def __init__(self, guild):
+        self.id = next(_ids)
+        self.guild = guild
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        message = FakeMessage(self, content, **kwargs)
+        self.sent.append(message)
+        return message
+
+    def permissions_for(self, member):
+        return member.guild_permissions
+
+
+class FakeMessage:
+    """A sent message, edits change its content and view in place."""
+
+    _state = None
+
+    def __init__(self, channel, content=None, view=None, author=None, **kwargs):
+        self.id = next(_ids)
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.view = view
+        self.attachments = []
+
+    async def edit(self, **fields):
+        self.content = fields.get("content", self.content)
+        self.view = fields.get("view", self.view)
+        return self
+
+    async def delete(self, **kwargs):
+        pass
+
+
+class FakeUser:
+    """A server member, optionally an administrator."""
+
+    def __init__(self, administrator=False):
+        self.id = next(_ids)
+        self.name = f"user{self.id}"
+        self.bot = False
+        self.guild_permissions = types.SimpleNamespace(administrator=administrator)
+
+    def __eq__(self, other):
+        return isinstance(other, FakeUser) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class FakeResponse:
+    """The response of an interaction, edits go to the interaction's message."""
+
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+        return await self._interaction.channel.send(content, **kwargs)
+
+    async def edit_message(self, **fields):
+        self._done = True
+        if self._interaction.message is not None:
+            await self._interaction.message.edit(**fields)
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+
+class FakeFollowup:
+    """The followup webhook of an interaction."""
+
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, content=None, wait=False, **kwargs):
+        return await self._interaction.channel.send(content, **kwargs)
+
+
+class FakeInteraction:
+    """A component interaction: a click on a button of a message."""
+
+    type = discord.InteractionType.component
+
+    def __init__(self, user, message, custom_id=None):
+        self.id = next(_ids)
+        self.user = user
+        self.message = message
+        self.channel = message.channel
+        self.guild = message.guild
+        self.data = {"custom_id": custom_id}
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+
+class FakeGuild:
+    """A server with a single text channel."""
+
+    def __init__(self, guild_id):
+        self.id = guild_id
+        self.name = f"guild{guild_id}"
+        self.shard_id = 0
+        self.channel = FakeChannel(self)
+
+
+class FakeContext:
+    """
+    The context of a prefix command.
+
+    Has no interaction, so sending never goes through an interaction response.
+    """
+
+    def __init__(self, bot, guild, author):
+        self.bot = bot
+        self.guild = guild
+        self.author = author
+        self.channel = guild.channel
+        self.message = FakeMessage(self.channel, "")
+        self.interaction = None
+        self.command = None
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+    async def defer(self, **kwargs):
+        pass
+
+    @property
+    def last_message(self):
+        """The newest message sent in the context's channel."""
+        return self.channel.sent[-1]
+
+
+class FakeBot:
+    """
+    The parts of the bot the commands use.
+
+    `wait_for` doesn't wait for real events. It runs the next function of the
+    script instead, which stands for the user's next action, and returns its
+    result. Without a scripted action it times out right away.
+    """
+
+    def __init__(self, workers=2):
+        self.creation_sessions = SessionStore(ttl=3600, max_per_user=10**9)
+        self.worker_pool = WorkerPool(workers=workers)
+        self.script = []
+
+    def expect(self, action):
+        """
+        Queue the answer of the next `wait_for`.
+
+        Args:
+            action (coroutine function): Called without arguments, its result is returned.
+        """
+        self.script.append(action)
+
+    async def wait_for(self, event, *, check=None, timeout=None):
+        if not self.script:
+            raise asyncio.TimeoutError
+        return await self.script.pop(0)()
+
+
+async def click(view, custom_id, user, message):
+    """
+    Click a button of a view like Discord would.
+
+    Args:
+        view (discord.ui.View): The view the button is in.
+        custom_id (str): The custom ID of the button.
+        user (FakeUser): Who clicks.
+        message (FakeMessage): The message the view is attached to.
+
+    Returns:
+        FakeInteraction: The interaction of the click.
+    """
+    interaction = FakeInteraction(user, message, custom_id)
+    for item in view.children:
+        if getattr(item, "custom_id", None) == custom_id:
+            await item.callback(interaction)
+            return interaction
+    raise LookupError(f"No button {custom_id!r} in {type(view).__name__}")
@@ -0,0 +1,342 @@
+"""
+Replay a recorded traffic log against a local bot.
+
+The bot is the real one from bot_main, with its extensions, hooks and
+services, started without a connection like GATEWAY=stub does. Commands
+are fed to it as prefix messages through `bot.get_context` and
+`bot.invoke`, clicks as component interactions on the newest message
+holding that button. Replies go to fake channels (see benchmarks.fakes)
+instead of Discord's HTTP API.
+Recorded servers and users become fake ones, hashed names become
+characters named after the hash. Characters the log uses before creating
+them get a synthetic savefile first, so the commands find them.
+
+Events are started at their recorded time divided by the speed, so
+--speed 10 plays an hour of traffic in six minutes. Reports the latency
+and errors of every command and how far the replay fell behind.
+
+Run from the repository root:
+    python -m benchmarks.replay traffic.jsonl traffic.jsonl.1.gz --speed 10 --output replay.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import bot_main
+from benchmarks.bench_commands import percentile, write_character
+from benchmarks.fakes import FakeGuild, FakeInteraction, FakeMessage, FakeUser
+from services.responses import ResponseContext
+from services.traffic import read_traffic
+
+
+# Commands that create the character named by their arguments
+CREATING_COMMANDS = {"roll_char", "random_char"}
+# Messages kept per channel to look up clicked buttons in
+KEPT_MESSAGES = 50
+# Seconds a click waits for its button to be sent
+CLICK_WAIT = 1.0
+
+
+class ReplayContext(ResponseContext):
+    """Context of a replayed command, sends to the fake channel instead of the API."""
+
+    async def send(self, content=None, **kwargs):
+        async with self.response_lock:
+            message = await self.channel.send(content, **kwargs)
+        self.mark_first_byte()
+        return message
+
+    async def reply(self, content=None, **kwargs):
+        return await self.send(content, **kwargs)
+
+
+class CommandResults:
+    """Latencies and errors of one command or button."""
+
+    __slots__ = ("latencies", "first_responses", "errors")
+
+    def __init__(self):
+        self.latencies = []
+        self.first_responses = []
+        self.errors = 0
+
+    def summary(self):
+        """
+        Summarize the results.
+
+        Returns:
+            dict: Count, errors, and p50/p99 latency and time to the first response in milliseconds.
+        """
+        latencies = sorted(self.latencies)
+        first = sorted(self.first_responses)
+        result = {"count": len(latencies), "errors": self.errors}
+        if latencies:
+            result["p50_ms"] = round(percentile(latencies, 0.5) * 1000, 2)
+            result["p99_ms"] = round(percentile(latencies, 0.99) * 1000, 2)
+        if first:
+            result["first_response_p50_ms"] = round(percentile(first, 0.5) * 1000, 2)
+            result["first_response_p99_ms"] = round(percentile(first, 0.99) * 1000, 2)
+        return result
+
+
+class Replayer:
+    """Maps the hashes of a traffic log to fake servers and users and plays its events."""
+
+    def __init__(self, bot, speed):
+        """
+        Initialize the Replayer.
+
+        Args:
+            bot (commands.Bot): The set up bot to replay against.
+            speed (float): How many times faster than recorded to replay.
+        """
+        self.bot = bot
+        self.speed = speed
+        self.guilds = {}  # hash -> FakeGuild
+        self.users = {}  # hash -> FakeUser
+        self.results = {}  # name -> CommandResults
+        self.lags = []
+        self.skipped = 0
+        self.unfinished = 0
+
+    def guild(self, guild_hash):
+        guild = self.guilds.get(guild_hash)
+        if guild is None:
+            guild = self.guilds[guild_hash] = FakeGuild(len(self.guilds) + 1)
+        return guild
+
+    def user(self, user_hash):
+        user = self.users.get(user_hash)
+        if user is None:
+            # Administrators, so deleting and the admin commands behave like for the owner
+            user = self.users[user_hash] = FakeUser(administrator=True)
+        return user
+
+    def result(self, name):
+        results = self.results.get(name)
+        if results is None:
+            results = self.results[name] = CommandResults()
+        return results
+
+    @staticmethod
+    def argument(value):
+        """Turn a recorded argument back into text, hashed names become c<hash>."""
+        if isinstance(value, str) and value.startswith("#"):
+            return f"c{value[1:]}"
+        return str(value)
+
+    def prepare(self, events):
+        """
+        Write the savefiles of the characters the log uses before creating them.
+
+        Args:
+            events (list): The recorded events.
+
+        Returns:
+            list: The events that can be replayed, ones with unrecorded arguments are skipped.
+        """
+        playable = []
+        known = set()
+        for event in events:
+            _, kind, name, args, guild_hash, user_hash = event
+            if kind == "c":
+                if args is None or "?" in args.values() or guild_hash is None:
+                    self.skipped += 1
+                    continue
+                guild = self.guild(guild_hash)
+                for value in args.values():
+                    if isinstance(value, str) and value.startswith("#"):
+                        key = (guild.id, self.argument(value))
+                        if key not in known and name not in CREATING_COMMANDS:
+                            write_character(guild.id, key[1], self.user(user_hash).id)
+                        known.add(key)
+            playable.append(event)
+        return playable
+
+    async def command(self, name, args, guild, user):
+        """Invoke a command through the bot's own parsing, hooks and error handling."""
+        prefix = await self.bot.get_prefix(FakeMessage(guild.channel, author=user))
+        words = [self.argument(value) for value in args.values() if value is not None]
+        content = " ".join([f"{prefix}{name}", *words])
+        message = FakeMessage(guild.channel, content, author=user)
+        ctx = await self.bot.get_context(message, cls=ReplayContext)
+        results = self.result(f"/{name}")
+        if ctx.command is None:
+            results.errors += 1
+            return
+        try:
+            await self.bot.invoke(ctx)
+        except Exception:
+            ctx.command_failed = True
+        results.latencies.append(time.perf_counter() - ctx.started_at)
+        if ctx.first_byte_at is not None:
+            results.first_responses.append(ctx.first_byte_at - ctx.started_at)
+        if ctx.command_failed:
+            results.errors += 1
+
+    @staticmethod
+    def find_button(guild, custom_id):
+        """
+        Find a button on the newest message of a server that has it.
+
+        Returns:
+            tuple: The message, its view and the button, or None if no message has it.
+        """
+        for message in reversed(guild.channel.sent):
+            view = message.view
+            for child in getattr(view, "children", ()):
+                if getattr(child, "custom_id", None) == custom_id:
+                    return message, view, child
+        return None
+
+    async def click(self, custom_id, guild, user):
+        """
+        Click a button like the recorded user did.
+
+        Sped up, a click can be due before the command sent its message,
+        so it waits up to CLICK_WAIT seconds for the button to show up.
+        """
+        results = self.result(f"button {custom_id}")
+        deadline = time.perf_counter() + CLICK_WAIT
+        found = self.find_button(guild, custom_id)
+        while found is None and time.perf_counter() < deadline:
+            await asyncio.sleep(0.005)
+            found = self.find_button(guild, custom_id)
+        if found is None:
+            results.errors += 1  # The message it was on wasn't replayed
+            return
+        message, view, item = found
+        started_at = time.perf_counter()
+        interaction = FakeInteraction(user, message, custom_id)
+        # Commands waiting for a click get it like from the gateway, then the view handles it
+        self.bot.dispatch("interaction", interaction)
+        try:
+            if await view.interaction_check(interaction):
+                await item.callback(interaction)
+        except Exception:
+            results.errors += 1
+        results.latencies.append(time.perf_counter() - started_at)
+
+    async def play(self, event, start):
+        offset, kind, name, args, guild_hash, user_hash = event
+        due = start + offset / 1000 / self.speed
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        self.lags.append(time.perf_counter() - due)
+        guild = self.guild(guild_hash)
+        user = self.user(user_hash)
+        if kind == "c":
+            await self.command(name, args, guild, user)
+        else:
+            await self.click(name, guild, user)
+        del guild.channel.sent[:-KEPT_MESSAGES]
+
+    async def run(self, events, drain):
+        """
+        Replay the events on schedule.
+
+        Args:
+            events (list): The prepared events.
+            drain (float): Seconds to wait for commands still running after the last
+                event, like ones waiting for a click that never comes.
+
+        Returns:
+            float: Seconds the replay took.
+        """
+        start = time.perf_counter()
+        base = events[0][0] if events else 0
+        tasks = [
+            asyncio.create_task(self.play([event[0] - base, *event[1:]], start))
+            for event in events
+        ]
+        if tasks:
+            _, pending = await asyncio.wait(
+                tasks, timeout=(events[-1][0] - base) / 1000 / self.speed + drain
+            )
+            self.unfinished = len(pending)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        return time.perf_counter() - start
+
+
+async def replay(events, speed, drain):
+    """
+    Set up the bot and replay the events against it.
+
+    Returns:
+        dict: The settings, the overall rate and lag and the results of every command.
+    """
+    bot = bot_main.bot_setup()[0]
+    async with bot:
+        await bot.setup_hook()
+        # The user the bot is logged in as, normally set by the READY event
+        bot._connection.user = FakeUser()
+        replayer = Replayer(bot, speed)
+        playable = replayer.prepare(events)
+        elapsed = await replayer.run(playable, drain)
+    lags = sorted(replayer.lags)
+    return {
+        "settings": {"events": len(events), "skipped": replayer.skipped, "speed": speed},
+        "unfinished": replayer.unfinished,
+        "elapsed_s": round(elapsed, 2),
+        "events_per_s": round(len(playable) / elapsed, 1) if elapsed else None,
+        "schedule_lag_p50_ms": round(percentile(lags, 0.5) * 1000, 2) if lags else None,
+        "schedule_lag_max_ms": round(lags[-1] * 1000, 2) if lags else None,
+        "servers": len(replayer.guilds),
+        "users": len(replayer.users),
+        "results": {name: results.summary() for name, results in sorted(replayer.results.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded traffic against a local bot.")
+    parser.add_argument("logs", nargs="+", help="traffic logs, oldest first, plain or .gz")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, e.g. 1, 10 or 100")
+    parser.add_argument(
+        "--drain", type=float, default=5.0, help="seconds to wait for running commands at the end"
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+    events = []
+    for path in args.logs:
+        events.extend(read_traffic(path))
+    output = os.path.abspath(args.output) if args.output else None
+
+    # No connection, no recording of the replay, and savefiles in a scratch directory
+    os.environ["GATEWAY"] = "stub"
+    os.environ.setdefault("DISCORD_TOKEN", "replay")
+    os.environ.pop("TRAFFIC_LOG", None)
+    scratch = tempfile.mkdtemp(prefix="dicebot-replay-")
+    cwd = os.getcwd()
+    os.chdir(scratch)
+    try:
+        report = asyncio.run(replay(events, args.speed, args.drain))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    print(
+        f"{len(events)} events ({report['settings']['skipped']} skipped, "
+        f"{report['unfinished']} unfinished) in {report['elapsed_s']} s, "
+        f"{report['events_per_s']} events/s, schedule lag p50 {report['schedule_lag_p50_ms']} ms "
+        f"max {report['schedule_lag_max_ms']} ms"
+    )
+    print(f"{'command':<24} {'count':>8} {'errors':>8} {'p50 ms':>10} {'p99 ms':>10}")
+    for name, result in report["results"].items():
+        print(
+            f"{name:<24} {result['count']:>8} {result['errors']:>8} "
+            f"{result.get('p50_ms', 0):>10.2f} {result.get('p99_ms', 0):>10.2f}"
+        )
+    if output:
+        with open(output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,77 @@
+import asyncio
 import random
-from tabulate import tabulate
 import os
 import csv
 import discord
+from services.character_index import characters, saves_dir, SAVE_SUFFIX
+from services.stat_table import render_stats_table, format_modifier, stats_blocks
+from services.storage import file_lock
+from services.character_log import CREATED, STATS_INCREASED, character_log
+
+
+# Columns of a character savefile
+FIELDNAMES = [
+    "Name",
+    "Race",
+    "Class",
+    "Attribute",
+    "Value",
+    "Modifier",
+    "CreatorID",
+    "Level",
+    "Health",
+]
+
+
+def read_stats_block(filepath, hp_label="Health", skip_empty=True):
+    """
+    Read a savefile and render the stats block shown for a character.
+
+    Args:
+        filepath (str): The path of the savefile.
+        hp_label (str): The label shown in front of the character's health.
+        skip_empty (bool): Return None instead of an empty table if the file has no stats.
+
+    Returns:
+        str: The name, race, class, level and health line followed by the stats table.
+    """
+    # Load the savefile with the changes logged since it was written
+    rows = character_log.load(filepath)
+    # Initialize a list to store stats
+    stats = []
+    name = None
+    race_name = None
+    class_name = None
+    lvl = None
+    hp = None
+    # Iterate through each row of the character
+    for row in rows:
+        # Append attribute, value, and formatted modifier to stats list
+        stats.append(
+            [row["Attribute"], row["Value"], format_modifier(int(row["Modifier"]))]
+        )
+        # Name, race, class, level and health are the same in every row
+        if name is None:
+            name = row["Name"]
+        if race_name is None:
+            race_name = row["Race"]
+        if class_name is None:
+            class_name = row["Class"]
+        if lvl is None:
+            lvl = row["Level"]
+        if hp is None:
+            hp = row["Health"]
+    if not stats and skip_empty:
+        return None
+    # Generate a grid representation of the stats
+    stats_table = render_stats_table(stats)
+    # Prepare display strings for name, race, class, level and health
+    name_display = f"`Name`: {name}" if name else ""
+    race_display = f"`Race`: {race_name}" if race_name else ""
+    class_display = f"`Class`: {class_name}" if class_name else ""
+    lvl_display = f"`Level`: {lvl}" if lvl else ""
+    hp_display = f"`{hp_label}`: {hp}\n" if hp else ""
+    return f"{name_display}  {race_display}  {class_display}  {lvl_display}  {hp_display}```{stats_table}```"
 
 
 class Character:
@@ -94,17 +163,10 @@ class Character:
             modifier = self.ability_score_modifier.get(
                 key, 0
             )  # Get the modifier for the stat
-            if modifier >= 1:  # Check if modifier is non-negative
-                modifier_str = f"+{modifier}"  # Format modifier string with a plus sign
-            else:
-                modifier_str = str(modifier)  # Convert modifier to string
             table.append(
-                [key, value, modifier_str]
+                [key, value, format_modifier(modifier)]
             )  # Append stat, value, and modifier to the table
-        headers = ["Attribute", "Value", "Modifier", "Race"]  # Define table headers
-        stats_table = tabulate(
-            table, headers=headers, tablefmt="grid"
-        )  # Format table using tabulate
+        stats_table = render_stats_table(table)  # Format table as a grid
         return f"`Race`: {race_name}  `Class`: {dndclass}  `Level`: {level}  `Health`: {hp}\n```{stats_table}```"  # return the formatted table to Discord
 
     async def save_to_csv(
@@ -140,45 +202,30 @@ class Character:
             filename = f"{char_name}_stats.csv"
             # Construct the full file path
             filepath = os.path.join(saves_dir, filename)
-            # Check if the file already exists
-            file_exists = os.path.isfile(filepath)
-            # Open the file in append mode if it exists, otherwise in write mode - For now only in write mode. Don't want to append but left it in, in case i need it.
-            with open(filepath, "w", newline="") as file:
-                # Define field names for CSV header
-                fieldnames = [
-                    "Name",
-                    "Race",
-                    "Class",
-                    "Attribute",
-                    "Value",
-                    "Modifier",
-                    "CreatorID",
-                    "Level",
-                    "Health",
-                ]
-                # Initialize CSV DictWriter
-                writer = csv.DictWriter(file, fieldnames=fieldnames)
-                # Write header if the file is newly created
-                if not file_exists:
-                    writer.writeheader()
-                # Iterate through character stats
-                for key, value in self.stats.items():
-                    # Get the modifier for the current attribute
-                    modifier = self.ability_score_modifier.get(key, 0)
-                    # Write a row to the CSV file
-                    writer.writerow(
-                        {
-                            "Name": char_name,
-                            "Race": race_name,
-                            "Class": dndclass,
-                            "Attribute": key,
-                            "Value": value,
-                            "Modifier": modifier,
-                            "CreatorID": invoker_id,
-                            "Level": lvl,
-                            "Health": int(hp),
-                        }
-                    )
+            # One row per attribute, everything but the attribute is the same in every row
+            rows = []
+            # Iterate through character stats
+            for key, value in self.stats.items():
+                # Get the modifier for the current attribute
+                modifier = self.ability_score_modifier.get(key, 0)
+                rows.append(
+                    {
+                        "Name": char_name,
+                        "Race": race_name,
+                        "Class": dndclass,
+                        "Attribute": key,
+                        "Value": str(value),
+                        "Modifier": str(modifier),
+                        "CreatorID": str(invoker_id),
+                        "Level": str(lvl),
+                        "Health": str(int(hp)),
+                    }
+                )
+            # Log the creation, which writes the savefile, in a worker thread as it takes the lock
+            await asyncio.to_thread(character_log.append, filepath, CREATED, invoker_id, rows=rows)
+            # Register the character so it can be looked up by name
+            characters.add(self.server_id, char_name)
+            stats_blocks.invalidate(filepath)
             # Send confirmation message
             return f"Character stats for '{char_name}' have been saved."
         except Exception as e:
@@ -201,68 +248,18 @@ class Character:
             discord.Message: The message object containing the displayed stats.
         """
         try:
-            # Construct directory path based on server ID
-            server_dir = f"server_{server_id}"
-            saves_dir = os.path.join("resources", "saves", server_dir)
             # Construct the full file path
-            filepath = os.path.join(saves_dir, f"{char_name}_stats.csv")
-            # Open the CSV file
-            with open(filepath, newline="") as file:
-                # Create a CSV DictReader
-                reader = csv.DictReader(file)
-                # Initialize a list to store stats
-                stats = []
-                name = None
-                race_name = None
-                class_name = None
-                lvl = None
-                hp = None
-                # Iterate through each row in the CSV
-                for row in reader:
-                    # Get the modifier and convert to int
-                    modifier = int(row["Modifier"])
-                    # Check if modifier is greater than or equal to 1
-                    if modifier >= 1:
-                        modifier_str = f"+{modifier}"
-                    else:
-                        modifier_str = str(modifier)
-                    # Append attribute, value, and modified modifier to stats list
-                    stats.append([row["Attribute"], row["Value"], modifier_str])
-                    # Finding race of the character
-                    if race_name is None:
-                        race_name = row["Race"]
-                    # Finding name of the character
-                    if name is None:
-                        name = row["Name"]
-                    # Finding class of the character
-                    if class_name is None:
-                        class_name = row["Class"]
-                    if lvl is None:
-                        lvl = row["Level"]
-                    if hp is None:
-                        hp = row["Health"]
-                # If CSV file is empty or only contain headers, send an error message
-                if not stats:
-                    await ctx.send(
-                        f"'{char_name}' savefile seems to be empty. :confused:"
-                    )
-                    return None
-                # Define headers for the tabulated output
-                headers = ["Attribute", "Value", "Modifier"]
-                # Generate a tabulated representation of the stats
-                stats_table = tabulate(stats, headers=headers, tablefmt="grid")
-                # Prepare display strings for name, race, and class
-                name_display = f"`Name`: {name}" if name else ""
-                race_display = f"`Race`: {race_name}" if race_name else ""
-                class_display = f"`Class`: {class_name}" if class_name else ""
-                lvl_display = f"`Level`: {lvl}" if lvl else ""
-                hp_display = f"`Health`: {hp}\n" if hp else ""
-                # Send the name, race, and tabulated stats to the Discord channel and store the message object
-                message = await ctx.send(
-                    f"{name_display}  {race_display}  {class_display}  {lvl_display}  {hp_display}```{stats_table}```"
-                )
-                # Return the message object
-                return message
+            filepath = os.path.join(saves_dir(server_id), f"{char_name}{SAVE_SUFFIX}")
+            # Get the rendered stats, the file is only read again if it changed
+            content = stats_blocks.get(filepath, "stats", read_stats_block)
+            # If CSV file is empty or only contain headers, send an error message
+            if content is None:
+                await ctx.send(f"'{char_name}' savefile seems to be empty. :confused:")
+                return None
+            # Send the name, race, and tabulated stats to the Discord channel and store the message object
+            message = await ctx.send(content)
+            # Return the message object
+            return message
         except FileNotFoundError:
             await ctx.send(
                 f"'{char_name}' savefile not found.", ephemeral=True, delete_after=120
@@ -272,6 +269,57 @@ class Character:
             await ctx.send(f"An error occurred: {e}", ephemeral=True)
             return None  # Return None if an error occurs
 
+    @staticmethod
+    async def import_from_csv(content, server_id, invoker_id):
+        """
+        Import a character from an uploaded savefile.
+
+        Args:
+            content (bytes): The content of the uploaded CSV file.
+            server_id (int): The ID of the server the character is imported into.
+            invoker_id (int): The ID of the user importing the character, who becomes its creator.
+
+        Returns:
+            str: The name of the imported character.
+
+        Raises:
+            ValueError: If the file isn't a valid savefile or the character already exists.
+        """
+        try:
+            rows = list(csv.DictReader(content.decode("utf-8-sig").splitlines()))
+        except (UnicodeDecodeError, csv.Error):
+            raise ValueError("The file is not a readable CSV file.")
+        # Check that the file has the same layout as the savefiles the bot writes
+        if not rows or list(rows[0].keys()) != FIELDNAMES:
+            raise ValueError(f"The file needs the columns: {', '.join(FIELDNAMES)}.")
+        attributes = [row["Attribute"] for row in rows]
+        if sorted(attributes) != sorted(Character("", server_id).stats):
+            raise ValueError("The file needs exactly one row for each attribute.")
+        char_name = rows[0]["Name"].strip()
+        if not char_name or any(row["Name"].strip() != char_name for row in rows):
+            raise ValueError("All rows need the same character name.")
+        if os.sep in char_name or "/" in char_name or char_name.startswith("."):
+            raise ValueError("The character name contains invalid characters.")
+        try:
+            for row in rows:
+                int(row["Value"])
+                int(row["Modifier"])
+                int(row["Level"])
+                int(row["Health"])
+        except (TypeError, ValueError):
+            raise ValueError("Value, Modifier, Level and Health need to be numbers.")
+        if char_name in characters.guild(server_id):
+            raise ValueError(f"Character with name '{char_name}' already exists.")
+
+        # Log the import with the importing user as the creator, which writes the savefile
+        os.makedirs(saves_dir(server_id), exist_ok=True)
+        filepath = os.path.join(saves_dir(server_id), f"{char_name}{SAVE_SUFFIX}")
+        rows = [dict(row, Name=char_name, CreatorID=str(invoker_id)) for row in rows]
+        await asyncio.to_thread(character_log.append, filepath, CREATED, invoker_id, rows=rows)
+        # Register the character so it can be looked up by name
+        characters.add(server_id, char_name)
+        return char_name
+
     @classmethod
     async def update_character_stat(cls, ctx, name, selected_stat):
         """
@@ -282,43 +330,47 @@ class Character:
              name (str): The name of the character.
              selected_stat (str): The user selected stat, which is to be upgraded.
         """
+        await cls.update_character_stats(ctx, name, {selected_stat: 1})
+
+    @classmethod
+    async def update_character_stats(cls, ctx, name, increases):
+        """
+        Increase several stats of a character and their modifiers with one logged change.
+
+        Args:
+             ctx: The context object representing the invocation context.
+             name (str): The name of the character.
+             increases (dict): Points to add to every stat that is upgraded.
+        """
         # Construct directory path based on server ID
         server_dir = f"server_{ctx.guild.id}"
         saves_dir = os.path.join("resources", "saves", server_dir)
         # Construct the full file path
         filepath = os.path.join(saves_dir, f"{name}_stats.csv")
 
-        # Read character stats from the CSV file
-        with open(filepath, newline="") as file:
-            reader = csv.DictReader(file)
-            stats = list(reader)
-
-        # Find the corresponding stat
-        for stat in stats:
-            if stat["Attribute"] == selected_stat:
-                # Update the stat value
-                stat["Value"] = str(int(stat["Value"]) + 1)
-                # Calculate the new modifier using the instance method
-                new_modifier = await Character(name, ctx.guild.id).calculate_modifier(
-                    int(stat["Value"])
-                )
-                # Update the modifier
-                stat["Modifier"] = str(new_modifier)
-                break
-
-        # Write the updated stats back to the file
-        with open(filepath, "w", newline="") as file:
-            fieldnames = [
-                "Name",
-                "Race",
-                "Class",
-                "Attribute",
-                "Value",
-                "Modifier",
-                "CreatorID",
-                "Level",
-                "Health",
-            ]
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(stats)
+        user_id = ctx.author.id
+
+        def increase():
+            # Hold the lock from loading the stats until the change is logged
+            with file_lock(filepath):
+                stats = character_log.load(filepath)
+                before = {}
+                after = {}
+                # Find the corresponding stats
+                for stat in stats:
+                    points = increases.get(stat["Attribute"])
+                    if points:
+                        before[stat["Attribute"]] = [stat["Value"], stat["Modifier"]]
+                        value = int(stat["Value"]) + points
+                        # The same modifier as calculate_modifier, which can't be awaited here
+                        after[stat["Attribute"]] = [str(value), str((value - 10) // 2)]
+
+                # Append the change instead of rewriting the savefile
+                if after:
+                    character_log.append(
+                        filepath, STATS_INCREASED, user_id, before=before, after=after
+                    )
+
+        # The lock waits for compactions of the server's log, so not on the loop
+        await asyncio.to_thread(increase)
+        stats_blocks.invalidate(filepath)
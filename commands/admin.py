@@ -0,0 +1,267 @@
+import asyncio
+import csv
+import io
+import os
+import discord
+from discord.ext import commands
+from services.prefixes import prefixes
+from services.storage import atomic_write, file_lock
+from services.tree_sync import tree_sync
+from services.io_stats import exists, io_stats, open_file
+from services.live_views import live_views
+
+
+class Admin(commands.Cog):
+    """Server settings and owner tools."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    # Command to set a custom prefix for the bot commands
+    @commands.hybrid_command(
+        name="setprefix",
+        description="Set a custom prefix for commands - Needs admin permissions.",
+    )
+    @commands.has_permissions(administrator=True)
+    async def setprefix(self, ctx, prefix: str):
+        """
+        Sets a custom prefix for the bot commands in the server.
+
+        Args:
+            ctx (discord.ext.commands.Context): The context of the command.
+            prefix (str): The custom prefix to set.
+
+        Raises:
+            Exception: If an error occurs during the process.
+
+        Returns:
+            None
+        """
+        existing_prefixes = {}
+        prefixes_file = "prefixes.csv"
+        prefix_folder = "resources"
+        prefixes_file_path = os.path.join(prefix_folder, prefixes_file)
+
+        # Create the prefix folder if it doesn't exist
+        if not os.path.exists(prefix_folder):
+            os.makedirs(prefix_folder)
+
+        try:
+            # Other bot processes share the file, hold its lock from reading to writing
+            with file_lock(prefixes_file_path):
+                # Check if the prefixes file exists
+                if exists(prefixes_file_path):
+                    # Read existing prefixes from the CSV file
+                    with open_file(prefixes_file_path, "r") as file:
+                        reader = csv.DictReader(file)
+                        for row in reader:
+                            existing_prefixes[int(row["ServerID"])] = row["Prefix"]
+
+                # Set the custom prefix for the current server
+                existing_prefixes[ctx.guild.id] = prefix
+
+                # Write the updated prefixes to the CSV file
+                with atomic_write(prefixes_file_path) as file:
+                    fieldnames = ["ServerID", "Prefix"]
+                    writer = csv.DictWriter(file, fieldnames=fieldnames)
+                    writer.writeheader()
+                    for server_id, new_prefix in existing_prefixes.items():
+                        writer.writerow({"ServerID": int(server_id), "Prefix": new_prefix})
+            prefixes.set(ctx.guild.id, prefix)
+
+            # Send confirmation message
+            await ctx.send(f"Custom prefix set to '{prefix}'.")
+
+        except Exception as e:
+            # Send error message if an exception occurs
+            await ctx.send(f"An error occurred: {e}", ephemeral=True)
+
+    # Command to remove the custom prefix
+    @commands.hybrid_command(
+        name="rmprefix", description="Removes the custom prefix - Needs admin permissions."
+    )
+    @commands.has_permissions(administrator=True)
+    async def rmprefix(self, ctx):
+        """
+        Removes the custom prefix for the bot commands in the server.
+
+        Args:
+            ctx (discord.ext.commands.Context): The context of the command.
+
+        Returns:
+            None
+        """
+        prefixes_file = "prefixes.csv"
+        prefix_folder = "resources"
+        prefixes_file_path = os.path.join(prefix_folder, prefixes_file)
+
+        # Check if the prefixes file exists
+        if not exists(prefixes_file_path):
+            # Send error message if the file doesn't exist
+            await ctx.send("Prefix-savefile not found", ephemeral=True)
+            return
+
+        # Other bot processes share the file, hold its lock from reading to writing
+        with file_lock(prefixes_file_path):
+            existing_prefixes = {}
+
+            # Read existing prefixes from the CSV file
+            with open_file(prefixes_file_path, "r") as file:
+                reader = csv.DictReader(file)
+                for row in reader:
+                    existing_prefixes[int(row["ServerID"])] = row["Prefix"]
+
+            # Check if the current server has a custom prefix
+            found = ctx.guild.id in existing_prefixes
+            if found:
+                # Remove the custom prefix for the current server
+                existing_prefixes.pop(ctx.guild.id)
+
+                # Write the updated prefixes to the CSV file
+                with atomic_write(prefixes_file_path) as file:
+                    fieldnames = ["ServerID", "Prefix"]
+                    writer = csv.DictWriter(file, fieldnames=fieldnames)
+                    writer.writeheader()
+                    for server_id, prefix in existing_prefixes.items():
+                        writer.writerow({"ServerID": server_id, "Prefix": prefix})
+
+        if not found:
+            # Send error message if the prefix doesn't exist for the server
+            await ctx.send("Prefix not found", ephemeral=True)
+            return
+        prefixes.remove(ctx.guild.id)
+
+        # Send confirmation message
+        await ctx.send("Custom prefix removed")
+
+    # manually sync the command tree if necessary, "force" syncs even if nothing changed
+    @commands.command(description="sync the slash commands", hidden=True)
+    @commands.is_owner()
+    async def syncslash(self, ctx, mode: str = ""):
+        if ctx.author.id == 150721477480546304:
+            try:
+                synced = await tree_sync.sync_all(self.bot.tree, force=mode == "force")
+                if synced:
+                    await ctx.send(f"Synced {', '.join(synced)}.")
+                else:
+                    await ctx.send("Commands unchanged, nothing to sync.")
+            except discord.Forbidden:
+                await ctx.send("Unexpected forbidden from application scope.")
+        else:
+            await ctx.send("You must be the owner to use this command")
+
+    # Show the time to first response of every command
+    @commands.command(description="show the time to first response per command", hidden=True)
+    @commands.is_owner()
+    async def ttfb(self, ctx):
+        rows = self.bot.pipeline.report()
+        if not rows:
+            await ctx.send("No timings recorded yet.")
+            return
+        from tabulate import tabulate
+
+        headers = ["Command", "Calls", "Deferred", "p50 ms", "p95 ms", "Max ms"]
+        await ctx.send(f"```{tabulate(rows, headers=headers)}```")
+
+    # Show the latency, guilds and events of every shard
+    @commands.command(description="show latency, guilds and events per shard", hidden=True)
+    @commands.is_owner()
+    async def shards(self, ctx):
+        from tabulate import tabulate
+
+        headers = ["Shard", "Guilds", "Latency ms", "Events", "Events/s"]
+        await ctx.send(f"```{tabulate(self.bot.shard_metrics.report(), headers=headers)}```")
+
+    # Show the queue and counters of the worker pool
+    @commands.command(description="show the worker pool's queue and counters", hidden=True)
+    @commands.is_owner()
+    async def workers(self, ctx):
+        from tabulate import tabulate
+
+        await ctx.send(f"```{tabulate(self.bot.worker_pool.stats().items())}```")
+
+    # Show the commands and buttons that blocked the event loop the longest
+    @commands.command(description="show what blocked the event loop", hidden=True)
+    @commands.is_owner()
+    async def lag(self, ctx):
+        from tabulate import tabulate
+
+        monitor = self.bot.loop_monitor
+        if monitor is None:
+            await ctx.send("The loop monitor is turned off.")
+            return
+        rows = monitor.report()[:15]
+        headers = ["Handler", "Stalls", "Blocked ms"]
+        await ctx.send(
+            f"Worst lag: {round(monitor.worst * 1000)} ms\n"
+            f"```{tabulate(rows, headers=headers)}```"
+        )
+
+    # Show the storage I/O of every command and button
+    @commands.command(description="show the storage I/O per command", hidden=True)
+    @commands.is_owner()
+    async def io(self, ctx):
+        report = "\n".join(io_stats.report())
+        await ctx.send(f"```{report[:1990]}```")
+
+    # Show the views still alive and the pending character creations
+    @commands.command(description="show live views and creation sessions", hidden=True)
+    @commands.is_owner()
+    async def views(self, ctx):
+        from tabulate import tabulate
+
+        rows = live_views.report()
+        headers = ["View", "Live", "Created", "~KiB", "Top guild"]
+        sessions = self.bot.creation_sessions.stats()
+        await ctx.send(
+            f"```{tabulate(rows, headers=headers)}```"
+            f"Creation sessions: {sessions['active']} active, {sessions['started']} started, "
+            f"{sessions['completed']} completed, {sessions['abandoned']} abandoned, "
+            f"~{round(sessions['memory_bytes'] / 1024, 1)} KiB"
+        )
+
+    # Profile the running bot: "start [seconds]", "stop" or "dump", the report comes as a file
+    @commands.command(description="profile CPU and allocations of the running bot", hidden=True)
+    @commands.is_owner()
+    async def profile(self, ctx, action: str = "dump", seconds: float = 60):
+        profiler = self.bot.profiler
+        action = action.lower()
+        if action == "start":
+            if profiler.running:
+                await ctx.send("The profiler is already running.")
+                return
+            seconds = profiler.start(seconds)
+            await ctx.send(f"Profiling for up to {seconds:g} seconds.")
+            return
+        if action == "stop":
+            # Stopping takes the final allocation snapshot, keep it off the loop
+            if not await asyncio.to_thread(profiler.stop):
+                await ctx.send("The profiler isn't running.")
+                return
+        elif action != "dump":
+            await ctx.send("Use start [seconds], stop or dump.")
+            return
+        report = await asyncio.to_thread(profiler.dump)
+        if report is None:
+            await ctx.send("Nothing profiled yet, start the profiler first.")
+            return
+        await ctx.send(
+            "Profile of the " + ("running" if profiler.running else "last") + " window:",
+            file=discord.File(io.BytesIO(report.encode()), filename="profile.txt"),
+        )
+
+    # Swap an extension for its current code without reconnecting
+    @commands.command(description="reload a command extension", hidden=True)
+    @commands.is_owner()
+    async def reload(self, ctx, extension: str):
+        name = extension if extension.startswith("commands.") else f"commands.{extension}"
+        try:
+            await self.bot.reload_extension(name)
+        except commands.ExtensionError as e:
+            await ctx.send(f"Couldn't reload {name}: {e}")
+            return
+        await ctx.send(f"Reloaded {name}.")
+
+
+async def setup(bot):
+    await bot.add_cog(Admin(bot))
@@ -0,0 +1,758 @@
+import asyncio
+import csv
+import os
+from typing import Literal, Optional
+import discord
+from discord import app_commands
+from discord.ext import commands
+from character import Character
+from services.character_index import SAVE_SUFFIX, characters, saves_dir
+from services.character_log import CREATED, DELETED, LEVELED, character_log, describe
+from services.edit_queue import edit_queue
+from services.sessions import SessionLimitError
+from services.stat_table import stats_blocks
+from services.storage import file_lock
+from services.leveling import MAX_LEVEL, METHOD_AVERAGE, METHOD_ROLL, LevelUp
+from services.io_stats import isfile, listdir, open_file
+from services.live_views import TrackedView
+
+
+# Largest savefile accepted by /import_char in bytes
+MAX_IMPORT_SIZE = 8 * 1024
+# Changes listed by /history
+HISTORY_LINES = 15
+# Reply to a prefix /lvl with levels out of range
+LEVELS_ERROR = f"Levels need to be between 1 and {MAX_LEVEL - 1}."
+
+
+# Helper function to get the ID of the character creator
+async def get_character_creator_id(char_name, server_id):
+    """
+    Get the ID of the user who created the character.
+
+    Args:
+        char_name (str): The name of the character.
+        server_id (int): The ID of the server where the character belongs.
+
+    Returns:
+        int: The ID of the user who created the character.
+    """
+    # Look up the character's stats file in the server's character index
+    filepath = characters.filepath(server_id, char_name)
+
+    # Check if the character's stats file exists
+    if filepath is None or not isfile(filepath):
+        return None
+    else:
+        # Load the creator ID from the CSV file
+        with open_file(filepath, newline="") as file:
+            reader = csv.DictReader(file)
+            for row in reader:
+                creator_id = None
+                if row["Name"].lower() == char_name.lower():
+                    if creator_id is None:
+                        creator_id = row["CreatorID"]
+                        return creator_id
+    return None
+
+
+def split_level_args(server_id, text):
+    """
+    Split the levels and method off the end of a prefix /lvl or /lvl_party input.
+
+    Names can contain spaces, so a prefix command gets its whole input as
+    the name, e.g. "Sir Bob 3 avg". An input naming a saved character as a
+    whole, like a character called "Bob 2", is left alone.
+
+    Args:
+        server_id (int): The ID of the server, to look the name up in.
+        text (str): The rest of the command.
+
+    Returns:
+        tuple: The name or names, the levels and the method, the name is None if the levels are out of range.
+    """
+    text = text.strip()
+    if text in characters.guild(server_id):
+        return text, 1, None
+    words = text.split()
+    method = None
+    levels = 1
+    if len(words) > 1 and words[-1].lower() in (METHOD_AVERAGE, METHOD_ROLL):
+        method = words.pop().lower()
+    if len(words) > 1 and words[-1].isdigit():
+        levels = int(words.pop())
+        if not 1 <= levels <= MAX_LEVEL - 1:
+            return None, levels, method
+    return " ".join(words), levels, method
+
+
+class Characters(commands.Cog):
+    """Creating, showing, leveling and deleting characters."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.hybrid_command(
+        name="roll_char",
+        description="Create a character using dice rolls. Excludes the lowest roll! E.g. /roll_char 4d6 bob",
+    )
+    async def roll(self, ctx: discord.Interaction, roll_input: str, character_name: str):
+        """
+        Roll character stats based on input and provide an option to reroll.
+
+        Args:
+            ctx (discord.Interaction): The context of the command.
+            roll_input (str): Input specifying the number of dice and sides (format: 'XdY').
+            character_name (str): The name of the character being created.
+
+        Raises:
+            ValueError: If the input format for 'roll_input' is invalid.
+            FileNotFoundError: If the character name already exists in the server directory.
+
+        Returns:
+            None
+        """
+        from components.racebuttons import RCView
+
+        try:
+            try:
+                # Parse input to get number of dice and sides
+                num_dice, sides = map(int, roll_input.split("d"))
+            except ValueError:
+                # Handle invalid input format
+                await ctx.send(
+                    "Invalid input format. Please use the format 'XdY', where X is the number of dice and Y is the number of sides.",
+                    ephemeral=True,
+                    delete_after=20,
+                )
+                return
+
+            # Check if the number of dice is positive
+            if num_dice <= 0:
+                await ctx.send(
+                    "Please specify a positive number of dice.",
+                    ephemeral=True,
+                    delete_after=10,
+                )
+                return
+
+            # Check if the character name already exists, in any casing
+            if character_name in characters.guild(ctx.guild.id):
+                await ctx.send(
+                    f"Character with name '{character_name}' already exists. Please choose a different name.",
+                    ephemeral=True,
+                    delete_after=30,
+                )
+                return
+
+            # Start a creation session, which holds the state for every step of the flow
+            try:
+                session = self.bot.creation_sessions.start(ctx, character_name, num_dice, sides)
+            except SessionLimitError as e:
+                await ctx.send(str(e), ephemeral=True, delete_after=30)
+                return
+
+            # Create an instance of RCView for race selection
+            raceview = await RCView.create(session)
+
+            # Send message to choose race with the created view, the views handle their own timeouts
+            session.message = await ctx.send("Choose your race:", view=raceview)
+        except Exception as e:
+            # Handle any other exceptions
+            await ctx.send(f"An error occurred: {e}", ephemeral=True)
+
+    @commands.hybrid_command(
+        name="random_char",
+        description="Let the bot create a random character for you with 4d6 dice.",
+    )
+    async def random_roll(self, ctx: discord.Interaction, *, character_name: str):
+        """
+        Create a character with a random class and race, using 4d6 dice rolls.
+
+        Args:
+            ctx (discord.Interaction): The context object representing the invocation context.
+            character_name (str): The name of the character.
+
+        Returns:
+            None
+        """
+        from components.rnd_char import RandView
+
+        try:
+            server_id = (
+                ctx.guild.id
+            )  # Get the ID of the server where the command was invoked
+            invoker_id = ctx.author.id  # Get the ID of the user who invoked the command
+
+            # Check if the character name already exists, in any casing
+            if character_name in characters.guild(server_id):
+                await ctx.send(
+                    f"Character with name '{character_name}' already exists. Please choose a different name.",
+                    ephemeral=True,
+                    delete_after=30,
+                )
+                return
+
+            # Create a RandView instance to handle the character creation UI
+            randomview = RandView(ctx, character_name, server_id, invoker_id)
+
+            # Send a message with the UI for creating a character and await a response
+            random_char_msg = await randomview.create_char()
+            full_msg = await ctx.send(
+                f"{random_char_msg}Would you like to save this character?", view=randomview
+            )
+
+            # Wait for a button click from the user, with a timeout of 120 seconds
+            try:
+                await self.bot.wait_for(
+                    "interaction",
+                    timeout=120,
+                    check=lambda interaction: (
+                        interaction.type == discord.InteractionType.component
+                        and ctx.message == random_char_msg
+                        and interaction.user == ctx.author,
+                    ),
+                )
+            except asyncio.TimeoutError:
+                # Handle timeout by disabling buttons and updating the message content
+                await randomview.on_timeout()
+                await random_char_msg.edit(content="Selection timed out", view=randomview)
+        except Exception as e:
+            # Handle any exceptions that occur during the execution of the command
+            await ctx.send(f"An error occurred: {e}", ephemeral=True)
+
+    @commands.hybrid_command(
+        name="stats", description="Display character stats. E.g. /stats bob"
+    )
+    async def stats(self, ctx, *, name: str):
+        """
+        Display character stats.
+
+        Args:
+            ctx: The context object representing the invocation context.
+            name (str): The name of the character.
+        """
+        try:
+            # Resolve the name through the server's character index
+            char_name = characters.resolve(ctx.guild.id, name)
+            if char_name is None:
+                await ctx.send(
+                    f"'{name}' savefile not found.", ephemeral=True, delete_after=15
+                )
+                return
+            await Character.display_character_stats(ctx, char_name, ctx.guild.id)
+        except Exception as e:
+            await ctx.send(f"An error occurred: {e}", ephemeral=True)
+
+    @stats.autocomplete("name")
+    async def character_name_autocomplete(self, interaction: discord.Interaction, current: str):
+        """
+        Suggest saved characters of the server whose name starts with the typed text.
+
+        Args:
+            interaction (discord.Interaction): The autocomplete interaction.
+            current (str): The text typed so far.
+
+        Returns:
+            list: Up to 25 choices of character names.
+        """
+        if interaction.guild is None:
+            return []
+        return [
+            app_commands.Choice(name=char_name, value=char_name)
+            for char_name in characters.complete(interaction.guild.id, current)
+        ]
+
+    @commands.hybrid_command(
+        name="import_char",
+        description="Import a character from a savefile. Can be used once a minute.",
+    )
+    @commands.cooldown(1, 60, commands.BucketType.user)
+    async def import_char(self, ctx, sheet: discord.Attachment):
+        """
+        Import a character from an uploaded CSV savefile.
+
+        Args:
+            ctx: The context object representing the invocation context.
+            sheet (discord.Attachment): The uploaded savefile.
+        """
+        try:
+            # Only accept small CSV files, a savefile is well below a kilobyte
+            if not sheet.filename.endswith(".csv") or sheet.size > MAX_IMPORT_SIZE:
+                await ctx.send(
+                    f"Please upload a CSV savefile smaller than {MAX_IMPORT_SIZE // 1024} KB.",
+                    ephemeral=True,
+                    delete_after=20,
+                )
+                return
+            content = await sheet.read()
+            char_name = await Character.import_from_csv(
+                content, ctx.guild.id, ctx.author.id
+            )
+            await ctx.send(f"Character '{char_name}' has been imported.")
+        except ValueError as e:
+            await ctx.send(f"Couldn't import the savefile: {e}", ephemeral=True)
+        except Exception as e:
+            await ctx.send(f"An error occurred: {e}", ephemeral=True)
+
+    @commands.hybrid_command(
+        name="lvl",
+        description="Level up a character, several levels at once if you like. E.g. /lvl bob 3 avg",
+    )
+    async def lvl(
+        self,
+        ctx: discord.Interaction,
+        *,
+        name: str,
+        levels: commands.Range[int, 1, 19] = 1,
+        method: Optional[Literal["avg", "roll"]] = None,
+    ):
+        """
+        Increases the Character's health and if applicable, grants two stat points per ASI the user can use to increase stats of their choosing.
+
+        Args:
+        - ctx (commands.Context): The context of the command.
+        - name (str): The name of the character to level up.
+        - levels (int): The number of levels to gain, 1 by default.
+        - method (str): "avg" or "roll" to increase the health, the user is asked if not given.
+
+        Returns:
+        - None
+        """
+        if ctx.interaction is None:
+            # The prefix form passes everything as the name, e.g. "!lvl Sir Bob 3 avg"
+            name, levels, method = split_level_args(ctx.guild.id, name)
+            if name is None:
+                await ctx.send(LEVELS_ERROR, ephemeral=True, delete_after=15)
+                return
+        await self.level_up(ctx, [name], levels, method)
+
+    # Suggest character names while typing, same as /stats
+    lvl.autocomplete("name")(character_name_autocomplete)
+
+    @commands.hybrid_command(
+        name="lvl_party",
+        description="Level up several characters at once. E.g. /lvl_party bob,alice 2 roll",
+    )
+    async def lvl_party(
+        self,
+        ctx: discord.Interaction,
+        *,
+        names: str,
+        levels: commands.Range[int, 1, 19] = 1,
+        method: Optional[Literal["avg", "roll"]] = None,
+    ):
+        """
+        Levels up every character of a party, with a single choice of how to increase their health.
+
+        Args:
+        - ctx (commands.Context): The context of the command.
+        - names (str): The names of the characters, separated by commas.
+        - levels (int): The number of levels every character gains, 1 by default.
+        - method (str): "avg" or "roll" to increase the health, the user is asked if not given.
+
+        Returns:
+        - None
+        """
+        if ctx.interaction is None:
+            # The prefix form passes everything as the names, e.g. "!lvl_party Sir Bob, Alice 2"
+            names, levels, method = split_level_args(ctx.guild.id, names)
+            if names is None:
+                await ctx.send(LEVELS_ERROR, ephemeral=True, delete_after=15)
+                return
+        party = list(dict.fromkeys(part.strip() for part in names.split(",") if part.strip()))
+        if not party:
+            await ctx.send("Name at least one character, e.g. `/lvl_party bob,alice`.", ephemeral=True)
+            return
+        await self.level_up(ctx, party, levels, method)
+
+    async def level_up(self, ctx, names, levels, method):
+        """
+        Level up characters, computing every level in one pass and writing each savefile once.
+
+        The attribute points of all ability score improvements reached are
+        spent in a single follow-up view, one character after the other.
+
+        Args:
+            ctx (commands.Context): The context of the command.
+            names (list): The names of the characters.
+            levels (int): The number of levels every character gains.
+            method (str): "avg" or "roll", None to ask the user.
+        """
+        from components.lvl_buttons import MyView
+
+        try:
+            # Resolve and check every character before asking anything
+            targets = []
+            problems = []
+            for name in names:
+                # Resolve the name the character is stored under, regardless of casing
+                stored_name = characters.resolve(ctx.guild.id, name)
+                if stored_name is None:
+                    problems.append(f"'{name}' savefile not found.")
+                    continue
+                # Check if the user is authorized to level up the character
+                creator_id = await get_character_creator_id(stored_name, ctx.guild.id)
+                if str(ctx.author.id) != str(creator_id):
+                    problems.append(
+                        f"You are not authorized to level up {stored_name}. :pleading_face: "
+                    )
+                    continue
+                targets.append(stored_name)
+            if not targets:
+                await ctx.send("\n".join(problems), ephemeral=True, delete_after=15)
+                return
+
+            hp_msg = None
+            if method is None:
+                method, hp_msg = await self.ask_hp_method(ctx)
+                if method is None:
+                    return
+
+            results = []
+            for name in targets:
+                filepath = characters.filepath(ctx.guild.id, name)
+                # The lock waits for compactions of the server's log, so not on the loop
+                result = await asyncio.to_thread(
+                    self.level_character, filepath, name, levels, method, ctx.author.id
+                )
+                stats_blocks.invalidate(filepath)
+                results.append(result)
+
+            summary = "\n".join([result.summary(method) for result in results] + problems)
+            if len(results) == 1:
+                # Display the character's stats after leveling up
+                stats_message = await MyView.display_character_stats_lvl(
+                    ctx, results[0].name, ctx.guild.id
+                )
+                summary = f"{stats_message}{summary}"
+            if hp_msg is not None:
+                await edit_queue.edit(hp_msg, content=summary)
+            else:
+                await ctx.send(summary)
+
+            # Spend the attribute points of every ability score improvement in one view
+            queue = [(result.name, result.points) for result in results if result.points]
+            if queue:
+                first_name, points = queue.pop(0)
+                view = await MyView.create(ctx, first_name, None, max_clicks=points, queue=queue)
+                await view.send_message()
+        except Exception as e:
+            # Send an error message if any other exception occurs
+            await ctx.send(f"An error occurred: {e}", ephemeral=True)
+
+    async def ask_hp_method(self, ctx):
+        """
+        Ask the user whether to roll for health or take the average.
+
+        Args:
+            ctx (commands.Context): The context of the command.
+
+        Returns:
+            tuple: The chosen method and the message asking for it, the method is None if nobody chose in time.
+        """
+        # Create buttons for rolling HP or taking average
+        hp_roll = discord.ui.Button(
+            label="Roll", custom_id="rollbutton", style=discord.ButtonStyle.red
+        )
+        hp_avg = discord.ui.Button(
+            label="Average", custom_id="avgroll", style=discord.ButtonStyle.green
+        )
+        # Create a view for the buttons
+        hp_view = TrackedView(guild_id=ctx.guild.id)
+        hp_view.add_item(hp_avg)
+        hp_view.add_item(hp_roll)
+        # Send a message asking the user how to increase HP
+        hp_msg = await ctx.send(
+            "How would you like to increase your HP? Roll for it using your hit dice or take the average?",
+            view=hp_view,
+        )
+        choices = {
+            "rollbutton": (METHOD_ROLL, "You chose to roll"),
+            "avgroll": (METHOD_AVERAGE, "You chose to take the average"),
+        }
+        # Wait until the command invoker picks one of the buttons
+        while True:
+            try:
+                # Wait for an interaction within a timeout period
+                interaction = await self.bot.wait_for(
+                    "interaction",
+                    timeout=120,
+                    # Only clicks on this message, whoever clicked is checked below
+                    check=lambda interaction: (
+                        interaction.type == discord.InteractionType.component
+                        and interaction.message is not None
+                        and interaction.message.id == hp_msg.id
+                    ),
+                )
+            except asyncio.TimeoutError:
+                for item in hp_view.children:
+                    if isinstance(item, discord.ui.Button):
+                        item.style = discord.ButtonStyle.grey
+                        item.disabled = True
+                await edit_queue.edit(hp_msg, content="Selection timed out.", view=hp_view)
+                return None, hp_msg
+            if interaction.user != ctx.author:
+                await interaction.response.send_message(
+                    "You can't do that :thinking:", ephemeral=True, delete_after=15
+                )
+                continue
+            choice = choices.get(interaction.data.get("custom_id"))
+            if choice is None:
+                continue
+            # Disable buttons after selection
+            for item in hp_view.children:
+                if isinstance(item, discord.ui.Button):
+                    item.style = discord.ButtonStyle.grey
+                    item.disabled = True
+            # Edit the message to indicate the user's choice
+            await edit_queue.respond(interaction, content=choice[1], view=hp_view)
+            return choice[0], hp_msg
+
+
+    @commands.hybrid_command(
+        name="showall", description="Display all saved characters for the server."
+    )
+    async def showall(self, ctx):
+        """
+        Display all saved characters for the server.
+
+        Args:
+            ctx (discord.ext.commands.Context): The context object representing the invocation context.
+        """
+        try:
+            # Construct directory path based on server ID
+            server_dir = f"server_{ctx.guild.id}"
+            saves_dir = os.path.join("resources", "saves", server_dir)
+            # Get a list of files in the server directory
+            files = listdir(saves_dir)
+            # Extract character names from filenames
+            char_info = []
+            for filename in files:
+                # Skip the event log and anything else that isn't a savefile
+                if not filename.endswith(SAVE_SUFFIX):
+                    continue
+                # Load each character with the changes logged since its savefile was written
+                try:
+                    rows = character_log.load(os.path.join(saves_dir, filename))
+                except FileNotFoundError:
+                    continue  # Deleted while listing
+                if len(rows) < 2:
+                    continue  # Skip files with fewer than two rows
+                first_row = rows[0]
+                # Get the race from the first row of the file
+                race = first_row.get("Race", "")
+                class_name = first_row.get("Class", "")
+                # Extract character name from the filename
+                char_name = filename[: -len(SAVE_SUFFIX)]
+                char_lvl = first_row.get("Level", "")
+                # Append character name and race to the char_info list
+                char_info.append((char_name, race, class_name, char_lvl))
+            # Check if char_info is empty
+            if not char_info:
+                # Send message if no characters are found
+                await ctx.send("No characters found", ephemeral=True, delete_after=30)
+            else:
+                # Create a formatted list of character names and races
+                char_list = "\n".join(
+                    [
+                        f"• `Name`: {name}  `Race`: {race}  `Class`: {class_name}  `Level`: {char_lvl}"
+                        for name, race, class_name, char_lvl in char_info
+                    ]
+                )
+                # Send message with list of saved characters
+                await ctx.send(f"**`Saved characters`**:\n{char_list}")
+        except FileNotFoundError:
+            # Send message if no saves are found
+            await ctx.send("No saves yet")
+        except Exception as e:
+            # Send an error message if an exception occurs
+            await ctx.send(f"An error occurred: {e}", ephemeral=True)
+
+    @commands.hybrid_command(
+        name="rm", description="Remove saved character stats file. E.g. /rm bob"
+    )
+    async def rm(self, ctx, *, name: str):
+        """
+        Command to remove a saved character stats file.
+
+        Args:
+            ctx (discord.Context): The context of the command.
+            name (str): The name of the character whose stats file is to be removed.
+        """
+        from components.rm_buttons import RView
+
+        try:
+            # Resolve the name the character is stored under, regardless of casing
+            stored_name = characters.resolve(ctx.guild.id, name)
+            if stored_name is None:
+                await ctx.send(
+                    f"'{name}' savefile not found.", ephemeral=True, delete_after=20
+                )
+                return
+            name = stored_name
+            creator_id = await get_character_creator_id(name, ctx.guild.id)
+            if (
+                ctx.author.id != creator_id
+                and not ctx.author.guild_permissions.administrator
+            ):
+                # Send an error message if the user is not authorized
+                await ctx.send(
+                    "Either you are not authorized to delete this character or the savefile is corrupt. :pleading_face:\n If this was yours, contact an admin. They will be able to remove it",
+                    ephemeral=True,
+                    delete_after=20,
+                )
+                return
+            view = RView(ctx, name)  # Create an instance of RView
+            conf_msg = await ctx.send(  # Send confirmation message with the view
+                f"Are you sure you want to delete the savefile of '{name}'? :cry:",
+                view=view,
+            )
+            view.conf_msg = conf_msg  # Attach the confirmation message to the view
+            try:
+                interaction = await self.bot.wait_for(  # Wait for user response
+                    "button_click",
+                    timeout=60,
+                    check=lambda interaction: interaction.message == conf_msg
+                    and interaction.user == ctx.author,
+                )
+            except asyncio.TimeoutError:  # If timeout occurs
+                # Disable buttons and edit message to indicate timeout
+                await view.disable_buttons()
+                await conf_msg.edit(
+                    content="Deletion canceled due to timeout.", view=view, delete_after=120
+                )
+        except Exception as e:
+            # Catch any exceptions and send an error message
+            await ctx.send(f"An error occurred: {e}", ephemeral=True)
+
+    # Suggest character names while typing, same as /stats
+    rm.autocomplete("name")(character_name_autocomplete)
+
+    @staticmethod
+    def level_character(filepath, name, levels, method, user_id):
+        """
+        Level up a saved character and log the change.
+
+        Blocks on the files, so call it from a worker thread.
+
+        Args:
+            filepath (str): The path of the savefile.
+            name (str): The name of the character.
+            levels (int): How many levels to gain.
+            method (str): How to gain hit points, METHOD_AVERAGE or METHOD_ROLL.
+            user_id (int): The user leveling the character up.
+
+        Returns:
+            LevelUp: The result of the level up.
+        """
+        # Hold the lock from loading the character until the change is logged
+        with file_lock(filepath):
+            stats = character_log.load(filepath)
+            health = stats[0]["Health"]
+            result = LevelUp(name, stats, levels, method)
+            if result.gained:
+                # Log every level as one change
+                character_log.append(
+                    filepath,
+                    LEVELED,
+                    user_id,
+                    before={"Level": str(result.old_level), "Health": health},
+                    after={"Level": str(result.new_level), "Health": stats[0]["Health"]},
+                )
+        return result
+
+    @staticmethod
+    def log_filepath(ctx, name):
+        """
+        Build the savefile path of a character, deleted ones included.
+
+        Returns:
+            str: The path, None if the name can't be a savefile.
+        """
+        # Resolve the name the character is stored under, regardless of casing
+        stored_name = characters.resolve(ctx.guild.id, name) or name.strip()
+        if not stored_name or os.sep in stored_name or "/" in stored_name or stored_name.startswith("."):
+            return None
+        return os.path.join(saves_dir(ctx.guild.id), f"{stored_name}{SAVE_SUFFIX}")
+
+    @commands.hybrid_command(
+        name="history", description="Show the last changes of a character. E.g. /history bob"
+    )
+    async def history(self, ctx, *, name: str):
+        """
+        Show the latest logged changes of a character, deleted characters included.
+
+        Args:
+            ctx (commands.Context): The context of the command.
+            name (str): The name of the character.
+        """
+        try:
+            filepath = self.log_filepath(ctx, name)
+            events = []
+            if filepath is not None:
+                events = await asyncio.to_thread(character_log.history, filepath)
+            if not events:
+                await ctx.send(f"No history found for '{name}'.", ephemeral=True, delete_after=20)
+                return
+            lines = [
+                f"<t:{int(event['time'])}:f> {describe(event)}"
+                for event in events[-HISTORY_LINES:]
+            ]
+            await ctx.send(f"**`History of {events[-1]['name']}`**:\n" + "\n".join(lines))
+        except Exception as e:
+            await ctx.send(f"An error occurred: {e}", ephemeral=True)
+
+    @commands.hybrid_command(
+        name="undo", description="Undo the last change of a character. E.g. /undo bob"
+    )
+    async def undo(self, ctx, *, name: str):
+        """
+        Undo the last change of a character: a level up, spent attribute points, its creation or deletion.
+
+        Args:
+            ctx (commands.Context): The context of the command.
+            name (str): The name of the character.
+        """
+        try:
+            filepath = self.log_filepath(ctx, name)
+            if filepath is None:
+                await ctx.send(f"Nothing to undo for '{name}'.", ephemeral=True, delete_after=20)
+                return
+
+            def allowed(creator_id):
+                return (
+                    str(ctx.author.id) == str(creator_id)
+                    or ctx.author.guild_permissions.administrator
+                )
+
+            try:
+                undone = await asyncio.to_thread(character_log.undo, filepath, ctx.author.id, allowed)
+            except PermissionError:
+                await ctx.send(
+                    "Only the creator of a character or an admin can undo its changes. :pleading_face:",
+                    ephemeral=True,
+                    delete_after=20,
+                )
+                return
+            if undone is None:
+                await ctx.send(f"Nothing left to undo for '{name}'.", ephemeral=True, delete_after=20)
+                return
+            _, event = undone
+            # Undoing a creation or deletion removes or brings back the character
+            if event["kind"] == CREATED:
+                characters.add(ctx.guild.id, event["name"])
+            elif event["kind"] == DELETED:
+                characters.remove(ctx.guild.id, event["name"])
+            stats_blocks.invalidate(characters.filepath(ctx.guild.id, event["name"]) or filepath)
+            await ctx.send(f"{event['name']}: {describe(event)}.")
+        except Exception as e:
+            await ctx.send(f"An error occurred: {e}", ephemeral=True)
+
+    # Suggest character names while typing, same as /stats
+    history.autocomplete("name")(character_name_autocomplete)
+    undo.autocomplete("name")(character_name_autocomplete)
+
+
+async def setup(bot):
+    await bot.add_cog(Characters(bot))
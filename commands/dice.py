@@ -0,0 +1,249 @@
+import re
+from random import randint
+from discord.ext import commands
+from services.sampling import (
+    MAX_COUNTED_VALUES,
+    MAX_TRIALS,
+    roll_dice,
+    roll_dice_counts,
+    sample_unique,
+    summarize_draws,
+)
+from services.workers import JobRejected
+
+
+# Most numbers drawn by one /random
+MAX_DRAWS = MAX_TRIALS
+# Batches up to this size are listed, larger ones are summarized
+MAX_LISTED_DRAWS = 20
+# Most distinct numbers drawn by one /random ... unique
+MAX_UNIQUE_DRAWS = 25
+# Most dice listed one by one by /roll, more are rolled in a worker and summarized
+MAX_LISTED_ROLLS = 200
+# Cost of one binomial draw in units of one die roll
+BINOMIAL_COST = 4
+
+
+class Dice(commands.Cog):
+    """Dice rolls and random numbers."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.hybrid_command(
+        name="roll",
+        description="Roll X number of dice with Y number of sides and an optional modifier. E.g. /roll 4d6 or /roll 4d6+2",
+    )
+    async def norm_roll(self, ctx, *, roll_input):
+        """
+        Roll a specified number of dice with a specified number of sides and an optional modifier.
+
+        Args:
+            ctx: The context object representing the invocation context.
+            roll_input (str): The input specifying the number of dice, sides, and optional modifier (e.g., '2d6', '4d6+2', '3d10-1').
+        """
+        # Define a regular expression pattern to match the roll input format
+        pattern = r"(\d+)d(\d+)([+-]\d+)?"
+
+        # Try to match the input against the pattern
+        match = re.match(pattern, roll_input)
+        if match:
+            # Extract the number of dice, sides, and modifier (if any)
+            num_dice = int(match.group(1))  # Extract the number of dice
+            sides = int(match.group(2))  # Extract the number of sides
+            modifier_str = match.group(3)  # Extract the modifier as a string
+            modifier = 0  # Initialize modifier to 0
+            if modifier_str:
+                modifier = int(modifier_str)  # Convert the modifier string to an integer
+
+            # Check if the number of dice is positive
+            if num_dice <= 0:
+                await ctx.send(
+                    "Please specify a positive number of dice.",
+                    ephemeral=True,
+                    delete_after=10,
+                )
+                return
+
+            # Check if the dice have sides
+            if sides <= 0:
+                await ctx.send(
+                    "Please specify a positive number of sides.",
+                    ephemeral=True,
+                    delete_after=10,
+                )
+                return
+
+            # Too many dice to list, roll them in a worker process and summarize
+            if num_dice > MAX_LISTED_ROLLS:
+                try:
+                    total, lowest, highest, counts = await self.bot.worker_pool.run(
+                        ctx.guild.id if ctx.guild else None,
+                        (num_dice, roll_dice, (num_dice, sides)),
+                        # Drawing the count of every face is exact too and doesn't grow with the dice
+                        (sides * BINOMIAL_COST, roll_dice_counts, (num_dice, sides)),
+                    )
+                except JobRejected as e:
+                    await ctx.send(str(e), ephemeral=True, delete_after=20)
+                    return
+                lines = [
+                    f"You rolled {num_dice:,}d{sides}.",
+                    f"Lowest: {lowest}, highest: {highest}, average: {total / num_dice:.2f}",
+                ]
+                if counts is not None:
+                    lines.append(
+                        "```"
+                        + "\n".join(
+                            f"{face:>2}: {count:,}" for face, count in enumerate(counts, start=1)
+                        )
+                        + "```"
+                    )
+                lines.append(
+                    f"Total with modifier: {total + modifier:,}" if modifier_str else f"Total: {total:,}"
+                )
+                await ctx.send("\n".join(lines))
+                return
+
+            # Roll the dice and calculate the total
+            rolls = [randint(1, sides) for _ in range(num_dice)]  # Roll the dice
+            total = sum(rolls) + modifier  # Calculate the total by adding the modifier
+
+            # Send the roll results to the channel
+            if num_dice > 1:
+                if not modifier_str:
+                    await ctx.send(
+                        f"You rolled: {rolls}\nTotal: {total}"
+                    )  # Send rolls and total
+                else:
+                    await ctx.send(
+                        f"You rolled: {rolls}\nTotal with modifier: {total}"
+                    )  # Send rolls and total with modifier
+            else:
+                if not modifier_str:
+                    await ctx.send(
+                        f"You rolled: {rolls}"
+                    )  # Send rolls only if one die rolled
+                else:
+                    await ctx.send(
+                        f"You rolled: {rolls}\nTotal with modifier: {total}"
+                    )  # Send rolls and total with modifier
+        else:
+            # Send error message for invalid input format
+            await ctx.send(
+                "Invalid input format. Please use the format 'XdY' or 'XdY+/-Z', where X is the number of dice, Y is the number of sides, and Z is the modifier.",
+                ephemeral=True,
+                delete_after=20,
+            )
+
+    @commands.hybrid_command(
+        name="random",
+        description="Roll a random number. E.g /random 1-100, /random 69 or /random 1-100 x1000.",
+    )
+    async def random(self, ctx, *, number):
+        """
+        Generates random numbers within a specified range or up to a specified number.
+
+        Adding `x<n>` draws n numbers. Up to MAX_LISTED_DRAWS of them are listed,
+        larger batches are summarized with counts that are sampled directly, so
+        the time doesn't depend on n. Adding `unique` draws distinct numbers.
+
+        Args:
+            ctx (discord.Context): The context object for the command.
+            number (str): Input provided by the user in the format "<min>-<max> [x<n>] [unique]" or "<max> [x<n>] [unique]".
+
+        Returns:
+            None
+        """
+        # Regular expression pattern to match the input format
+        pattern = r"(\d+)(-)?(\d+)?(?:\s*x(\d+))?(\s+unique)?"
+        match = re.fullmatch(pattern, number.strip(), re.IGNORECASE)
+
+        if match:
+            # Extract the first number from the input
+            x = int(match.group(1))
+
+            # Check if the first number is positive
+            if x <= 0:
+                await ctx.send(
+                    "Please enter a positive number", ephemeral=True, delete_after=20
+                )
+                return
+
+            # If the input contains a range (e.g., "min-max")
+            if match.group(2):
+                # Extract the second number from the input
+                y = int(match.group(3) or 0)
+
+                # Check if the second number is positive and greater than or equal to the first number
+                if y <= 0 or y < x:
+                    await ctx.send(
+                        "Please enter a positive number that's equal or greater than the first number.",
+                        ephemeral=True,
+                        delete_after=20,
+                    )
+                    return
+            else:
+                # If the input contains only one number, the range starts at 1
+                x, y = 1, x
+
+            draws = int(match.group(4) or 1)
+            if draws <= 0 or draws > MAX_DRAWS:
+                await ctx.send(
+                    f"Please draw between 1 and {MAX_DRAWS:,} numbers.",
+                    ephemeral=True,
+                    delete_after=20,
+                )
+                return
+
+            if match.group(5):
+                # Distinct numbers, drawn without building the range
+                if draws > MAX_UNIQUE_DRAWS or draws > y - x + 1:
+                    await ctx.send(
+                        f"Please draw at most {MAX_UNIQUE_DRAWS} unique numbers and no more than the range holds.",
+                        ephemeral=True,
+                        delete_after=20,
+                    )
+                    return
+                numbers = sample_unique(x, y, draws)
+                await ctx.send(", ".join(str(n) for n in numbers))
+            elif draws <= MAX_LISTED_DRAWS:
+                # Generate a random integer within the specified range for every draw
+                await ctx.send(", ".join(str(randint(x, y)) for _ in range(draws)))
+            else:
+                try:
+                    buckets, smallest, largest, mean = await self.bot.worker_pool.run(
+                        ctx.guild.id if ctx.guild else None,
+                        (
+                            min(y - x + 1, MAX_COUNTED_VALUES) * BINOMIAL_COST,
+                            summarize_draws,
+                            (x, y, draws),
+                        ),
+                    )
+                except JobRejected as e:
+                    await ctx.send(str(e), ephemeral=True, delete_after=20)
+                    return
+                lines = [f"Drew {draws:,} numbers between {x} and {y}."]
+                lines.append(
+                    f"Lowest: {smallest}, highest: {largest}"
+                    + (f", average: {mean:.2f}" if mean is not None else "")
+                )
+                lines.append("```")
+                label_width = max(len(f"{first}-{last}") for first, last, _ in buckets)
+                for first, last, count in buckets:
+                    label = str(first) if first == last else f"{first}-{last}"
+                    lines.append(
+                        f"{label:<{label_width}}  {count:>{len(f'{draws:,}')},}  ({count / draws:.1%})"
+                    )
+                lines.append("```")
+                await ctx.send("\n".join(lines))
+        else:
+            # If the input format is invalid, send an error message
+            await ctx.send(
+                "Invalid input. Please use '/random <number>' or '/random <min>-<max>', optionally followed by 'x<count>' and 'unique', and use only positive numbers.",
+                ephemeral=True,
+                delete_after=20,
+            )
+
+
+async def setup(bot):
+    await bot.add_cog(Dice(bot))
@@ -0,0 +1,71 @@
+import asyncio
+import os
+from random import choice
+import discord
+from discord.ext import commands
+from services.media_cache import media
+from services.sampling import MAX_TRIALS, binomial
+
+
+# Gif shown by /coinflip, served from the CDN while a cached upload is still there
+COINFLIP_GIF = os.path.join("resources", "coin-flip.gif")
+# Most coins flipped by one /coinflip
+MAX_DRAWS = MAX_TRIALS
+
+
+class Fun(commands.Cog):
+    """Commands just for fun."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.hybrid_command(name="coinflip", description="Flip a coin! E.g /coinflip or /coinflip 1000.")
+    async def coinflip(self, ctx, flips: int = 1):
+        """
+        Flips a coin, or counts heads and tails of many flips.
+
+        Args:
+            ctx (discord.Context): The context object for the command.
+            flips (int): The number of coins to flip.
+
+        Returns:
+            None
+        """
+        try:
+            if flips <= 0 or flips > MAX_DRAWS:
+                await ctx.send(
+                    f"Please flip between 1 and {MAX_DRAWS:,} coins.",
+                    ephemeral=True,
+                    delete_after=20,
+                )
+                return
+            if flips > 1:
+                # The number of heads is a single binomial draw, however many coins are flipped
+                heads = binomial(flips, 0.5)
+                tails = flips - heads
+                await ctx.send(
+                    f"Flipped {flips:,} coins: **{heads:,}** Heads ({heads / flips:.2%}) "
+                    f"and **{tails:,}** Tails ({tails / flips:.2%})."
+                )
+                return
+            coin = choice(
+                ["Heads", "Tails"]
+            )  # Using random.choice to return either Heads or Tails
+            # One message showing the gif, uploaded only if there is no cached URL
+            message = await media.send_embed(
+                ctx, COINFLIP_GIF, discord.Embed(description="Flipping a coin...")
+            )
+            await asyncio.sleep(
+                1.45
+            )  # Wait for the gif to loop roughly once before displaying the result
+            # Without attachments=[] a freshly uploaded gif stays as a loose file under the result
+            await message.edit(embed=discord.Embed(description=f"**{coin}!**"), attachments=[])
+            if message.attachments:
+                # That removes the upload from the CDN too
+                media.forget(COINFLIP_GIF, message)
+        except Exception as e:
+            await ctx.send(f"An error occurred: {e}")
+
+
+async def setup(bot):
+    await bot.add_cog(Fun(bot))
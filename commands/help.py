@@ -7,21 +7,47 @@ class CustomHelpCommand(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self._embed = None  # The help embed, built on first use
+
+    @commands.hybrid_command(
+        name="help", description="Shows all available commands and how to use them."
+    )
+    async def help(self, ctx):
+        try:
+            help_embed = await self.send_bot_help(ctx, None)
+            await ctx.send(embed=help_embed, ephemeral=True)
+        except Exception as e:
+            await ctx.send(f"An error occurred: {e}", ephemeral=True)
 
     async def send_bot_help(self, ctx, mapping):
         """
         Send help message for the bot.
 
+        The embed never changes, so it's built once and the same instance is
+        sent every time.
+
         Args:
             mapping (dict): Mapping of cogs to their commands.
         """
+        if self._embed is None:
+            self._embed = self.build_embed()
+        return self._embed
+
+    def build_embed(self):
+        """
+        Build the help embed.
+
+        Returns:
+            discord.Embed: The embed listing every command.
+        """
         # Create an Embed instance for formatting the help message
         embed = discord.Embed(
             title="Command Help",  # Title of the embed
             description="`Prefix`:\n"
             "This Bot uses '`/`' as a prefix\n"
             "However you can set a custom prefix using /setprefix `insert custom prefix`. E.g. `/setprefix !`\n"
-            "Now you can use your custom prefix together with slash commands."
+            "Now you can use your custom prefix together with slash commands.\n"
+            "/rmprefix removes the custom prefix again. Both need admin permissions."
             "\n"
             "\n"
             "**Available commands:**",  # Description of the embed
@@ -63,13 +89,22 @@ class CustomHelpCommand(commands.Cog):
             inline=False,  # Display the field in a new line
         )
 
+        # Add a field for importing a character
+        embed.add_field(
+            name="Importing a character savefile:",  # Title of the field
+            value="`/import_char` - attach a savefile (`.csv`) of a character to add it to this server.\n"
+            "You become the creator of the imported character. Can be used once a minute.",  # Value of the field
+            inline=False,  # Display the field in a new line
+        )
+
         # Add a field for lvling up
         embed.add_field(
             name="Adding stats/Lvling up:",  # Title of the field
             value=(
-                "`/lvl Name` - where `Name` is the name of your character.\n"
-                "Example: `/lvl bob`.\n"
-                "Levels up your character and increases their health. This command also allows you to add 2 stat points of your choosing to your character, if eligible for an ASI."
+                "`/lvl Name [Levels] [avg|roll]` - where `Name` is the name of your character.\n"
+                "Example: `/lvl bob` or `/lvl bob 3 avg`.\n"
+                "Levels up your character and increases their health. This command also allows you to add 2 stat points of your choosing to your character for every ASI reached.\n"
+                "`/lvl_party Names [Levels] [avg|roll]` levels up several characters at once, e.g. `/lvl_party bob,alice 2 roll`."
             ),  # Value for the field
             inline=False,
         )
@@ -89,34 +124,36 @@ class CustomHelpCommand(commands.Cog):
             inline=False,  # Display the field in a new line
         )
 
+        # Add a field for the history and undo of a character
+        embed.add_field(
+            name="History and undo:",  # Title of the field
+            value="`/history Name` - lists the latest changes of a character, like level ups and spent attribute points.\n"
+            "`/undo Name` - reverts the last change, and the one before that when used again. Also brings back deleted characters.\n"
+            "Undoing is restricted to the character's creator or individuals with admin privileges.",  # Value of the field
+            inline=False,  # Display the field in a new line
+        )
+
         # Add a field for random command
         embed.add_field(
             name="Roll a random number:",  # Title of the field
             value="`/random X` - To roll a number between 1 and `X` where X has to be a positive number. \nExample: `/random 100`\n"
-            "You can also use `/random X-Y` - To roll a number between `X` and `Y` where X and Y have to be a positive number. \n Example: `/random 69-100`\n",  # Value of the field
+            "You can also use `/random X-Y` - To roll a number between `X` and `Y` where X and Y have to be a positive number. \n Example: `/random 69-100`\n"
+            "Add `xN` to roll `N` numbers, large batches are summarized. Example: `/random 1-100 x1000000`\n"
+            "Add `unique` to get distinct numbers. Example: `/random 1-1000000 x5 unique`\n",  # Value of the field
             inline=False,  # Display the field in a new line
         )
 
         # Add a field for coinflip command
         embed.add_field(
             name="A coinflip:",  # Title of the field
-            value="`/coinflip` - That's it. It flips a coin and returns Heads or Tails",  # Value of the field
+            value="`/coinflip` - That's it. It flips a coin and returns Heads or Tails\n"
+            "`/coinflip N` - Flips `N` coins and counts Heads and Tails. Example: `/coinflip 1000`",  # Value of the field
             inline=False,  # Display the field in a new line
         )
 
-        # Iterate through each command and add its name and description to the embed
-        for cog, commands_list in self.bot.cogs.items():
-            if cog:  # Check if the command belongs to a cog
-                embed.add_field(
-                    name=cog.qualified_name,  # Name of the cog as the title of the field
-                    value="\n".join(  # Join command names and their descriptions with new lines
-                        [
-                            f"`{command.name}` - {command.brief or 'No description available.'}"
-                            for command in commands_list
-                        ]
-                    ),
-                    inline=False,  # Display the field in a new line
-                )
-
         # Return the embed
         return embed
+
+
+async def setup(bot):
+    await bot.add_cog(CustomHelpCommand(bot))
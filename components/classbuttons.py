@@ -1,9 +1,13 @@
 import discord
-from character import Character
+from components.templates import Layout
 from components.yn_buttons import YView
+from services.edit_queue import edit_queue
+from services.sessions import STAGE_CLASS
+from services.metrics import timed
+from services.live_views import TrackedView
 
 
-class CLView(discord.ui.View):
+class CLView(TrackedView):
     """
     A view for selecting character class using buttons.
     """
@@ -13,19 +17,7 @@ class CLView(discord.ui.View):
         Represents a button for selecting a character class.
         """
 
-        def __init__(
-            self,
-            dndclass,
-            label,
-            view,
-            ctx,
-            dndclass_name,
-            num_dice,
-            sides,
-            race_name,
-            invoker_id,
-            modifier,
-        ):
+        def __init__(self, dndclass, label, view):
             """
             Initializes the ClassButton instance.
 
@@ -33,22 +25,9 @@ class CLView(discord.ui.View):
                 dndclass (str): The D&D character class.
                 label (str): The label to display on the button.
                 view (CLView): The parent view object.
-                ctx: The context object representing the invocation context.
-                dndclass_name (str): The name of the character's class.
-                num_dice (int): The number of dice.
-                sides (int): The number of sides on the dice.
-                race_name (str): The name of the character's race.
-                invoker_id (int): The ID of the user who invoked the command.
             """
-            self.num_dice = num_dice
-            self.sides = sides
-            self.ctx = ctx
             self._view = view
             self.dndclass = dndclass
-            self.dndnclass_name = dndclass_name
-            self.race_name = race_name
-            self.invoker_id = invoker_id
-            self.modifier = modifier
             # Determine button style based on character class
             style = (
                 discord.ButtonStyle.red
@@ -67,6 +46,7 @@ class CLView(discord.ui.View):
             # Initialize button using superclass constructor
             super().__init__(label=label, style=style, custom_id=dndclass, row=row)
 
+        @timed
         async def callback(self, interaction: discord.Interaction):
             """
             Callback function for the button.
@@ -79,32 +59,16 @@ class CLView(discord.ui.View):
                 return
             # Disable all buttons
             await self.view.disable_buttons()
-            # Create a Character instance
-            player = Character(self._view.character_name, self._view.ctx.guild.id)
-            # Roll character stats
-            await player.roll_stats(self.num_dice, self.sides)
-            hp = await player.determine_start_hp(self.dndclass)
-            lvl = 1
-            # Get stats table
-            stats_table = await player.show_stats(
-                self.ctx, self.race_name, self.dndclass, lvl, hp
-            )
+            session = self.view.session
+            # Store the class and roll the character stats
+            stats_table = await session.choose_class(self.dndclass)
             # Create YView for reroll prompt
-            reroll_view = YView(
-                interaction,
-                self.num_dice,
-                self.sides,
-                self._view.character_name,
-                player,
-                self.race_name,
-                self.dndclass,
-                self.invoker_id,
-                self._view.modifier,
-            )
+            reroll_view = YView(session)
             # Construct message content
             stat_msg_content = f"{stats_table}Would you like to reroll?"
             # Edit the interaction response with new content and view
-            await interaction.response.edit_message(
+            await edit_queue.respond(
+                interaction,
                 content=stat_msg_content, view=reroll_view
             )
 
@@ -129,127 +93,40 @@ class CLView(discord.ui.View):
                 # Set the button style to gray
                 child.style = discord.ButtonStyle.gray
 
-    def __init__(
-        self,
-        ctx,
-        character_name,
-        dndclass,
-        dndclass_name,
-        num_dice,
-        sides,
-        race_name,
-        invoker_id,
-        modifier,
-    ):
+    def __init__(self, session):
         """
         Initializes the CLView instance.
 
         Args:
-            ctx: The context object representing the invocation context.
-            character_name (str): The name of the character.
-            dndclass (str): The D&D character class.
-            dndclass_name (str): The name of the character's class.
-            num_dice (int): The number of dice.
-            sides (int): The number of sides on the dice.
-            race_name (str): The name of the character's race.
-            invoker_id (int): The ID of the user who invoked the command.
+            session (CreationSession): The character creation session this view renders.
         """
         # Initialize the parent class
-        super().__init__()
+        super().__init__(timeout=session.store.ttl)
         # Set instance variables
-        self.ctx = ctx
-        self.character_name = character_name
-        self.dndclass = dndclass
-        self.dndclass_name = dndclass_name
-        self.command_invoker_id = ctx.author.id
-        self.num_dice = num_dice
-        self.sides = sides
-        self.race_name = race_name
-        self.invoker_id = invoker_id
-        self.modifier = modifier
+        self.session = session
+        self.command_invoker_id = session.invoker_id
 
-    async def add_buttons(self, dndclass_name):
+    async def add_buttons(self):
         """
         Add buttons for selecting character class.
-
-        Args:
-            dndclass_name (str): The name of the character's class.
         """
-        # Iterate through D&D character classes
-        for dndclass in [
-            "Barbarian",
-            "Fighter",
-            "Paladin",
-            "Monk",
-            "Ranger",
-            "Rogue",
-            "Bard",
-            "Cleric",
-            "Druid",
-            "Sorcerer",
-            "Warlock",
-            "Wizard",
-            "Artificer",
-        ]:
-            # Create a button for each class
-            button = self.ClassButton(
-                dndclass,
-                dndclass,
-                self.ctx,
-                self.character_name,
-                dndclass_name,
-                self.num_dice,
-                self.sides,
-                self.race_name,
-                self.invoker_id,
-                self.modifier,
-            )
-            # Add the button to the view
-            self.add_item(button)
+        CLASS_LAYOUT.add_to(self)  # Copy the prebuilt class buttons into the view
 
     @classmethod
-    async def create(
-        cls,
-        ctx,
-        character_name,
-        dndclass,
-        dndclass_name,
-        num_dice,
-        sides,
-        race_name,
-        modifier,
-    ):
+    async def create(cls, session):
         """
         Create an instance of CLView.
 
         Args:
-            ctx: The context object representing the invocation context.
-            character_name (str): The name of the character.
-            dndclass (str): The D&D character class.
-            dndclass_name (str): The name of the character's class.
-            num_dice (int): The number of dice.
-            sides (int): The number of sides on the dice.
-            race_name (str): The name of the character's race.
+            session (CreationSession): The character creation session this view renders.
 
         Returns:
             CLView: An instance of CLView.
         """
-        # Get the ID of the user who invoked the command
-        invoker_id = ctx.author.id
         # Create an instance of CLView
-        self = CLView(
-            ctx,
-            character_name,
-            dndclass,
-            dndclass_name,
-            num_dice,
-            sides,
-            race_name,
-            invoker_id,
-            modifier,
-        )
+        self = CLView(session)
         # Add buttons for selecting character class
-        await self.add_buttons(dndclass_name)
+        await self.add_buttons()
         return self
 
     async def on_timeout(self):
@@ -258,6 +135,12 @@ class CLView(discord.ui.View):
         """
         # Disable all buttons in the view
         await self.disable_buttons()
+        # Only report the timeout if the user never picked a class
+        if self.session.store.abandon(self.session, STAGE_CLASS) and self.session.message:
+            await edit_queue.edit(
+                self.session.message,
+                content="Class selection timed out.", view=self
+            )
 
     async def button_check(self, interaction: discord.Interaction):
         """
@@ -269,6 +152,14 @@ class CLView(discord.ui.View):
         Returns:
             bool: True if the button interaction is valid, False otherwise.
         """
+        # Check if the creation session expired while the buttons were still shown
+        if not self.session.active:
+            await interaction.response.send_message(
+                content="This character creation has timed out.",
+                ephemeral=True,
+                delete_after=10,
+            )
+            return False
         # Check if the user who interacted with the button is the command invoker
         if interaction.user.id != self.command_invoker_id:
             # Send error message for invalid user
@@ -279,3 +170,24 @@ class CLView(discord.ui.View):
             )
             return False  # Return False for invalid interaction
         return True  # Return True for valid interaction
+
+
+# Class buttons, built once at startup and copied for every class selection
+CLASS_LAYOUT = Layout(
+    CLView.ClassButton(dndclass, dndclass, None)
+    for dndclass in [
+        "Barbarian",
+        "Fighter",
+        "Paladin",
+        "Monk",
+        "Ranger",
+        "Rogue",
+        "Bard",
+        "Cleric",
+        "Druid",
+        "Sorcerer",
+        "Warlock",
+        "Wizard",
+        "Artificer",
+    ]
+)
@@ -1,11 +1,25 @@
-from character import Character
+from collections import Counter
+from functools import partial
+from character import Character, read_stats_block
 import discord
 import os
-import csv
-from tabulate import tabulate
+from components.templates import Layout
+from services.character_index import saves_dir, SAVE_SUFFIX
+from services.edit_queue import edit_queue
+from services.stat_table import stats_blocks
+from services.metrics import timed
+from services.live_views import TrackedView
 
 
-class MyView(discord.ui.View):
+class MyView(TrackedView):
+    """
+    Ability score improvement: buttons to spend attribute points on stats.
+
+    The chosen points are written once all of a character's points are
+    spent. With a queue, the view then moves on to the next character, so
+    leveling a whole party needs a single message.
+    """
+
     class StatButton(discord.ui.Button):
         """
         Represents a button for updating character stats.
@@ -57,6 +71,7 @@ class MyView(discord.ui.View):
             """Sets the MyView instance to which the button belongs."""
             self._view = value
 
+        @timed
         async def callback(self, interaction: discord.Interaction):
             """
             Handles button callback interaction.
@@ -69,18 +84,20 @@ class MyView(discord.ui.View):
                 return
 
             # Update character stat if click count is within limits
-            if self.view and self.view.click_count < self.max_clicks:
-                # Update the character stat
+            if self.view and self.view.click_count < self.view.max_clicks:
+                # Choose the stat, written once every point is spent
                 await self.view.update_character_stat(self.stat_name)
 
                 # Get the updated stats message content
-                increase_message = f"{self.stat_name} increased by 1"
+                increase_message = self.view.progress_message()
                 self.view.stats_content = await self.view.send_message(
                     increase_message=increase_message
                 )
 
                 # Edit the message to include both the updated stats and the "increased by 1" message
-                await interaction.response.edit_message(
+                # Responding drops the edit send_message queued, so only one edit goes out
+                await edit_queue.respond(
+                    interaction,
                     content=f"{self.view.stats_content}{increase_message}",
                     view=self.view,
                 )
@@ -89,7 +106,7 @@ class MyView(discord.ui.View):
             else:
                 await self.view.disable_buttons()  # Disable all buttons
 
-    def __init__(self, ctx, char_name, stats_table_message, max_clicks=2):
+    def __init__(self, ctx, char_name, stats_table_message, max_clicks=2, queue=None):
         """
         Initializes the MyView object.
 
@@ -98,6 +115,7 @@ class MyView(discord.ui.View):
             char_name (str): The name of the character.
             stats_table_message (discord.Message): The message containing the character's stats table.
             max_clicks (int, optional): The maximum number of clicks allowed for each button. Defaults to 2.
+            queue (list, optional): Names and points of the characters to improve after this one.
         """
         super().__init__()
         self.ctx = ctx  # Store the context
@@ -107,9 +125,12 @@ class MyView(discord.ui.View):
         self.message = None  # Initialize message to None
         self.stats_table_message = stats_table_message  # Store the stats table message
         self.command_invoker_id = ctx.author.id  # Store the command invoker ID
+        self.increases = Counter()  # Points chosen for the current character, not written yet
+        self.written = Counter()  # Points written for the last character
+        self.queue = list(queue or [])  # (name, points) of the characters still to come
 
     @classmethod
-    async def create(cls, ctx, stats_table_message, char_name, max_clicks=2):
+    async def create(cls, ctx, stats_table_message, char_name, max_clicks=2, queue=None):
         """
         Creates a new instance of MyView.
 
@@ -119,12 +140,13 @@ class MyView(discord.ui.View):
             char_name (str): The name of the character.
             stats_table_message (discord.Message): The message containing the character's stats table.
             max_clicks (int, optional): The maximum number of clicks allowed for each button. Defaults to 2.
+            queue (list, optional): Names and points of the characters to improve after this one.
 
         Returns:
             MyView: The created MyView instance.
         """
         # Create a new instance of MyView with the provided parameters
-        self = MyView(ctx, stats_table_message, char_name, max_clicks)
+        self = MyView(ctx, stats_table_message, char_name, max_clicks, queue)
         # Add buttons to the view instance
         await self.add_buttons()
         return self
@@ -135,37 +157,43 @@ class MyView(discord.ui.View):
         """
         # Send a message containing the character's stats table and store its content
         self.stats_content = await self.send_message()
-        # Iterate over each character stat and create a button for it
-        for stat_name in [
-            "Strength",
-            "Dexterity",
-            "Intelligence",
-            "Constitution",
-            "Charisma",
-            "Wisdom",
-        ]:
-            # Create a new button instance for the current stat
-            button = self.StatButton(
-                stat_name,
-                stat_name,
-                self.max_clicks,
-                self,
-                self.stats_content,
-            )
-            # Add the button to the view
-            self.add_item(button)
+        # Copy the prebuilt stat buttons into the view
+        STAT_LAYOUT.add_to(
+            self, max_clicks=self.max_clicks, stats_content=self.stats_content
+        )
 
     async def update_character_stat(self, selected_stat):
         """
-        Updates the character's stat and sends a message.
+        Chooses a stat to increase, writing the choices once every point is spent.
 
         Args:
             selected_stat (str): The name of the selected stat to update.
         """
-        await Character.update_character_stat(
-            self.ctx, self.char_name, selected_stat
-        )  # Update character stat
+        self.increases[selected_stat] += 1
         self.click_count += 1  # Increment click count
+        if self.click_count >= self.max_clicks:
+            await self.commit()
+
+    async def commit(self):
+        """Write the chosen increases of the current character, if there are any."""
+        if self.increases:
+            await Character.update_character_stats(self.ctx, self.char_name, self.increases)
+            self.written = self.increases
+            self.increases = Counter()
+
+    def progress_message(self):
+        """
+        Describe the points chosen and left, or the increases written last.
+
+        Returns:
+            str: The line shown under the stats table.
+        """
+        if not self.increases:
+            written = ", ".join(f"{stat} +{points}" for stat, points in self.written.items())
+            return f"Increased {written}."
+        chosen = ", ".join(f"{stat} +{points}" for stat, points in self.increases.items())
+        left = self.max_clicks - self.click_count
+        return f"Chosen for {self.char_name}: {chosen}. {left} point{'s' if left != 1 else ''} left."
 
     async def disable_buttons(self):  # Method to disable all buttons in the view
         """Disables all buttons in the view."""
@@ -179,13 +207,18 @@ class MyView(discord.ui.View):
     async def check_completion(
         self,
     ):
-        """Method to check if the max click count is reached."""
-        if self.click_count >= self.max_clicks:
+        """Method to check if the max click count is reached, moving on to the next character."""
+        if self.click_count >= self.max_clicks and self.queue:
+            self.char_name, self.max_clicks = self.queue.pop(0)
+            self.click_count = 0
+            self.stats_content = await self.send_message()
+        elif self.click_count >= self.max_clicks:
             # Checking if the click count exceeds the maximum allowed clicks
             await self.disable_buttons()
             if self.message:
                 # Edit the message to indicate completion without removing the stats table
-                await self.message.edit(
+                await edit_queue.edit(
+                    self.message,
                     content=f"{self.stats_content}Out of attribute points to spend.",
                     view=self,
                 )
@@ -194,11 +227,14 @@ class MyView(discord.ui.View):
         self,
     ):  # Method to handle button disablement when the view times out
         """Handles button disablement when the view times out."""
+        await self.commit()  # Keep the points chosen so far
         await self.disable_buttons()  # Disabling all buttons in the view
         timeout_message = "Level up canceled due to timeout."
         if self.message:
             # Edit the original message to indicate the timeout
-            await self.message.edit(content=timeout_message, view=self)
+            await edit_queue.edit(
+                self.message, content=timeout_message, view=self
+            )
 
     async def button_check(
         self, interaction
@@ -234,13 +270,20 @@ class MyView(discord.ui.View):
         message_content = f"{self.stats_content}"
         if increase_message:
             message_content += f"{increase_message}"
+        elif self.queue or self.max_clicks != 2:
+            message_content += (
+                f"Select which attribute of {self.char_name} you want to increase, "
+                f"{self.max_clicks} points to spend:"
+            )
         else:
             message_content += "Select which attribute you want to increase:"
 
         # Check if a message already exists
         if self.message:
             # Update the existing message with the new content and view
-            await self.message.edit(content=message_content, view=self)
+            await edit_queue.edit(
+                self.message, content=message_content, view=self
+            )
         else:
             # Send a new message with the content and view
             message = await self.ctx.send(content=message_content, view=self)
@@ -253,55 +296,30 @@ class MyView(discord.ui.View):
         ctx, char_name, server_id, stats_message=None
     ):
         try:
-            # Construct directory path based on server ID
-            server_dir = f"server_{server_id}"
-            saves_dir = os.path.join("resources", "saves", server_dir)
             # Construct the full file path
-            filepath = os.path.join(saves_dir, f"{char_name}_stats.csv")
-            # Open the CSV file
-            with open(filepath, newline="") as file:
-                # Create a CSV DictReader
-                reader = csv.DictReader(file)
-                stats = []
-                name = None
-                race_name = None
-                class_name = None
-                lvl = None
-                hp = None
-                # Initialize a list to store stats
-                stats = []
-                # Iterate through each row in the CSV
-                for row in reader:
-                    # Get the modifier and convert to int
-                    modifier = int(row["Modifier"])
-                    # Check if modifier is greater than or equal to 1
-                    if modifier >= 1:
-                        modifier_str = f"+{modifier}"
-                    else:
-                        modifier_str = str(modifier)
-                    # Append attribute, value, and modified modifier to stats list
-                    stats.append([row["Attribute"], row["Value"], modifier_str])
-                    if race_name is None:
-                        race_name = row["Race"]
-                    if name is None:
-                        name = row["Name"]
-                    if class_name is None:
-                        class_name = row["Class"]
-                    if lvl is None:
-                        lvl = row["Level"]
-                    if hp is None:
-                        hp = row["Health"]
-                # Define headers for the tabulated output
-                headers = ["Attribute", "Value", "Modifier"]
-                # Generate a tabulated representation of the stats and other information related to the character
-                stats_table = tabulate(stats, headers=headers, tablefmt="grid")
-                name_display = f"`Name`: {name}" if name else ""
-                race_display = f"`Race`: {race_name}" if race_name else ""
-                class_display = f"`Class`: {class_name}" if class_name else ""
-                lvl_display = f"`Level`: {lvl}" if lvl else ""
-                hp_display = f"`Health increased to`: {hp}\n" if hp else ""
-            # Return the stats table content, name, race, and class
-            return f"{name_display}  {race_display}  {class_display}  {lvl_display}  {hp_display}```{stats_table}```"
+            filepath = os.path.join(saves_dir(server_id), f"{char_name}{SAVE_SUFFIX}")
+            # Return the stats table content, name, race, and class, the file is only read again if it changed
+            return stats_blocks.get(
+                filepath,
+                "lvl",
+                partial(
+                    read_stats_block, hp_label="Health increased to", skip_empty=False
+                ),
+            )
         except Exception as e:
             # Raise an exception if an error occurs
             raise RuntimeError(f"An error occurred: {e}")
+
+
+# Stat buttons, built once at startup and copied for every ability score improvement
+STAT_LAYOUT = Layout(
+    MyView.StatButton(stat_name, stat_name, 2, None, None)
+    for stat_name in [
+        "Strength",
+        "Dexterity",
+        "Intelligence",
+        "Constitution",
+        "Charisma",
+        "Wisdom",
+    ]
+)
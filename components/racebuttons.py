@@ -3,6 +3,11 @@ from discord.ext import commands
 import asyncio
 from discord import Intents
 from components.classbuttons import CLView
+from components.templates import Layout
+from services.edit_queue import edit_queue
+from services.sessions import STAGE_RACE
+from services.metrics import timed
+from services.live_views import TrackedView
 
 # Initialize the bot with specified parameters
 bot = commands.Bot(
@@ -13,7 +18,7 @@ bot = commands.Bot(
 )
 
 
-class RCView(discord.ui.View):
+class RCView(TrackedView):
     """
     View class for race selection during character creation.
     """
@@ -26,24 +31,9 @@ class RCView(discord.ui.View):
             race (str): The race associated with the button.
             label (str): The label displayed on the button.
             view (RCView): The parent view.
-            ctx (discord.Interaction): The context of the command.
-            num_dice (int): Number of dice for rolling stats.
-            sides (int): Number of sides for rolling stats.
-            race_name (str): The name of the selected race.
         """
 
-        def __init__(
-            self,
-            race,
-            label,
-            view,
-            ctx,
-            num_dice,
-            sides,
-            race_name,
-            dndclass,
-            dndclass_name,
-        ):
+        def __init__(self, race, label, view):
             """
             Initialize the RaceButton.
 
@@ -51,19 +41,9 @@ class RCView(discord.ui.View):
                 race (str): The race associated with the button.
                 label (str): The label displayed on the button.
                 view (RCView): The parent view.
-                ctx (discord.Interaction): The context of the command.
-                num_dice (int): Number of dice for rolling stats.
-                sides (int): Number of sides for rolling stats.
-                race_name (str): The name of the selected race.
             """
-            self.ctx = ctx  # Store the interaction context
             self.race = race  # Store the race associated with the button
             self._view = view  # Store the parent view
-            self.num_dice = num_dice  # Store the number of dice for rolling stats
-            self.sides = sides  # Store the number of sides for rolling stats
-            self.race_name = race_name  # Store the name of the selected race
-            self.dndclass_name = dndclass_name
-            self.dndclass = dndclass
             # Determine button style based on race
             style = (
                 discord.ButtonStyle.red  # Set button style to red for specific races
@@ -80,6 +60,7 @@ class RCView(discord.ui.View):
                 custom_id=race,  # Set the custom ID of the button
             )
 
+        @timed
         async def callback(self, interaction: discord.Interaction):
             """
             Callback function executed when the button is clicked.
@@ -92,6 +73,7 @@ class RCView(discord.ui.View):
                 return
             # Disable all buttons in the view
             await self.view.disable_buttons()
+            session = self.view.session
             if self.custom_id == "Other":
                 # Prompt user to enter custom race
                 await interaction.response.send_message(
@@ -99,62 +81,34 @@ class RCView(discord.ui.View):
                 )
                 try:
                     # Wait for user's response
-                    response = await self.ctx.bot.wait_for(
+                    response = await session.ctx.bot.wait_for(
                         "message",
                         check=lambda m: m.author
-                        == self.ctx.author  # Check if the message author is the same as the interaction user
+                        == session.ctx.author  # Check if the message author is the same as the interaction user
                         and m.channel
-                        == self.ctx.channel,  # Check if the message is sent in the same channel as the interaction
-                        timeout=120,  # Set timeout for waiting for response
+                        == session.ctx.channel,  # Check if the message is sent in the same channel as the interaction
+                        timeout=session.store.ttl,  # Set timeout for waiting for response
                     )
-                    custom_race = (
-                        response.content
-                    )  # Get the content of the user's message as custom race
-                    # Set custom race
-                    self.custom_race = custom_race
-                    class_view = await CLView.create(
-                        self.ctx,
-                        self._view.character_name,
-                        self.dndclass,
-                        self.dndclass_name,
-                        self.num_dice,
-                        self.sides,
-                        self.custom_race,
-                        modifier=None,
+                    # Use the content of the user's message as custom race
+                    session.choose_race(response.content)
+                    class_view = await CLView.create(session)
+                    # The class selection continues in the followup message
+                    session.message = await interaction.followup.send(
+                        content="Choose your class:", view=class_view, wait=True
                     )
-                    await interaction.followup.send(
-                        content="Choose your class:", view=class_view
-                    )  # Edit the message to show stats
                 except asyncio.TimeoutError:
+                    session.store.abandon(session)
                     await interaction.followup.send(
                         "Input timed out", ephemeral=True
                     )  # Send message indicating timeout
             else:
-                # Prepare stat message and initiate class selection
-                class_view = await CLView.create(
-                    self.ctx,
-                    self._view.character_name,
-                    self.dndclass,
-                    self.dndclass_name,
-                    self.num_dice,
-                    self.sides,
-                    self.race,
-                    modifier=None,
-                )
-                followup_msg = await interaction.response.edit_message(
+                # Store the race and initiate class selection
+                session.choose_race(self.race)
+                class_view = await CLView.create(session)
+                await edit_queue.respond(
+                    interaction,
                     content="Choose your class:", view=class_view
                 )
-                try:
-                    response = await self.ctx.bot.wait_for(
-                        "button_click",
-                        check=lambda i: i.user == self.ctx.author,
-                        timeout=120,
-                    )
-                except asyncio.TimeoutError:
-                    await class_view.on_timeout()
-                    await interaction.edit_original_response(
-                        content="Class selection timed out.", view=class_view
-                    )
 
         @property
         def view(self):
@@ -176,106 +130,38 @@ class RCView(discord.ui.View):
             """
             self._view = race
 
-    def __init__(
-        self,
-        ctx,
-        character_name,
-        num_dice,
-        sides,
-        race_name,
-        dndclass,
-        dndclass_name,
-        modifier,
-    ):
+    def __init__(self, session):
         """
         Initialize the RCView.
 
         Args:
-            ctx (discord.Interaction): The context of the command.
-            character_name (str): The name of the character being created.
-            num_dice (int): Number of dice for rolling stats.
-            sides (int): Number of sides for rolling stats.
-            race_name (str): The name of the selected race.
+            session (CreationSession): The character creation session this view renders.
         """
-        super().__init__()  # Call the constructor of the parent class
-        self.num_dice = num_dice  # Store the number of dice for rolling stats
-        self.sides = sides  # Store the number of sides for rolling stats
-        self.ctx = ctx  # Store the interaction context
-        self.character_name = character_name  # Store the character name
-        self.command_invoker_id = ctx.author.id  # Store the ID of the command invoker
-        self.race_name = race_name  # Store the name of the selected race
-        self.dndclass_name = dndclass_name
-        self.dndclass = dndclass
-        self.modifier = modifier
+        super().__init__(
+            timeout=session.store.ttl
+        )  # Call the constructor of the parent class
+        self.session = session  # Store the creation session
+        self.command_invoker_id = session.invoker_id  # Store the ID of the command invoker
 
-    async def add_buttons(self, race_name):
+    async def add_buttons(self):
         """
         Add race selection buttons to the view.
-
-        Args:
-            race_name (str): The name of the selected race.
         """
-        for race in [
-            "Dragonborn",
-            "Dwarf",
-            "Elf",
-            "Gnome",
-            "Half-Elf",
-            "Half-Orc",
-            "Halfling",
-            "Human",
-            "Tiefling",
-            "Other",
-        ]:
-            button = self.RaceButton(
-                race,  # Set the race associated with the button
-                race,  # Set the label displayed on the button
-                self,  # Set the parent view
-                self.ctx,  # Set the interaction context
-                self.num_dice,  # Set the number of dice for rolling stats
-                self.sides,  # Set the number of sides for rolling stats
-                race_name,  # Set the name of the selected race
-                self.dndclass_name,
-                self.dndclass,
-            )
-            self.add_item(button)  # Add the button to the view
+        RACE_LAYOUT.add_to(self)  # Copy the prebuilt race buttons into the view
 
     @classmethod
-    async def create(
-        cls,
-        ctx,
-        race,
-        num_dice,
-        sides,
-        race_name,
-        dndclass,
-        dndclass_name,
-        modifier,
-    ):
+    async def create(cls, session):
         """
         Create an instance of RCView.
 
         Args:
-            ctx (discord.Interaction): The context of the command.
-            race (str): The selected race.
-            num_dice (int): Number of dice for rolling stats.
-            sides (int): Number of sides for rolling stats.
-            race_name (str): The name of the selected race.
+            session (CreationSession): The character creation session this view renders.
 
         Returns:
             RCView: The created instance of RCView.
         """
-        self = RCView(
-            ctx,
-            race,
-            num_dice,
-            sides,
-            race_name,
-            dndclass,
-            dndclass_name,
-            modifier,
-        )  # Initialize the instance
-        await self.add_buttons(race_name)  # Add race selection buttons to the view
+        self = RCView(session)  # Initialize the instance
+        await self.add_buttons()  # Add race selection buttons to the view
         return self
 
     async def disable_buttons(self):
@@ -292,6 +178,12 @@ class RCView(discord.ui.View):
         Handler for when the view times out.
         """
         await self.disable_buttons()  # Disable all buttons in the view
+        # Only report the timeout if the user never got past race selection
+        if self.session.store.abandon(self.session, STAGE_RACE) and self.session.message:
+            await edit_queue.edit(
+                self.session.message,
+                content="Race selection timed out", view=self
+            )
 
     async def button_check(self, interaction: discord.Interaction):
         """
@@ -303,6 +195,14 @@ class RCView(discord.ui.View):
         Returns:
             bool: True if the button interaction is valid, False otherwise.
         """
+        # Check if the creation session expired while the buttons were still shown
+        if not self.session.active:
+            await interaction.response.send_message(
+                content="This character creation has timed out.",
+                ephemeral=True,
+                delete_after=10,
+            )
+            return False
         if interaction.user.id != self.command_invoker_id:
             await interaction.response.send_message(
                 content="This is not your decision to make. :point_up: :nerd:",  # Send error message for invalid user
@@ -311,3 +211,21 @@ class RCView(discord.ui.View):
             )
             return False  # Return False for invalid interaction
         return True  # Return True for valid interaction
+
+
+# Race buttons, built once at startup and copied for every race selection
+RACE_LAYOUT = Layout(
+    RCView.RaceButton(race, race, None)
+    for race in [
+        "Dragonborn",
+        "Dwarf",
+        "Elf",
+        "Gnome",
+        "Half-Elf",
+        "Half-Orc",
+        "Halfling",
+        "Human",
+        "Tiefling",
+        "Other",
+    ]
+)
@@ -1,9 +1,14 @@
+import asyncio
 import os
-import csv
 import discord
+from services.character_index import characters
+from services.storage import file_lock
+from services.metrics import timed
+from services.live_views import TrackedView
+from services.character_log import DELETED, character_log
 
 
-class RView(discord.ui.View):
+class RView(TrackedView):
     """
     A custom Discord UI view for confirming deletion of a character.
 
@@ -40,6 +45,7 @@ class RView(discord.ui.View):
         await self.disable_buttons()  # Disable all buttons in the view
 
     @discord.ui.button(label="No", custom_id="nbutton", style=discord.ButtonStyle.green)
+    @timed
     async def nobutton_callback(
         self, interaction: discord.Interaction, button: discord.ui.Button
     ):
@@ -64,7 +70,18 @@ class RView(discord.ui.View):
                 delete_after=10,
             )
 
+    def delete(self, filepath):
+        """
+        Log the deletion of the character, which removes its savefile, keeping its stats for /undo.
+
+        Blocks on the files, so call it from a worker thread.
+        """
+        with file_lock(filepath):
+            rows = character_log.load(filepath)
+            character_log.append(filepath, DELETED, self.ctx.author.id, rows=rows)
+
     @discord.ui.button(label="Yes", custom_id="ybutton", style=discord.ButtonStyle.red)
+    @timed
     async def yesbutton_callback(
         self, interaction: discord.Interaction, button: discord.ui.Button
     ):
@@ -84,18 +101,16 @@ class RView(discord.ui.View):
             # Construct full filepath
             filepath = os.path.join(saves_dir, filename)
 
-            # Open the character's stats file
-            with open(filepath, newline="") as file:
-                # Create a CSV DictReader object
-                reader = csv.DictReader(file)
-                # Iterate through each row in the CSV
-                for row in reader:
-                    creator_id = None
-                    # Check if the row corresponds to the character name
-                    if row["Name"].lower() == self.name.lower():
-                        if creator_id is None:
-                            creator_id = row["CreatorID"]
-                            break
+            # Load the character's stats, with the changes logged since the file was written
+            rows = character_log.load(filepath)
+            # Iterate through each row of the character
+            for row in rows:
+                creator_id = None
+                # Check if the row corresponds to the character name
+                if row["Name"].lower() == self.name.lower():
+                    if creator_id is None:
+                        creator_id = row["CreatorID"]
+                        break
 
             await self.disable_buttons()
 
@@ -103,7 +118,8 @@ class RView(discord.ui.View):
             if creator_id is None:
                 # If the invoker is an administrator, delete the file
                 if self.ctx.author.guild_permissions.administrator:
-                    os.remove(filepath)
+                    await asyncio.to_thread(self.delete, filepath)
+                    characters.remove(self.ctx.guild.id, self.name)
                     # Confirm deletion
                     await interaction.response.edit_message(
                         content=f"Character '{self.name}' deleted successfully. :headstone:",
@@ -120,7 +136,8 @@ class RView(discord.ui.View):
                 self.ctx.author.id == creator_id
                 or self.ctx.author.guild_permissions.administrator
             ):
-                os.remove(filepath)
+                await asyncio.to_thread(self.delete, filepath)
+                characters.remove(self.ctx.guild.id, self.name)
                 # Confirm deletion
                 await interaction.response.edit_message(
                     content=f"Character '{self.name}' deleted successfully. :headstone:",
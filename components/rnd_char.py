@@ -1,10 +1,11 @@
 from character import Character
 import discord
-from discord.ui import View
 import random
+from services.metrics import timed
+from services.live_views import TrackedView
 
 
-class RandView(View):
+class RandView(TrackedView):
     """
     A Discord UI view for creating and interacting with a random character.
 
@@ -146,6 +147,7 @@ class RandView(View):
         )  # Show the character's stats
 
     @discord.ui.button(label="No", custom_id="nobutton", style=discord.ButtonStyle.red)
+    @timed
     async def nobutton_callback(
         self, interaction: discord.Interaction, button: discord.ui.Button
     ):
@@ -174,6 +176,7 @@ class RandView(View):
     @discord.ui.button(
         label="Yes", custom_id="ybutton", style=discord.ButtonStyle.green
     )
+    @timed
     async def yesbutton_callback(
         self, interaction: discord.Interaction, button: discord.ui.Button
     ):
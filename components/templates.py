@@ -0,0 +1,86 @@
+import discord
+
+
+class ButtonTemplate:
+    """
+    A button built once that can be stamped out for any number of views.
+
+    The button subclasses work out their style, row and custom ID in their
+    constructors. A template keeps the finished arguments of a prototype
+    button and its own attributes, and a clone passes them straight to the
+    discord.ui.Button constructor.
+    """
+
+    __slots__ = ("cls", "kwargs", "attrs")
+
+    def __init__(self, prototype):
+        """
+        Initialize the ButtonTemplate.
+
+        Args:
+            prototype (discord.ui.Button): A fully constructed button to copy from.
+        """
+        self.cls = type(prototype)
+        self.kwargs = {
+            "style": prototype.style,
+            "label": prototype.label,
+            "disabled": prototype.disabled,
+            "custom_id": None if prototype.url else prototype.custom_id,
+            "url": prototype.url,
+            "emoji": prototype.emoji,
+            "row": prototype.row,
+            "sku_id": prototype.sku_id,
+            "id": prototype.id,
+        }
+        # The attributes the subclass adds, like the race of a race button
+        self.attrs = {
+            key: value for key, value in vars(prototype).items() if not key.startswith("_")
+        }
+
+    def clone(self, **attrs):
+        """
+        Create a new button from the template.
+
+        Args:
+            **attrs: Attributes to set on the new button.
+
+        Returns:
+            discord.ui.Button: The new button.
+        """
+        # Skip the subclass's constructor, its arguments are already worked out
+        item = self.cls.__new__(self.cls)
+        discord.ui.Button.__init__(item, **self.kwargs)
+        for key, value in {**self.attrs, **attrs}.items():
+            setattr(item, key, value)
+        return item
+
+
+class Layout:
+    """
+    An immutable set of button templates forming the components of a view.
+    """
+
+    __slots__ = ("templates",)
+
+    def __init__(self, prototypes):
+        """
+        Initialize the Layout.
+
+        Args:
+            prototypes (iterable): The prototype buttons, in the order they are shown.
+        """
+        self.templates = tuple(ButtonTemplate(prototype) for prototype in prototypes)
+
+    def add_to(self, view, **attrs):
+        """
+        Add a fresh copy of every button to a view.
+
+        Args:
+            view (discord.ui.View): The view to add the buttons to.
+            **attrs: Attributes to set on every new button.
+        """
+        for template in self.templates:
+            view.add_item(template.clone(**attrs))
+
+    def __len__(self):
+        return len(self.templates)
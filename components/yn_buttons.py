@@ -1,43 +1,27 @@
-from character import Character
 import discord
+from services.edit_queue import edit_queue
+from services.sessions import STAGE_CONFIRM
+from services.metrics import timed
+from services.live_views import TrackedView
 
 
-class YView(discord.ui.View):
+class YView(TrackedView):
     """
     A custom view for handling Yes/No buttons.
     """
 
-    def __init__(
-        self,
-        ctx,
-        num_dice,
-        sides,
-        character_name,
-        player,
-        race_name,
-        dndclass,
-        invoker_id,
-        modifier,
-    ):
+    def __init__(self, session):
         """
         Initializes the YView.
 
         Args:
-            ctx (discord.Context): The context of the command.
-            num_dice (int): Number of dice.
-            sides (int): Number of sides on each die.
-            character_name (str): Name of the character.
+            session (CreationSession): The character creation session this view renders.
         """
-        self.ctx = ctx  # Store the context of the command
-        self.num_dice = num_dice  # Store the number of dice
-        self.sides = sides  # Store the number of sides on each die
-        self.character_name = character_name  # Store the name of the character
-        self.player = player
-        self.race_name = race_name
-        self.dndclass = dndclass
-        self.invoker_id = invoker_id
-        self.modifier = modifier
-        super().__init__()  # Call the __init__() method of the parent class
+        self.session = session  # Store the creation session
+        self.invoker_id = session.invoker_id
+        super().__init__(
+            timeout=session.store.ttl
+        )  # Call the __init__() method of the parent class
 
     async def disable_buttons(self):
         """
@@ -49,6 +33,7 @@ class YView(discord.ui.View):
                 child.style = discord.ButtonStyle.gray  # Set the button style to gray
 
     @discord.ui.button(label="No", custom_id="nbutton", style=discord.ButtonStyle.green)
+    @timed
     async def nobutton_callback(
         self, interaction: discord.Interaction, button: discord.ui.Button
     ):
@@ -59,28 +44,22 @@ class YView(discord.ui.View):
             interaction (discord.Interaction): The interaction object.
             button (discord.ui.Button): The button object.
         """
-        if interaction.user.id == self.invoker_id:
+        if not self.session.active:
+            await interaction.response.send_message(
+                "This character creation has timed out.",
+                ephemeral=True,
+                delete_after=15,
+            )  # Send an error message if the session expired
+        elif interaction.user.id == self.invoker_id:
             await self.disable_buttons()  # Disable all buttons in the view
-            hp = await self.player.determine_start_hp(self.dndclass)
-            hp = int(hp)
-            lvl = 1
-            await interaction.response.edit_message(
-                content=await self.player.show_stats(
-                    self.ctx, self.race_name, self.dndclass, lvl, hp
-                ),
+            await edit_queue.respond(
+                interaction,
+                content=await self.session.render_stats(),
                 view=self,
             )  # Edit the original message
-            await self.ctx.channel.send(
-                await self.player.save_to_csv(
-                    self.character_name,
-                    self.race_name,
-                    self.ctx,
-                    self.dndclass,
-                    self.invoker_id,
-                    lvl,
-                    hp,
-                )
-            )
+            await self.session.ctx.channel.send(
+                await self.session.save()
+            )  # Save character stats to CSV
         else:
             await interaction.response.send_message(
                 "This is not your decision to make. :point_up: :nerd:",
@@ -89,6 +68,7 @@ class YView(discord.ui.View):
             )  # Send an error message if someone else tries to click the button
 
     @discord.ui.button(label="Yes", custom_id="ybutton", style=discord.ButtonStyle.red)
+    @timed
     async def yesbutton_callback(
         self, interaction: discord.Interaction, button: discord.ui.Button
     ):
@@ -99,31 +79,22 @@ class YView(discord.ui.View):
             interaction (discord.Interaction): The interaction object.
             button (discord.ui.Button): The button object.
         """
-        if interaction.user.id == self.invoker_id:
-            player = Character(
-                self.character_name, self.ctx.guild.id
-            )  # Create a Character object
-            await player.roll_stats(self.num_dice, self.sides)  # Roll character stats
+        if not self.session.active:
+            await interaction.response.send_message(
+                "This character creation has timed out.",
+                ephemeral=True,
+                delete_after=15,
+            )  # Send an error message if the session expired
+        elif interaction.user.id == self.invoker_id:
+            stats_table = await self.session.roll()  # Reroll character stats
             await self.disable_buttons()  # Disable all buttons in the view
-            hp = await player.determine_start_hp(self.dndclass)
-            hp = int(hp)
-            lvl = 1
-            await interaction.response.edit_message(
-                content=await player.show_stats(
-                    self.ctx, self.race_name, self.dndclass, lvl, hp
-                ),
+            await edit_queue.respond(
+                interaction,
+                content=stats_table,
                 view=self,
             )  # Edit the original message
-            await self.ctx.channel.send(
-                await player.save_to_csv(
-                    self.character_name,
-                    self.race_name,
-                    self.ctx,
-                    self.dndclass,
-                    self.invoker_id,
-                    lvl,
-                    hp,
-                )
+            await self.session.ctx.channel.send(
+                await self.session.save()
             )  # Save character stats to CSV
         else:
             await interaction.response.send_message(
@@ -137,3 +108,5 @@ class YView(discord.ui.View):
         Handler for when the view times out.
         """
         await self.disable_buttons()  # Disable all buttons in the view
+        # The rolled character is dropped if the user never answered
+        self.session.store.abandon(self.session, STAGE_CONFIRM)
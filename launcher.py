@@ -0,0 +1,256 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from dotenv import load_dotenv
+import bot_main
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cluster has to stay up before its restart delay resets
+STABLE_AFTER = 60
+# Longest wait before restarting a crashed cluster
+MAX_RESTART_DELAY = 60
+# Seconds between two heartbeats of a cluster
+HEARTBEAT_INTERVAL = 5
+# A cluster without a heartbeat for this many seconds is killed and restarted
+HEARTBEAT_TIMEOUT = 30
+# Seconds the clusters get to exit after SIGTERM before they are killed
+STOP_TIMEOUT = 10
+
+
+def shard_ranges(shard_count, processes):
+    """
+    Split the shards into contiguous ranges, one per process.
+
+    Args:
+        shard_count (int): The total number of shards.
+        processes (int): The number of processes.
+
+    Returns:
+        list: A list of shard IDs for every process, sizes differ by at most one.
+    """
+    processes = max(1, min(processes, shard_count))
+    bounds = [shard_count * i // processes for i in range(processes + 1)]
+    return [list(range(bounds[i], bounds[i + 1])) for i in range(processes)]
+
+
+async def recommended_shard_count(token):
+    """
+    Ask Discord how many shards the bot should use.
+
+    Args:
+        token (str): The bot token.
+
+    Returns:
+        int: The recommended number of shards.
+    """
+    from discord.http import HTTPClient
+
+    http = HTTPClient(asyncio.get_running_loop())
+    try:
+        await http.static_login(token)
+        shards, _, _ = await http.get_bot_gateway()
+        return shards
+    finally:
+        await http.close()
+
+
+def beat(heartbeat, done):
+    """Write the time to a cluster's heartbeat until the bot stops running."""
+    while not done.wait(HEARTBEAT_INTERVAL):
+        heartbeat.value = time.time()
+
+
+def run_cluster(cluster_id, shard_ids, shard_count, stub, heartbeat):
+    """
+    Run one bot process serving a range of shards.
+
+    Args:
+        cluster_id (int): The number of the process, used for its log file.
+        shard_ids (list): The shards this process connects.
+        shard_count (int): The total number of shards.
+        stub (bool): Use the stub gateway instead of connecting to Discord.
+        heartbeat (multiprocessing.Value): Updated with the time while the bot runs.
+    """
+    # Ctrl+C reaches the launcher only, which stops the clusters with SIGTERM.
+    # That is turned into a KeyboardInterrupt, so the bot logs out cleanly.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    os.environ["CLUSTER_ID"] = str(cluster_id)
+    os.environ["SHARD_COUNT"] = str(shard_count)
+    os.environ["SHARD_IDS"] = ",".join(str(shard_id) for shard_id in shard_ids)
+    if stub:
+        os.environ["GATEWAY"] = "stub"
+    # Every process serves its metrics on its own port, counting up from METRICS_PORT
+    if os.getenv("METRICS_PORT"):
+        os.environ["METRICS_PORT"] = str(int(os.environ["METRICS_PORT"]) + cluster_id)
+    # Beats stop once the bot has stopped, a process stuck exiting counts as dead
+    done = threading.Event()
+    threading.Thread(target=beat, args=(heartbeat, done), name="heartbeat", daemon=True).start()
+    try:
+        bot_main.main()
+    finally:
+        done.set()
+
+
+class Cluster:
+    """One supervised bot process and its restart state."""
+
+    def __init__(self, cluster_id, shard_ids):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.process = None
+        self.heartbeat = None
+        self.started_at = 0.0
+        self.restart_at = 0.0
+        self.restart_delay = 1.0
+        self.restarts = 0
+
+
+class Launcher:
+    """
+    Starts one bot process per shard range and restarts them when they crash.
+
+    Every process connects its own contiguous range of shards. They share
+    the files in resources/, which are written under a cross-process lock
+    (see services/storage.py). A guild always belongs to the same shard, so
+    the per-guild caches of a process never go stale because of another.
+    """
+
+    def __init__(self, shard_count, processes, stub=False):
+        """
+        Initialize the Launcher.
+
+        Args:
+            shard_count (int): The total number of shards.
+            processes (int): The number of bot processes.
+            stub (bool): Use the stub gateway instead of connecting to Discord.
+        """
+        self.shard_count = shard_count
+        self.stub = stub
+        self.clusters = [
+            Cluster(cluster_id, shard_ids)
+            for cluster_id, shard_ids in enumerate(shard_ranges(shard_count, processes))
+        ]
+        self.context = multiprocessing.get_context("spawn")
+        self.stopping = False
+
+    def start(self, cluster):
+        """Start the process of a cluster."""
+        # Starting counts as the first beat, importing the bot takes a moment
+        cluster.heartbeat = self.context.Value("d", time.time(), lock=False)
+        cluster.process = self.context.Process(
+            target=run_cluster,
+            args=(
+                cluster.cluster_id,
+                cluster.shard_ids,
+                self.shard_count,
+                self.stub,
+                cluster.heartbeat,
+            ),
+            name=f"cluster-{cluster.cluster_id}",
+        )
+        cluster.process.start()
+        cluster.started_at = time.monotonic()
+        logger.info("Cluster %s started with shards %s.", cluster.cluster_id, cluster.shard_ids)
+
+    def check(self, cluster, now):
+        """
+        Restart a cluster whose process exited or stopped beating, backing off if it keeps crashing.
+
+        A process can be alive without running the bot, like one that
+        crashed but hangs while exiting, so the heartbeat decides.
+        """
+        if cluster.process.is_alive():
+            silent = time.time() - cluster.heartbeat.value
+            if silent < HEARTBEAT_TIMEOUT:
+                if now - cluster.started_at >= STABLE_AFTER:
+                    cluster.restart_delay = 1.0
+                return
+            logger.warning(
+                "Cluster %s sent no heartbeat for %.0fs, killing it.", cluster.cluster_id, silent
+            )
+            cluster.process.kill()
+            cluster.process.join(5)
+        if not cluster.restart_at:
+            logger.warning(
+                "Cluster %s exited with code %s, restarting in %.0fs.",
+                cluster.cluster_id,
+                cluster.process.exitcode,
+                cluster.restart_delay,
+            )
+            cluster.restart_at = now + cluster.restart_delay
+            cluster.restart_delay = min(cluster.restart_delay * 2, MAX_RESTART_DELAY)
+        elif now >= cluster.restart_at:
+            cluster.restart_at = 0.0
+            cluster.restarts += 1
+            self.start(cluster)
+
+    def stop(self, *_):
+        """Stop supervising and terminate every process."""
+        self.stopping = True
+
+    def run(self, poll=1.0):
+        """
+        Start every cluster and supervise them until interrupted.
+
+        Args:
+            poll (float): Seconds between checks of the processes.
+        """
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        for cluster in self.clusters:
+            self.start(cluster)
+        while not self.stopping:
+            time.sleep(poll)
+            now = time.monotonic()
+            for cluster in self.clusters:
+                if not self.stopping:
+                    self.check(cluster, now)
+        for cluster in self.clusters:
+            if cluster.process.is_alive():
+                cluster.process.terminate()
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for cluster in self.clusters:
+            cluster.process.join(max(0.0, deadline - time.monotonic()))
+        # A process stuck exiting ignores SIGTERM, and would keep the launcher from exiting
+        for cluster in self.clusters:
+            if cluster.process.is_alive():
+                logger.warning("Cluster %s didn't stop in time, killing it.", cluster.cluster_id)
+                cluster.process.kill()
+                cluster.process.join()
+        logger.info("All clusters stopped.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the bot as several processes.")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--shards",
+        type=int,
+        help="total number of shards, defaults to SHARD_COUNT or Discord's recommendation",
+    )
+    parser.add_argument(
+        "--stub", action="store_true", help="don't connect to Discord, for local testing"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)-8s %(name)s: %(message)s")
+
+    load_dotenv()
+    shard_count = args.shards or int(os.getenv("SHARD_COUNT", "0"))
+    if not shard_count:
+        if args.stub:
+            shard_count = args.processes
+        else:
+            shard_count = asyncio.run(recommended_shard_count(os.getenv("DISCORD_TOKEN")))
+    Launcher(shard_count, args.processes, stub=args.stub).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import os
+from bisect import bisect_left, insort
+from services.io_stats import listdir
+
+
+# Root directory holding one save directory per server
+SAVES_ROOT = os.path.join("resources", "saves")
+# Suffix of every character savefile
+SAVE_SUFFIX = "_stats.csv"
+
+
+def saves_dir(server_id):
+    """
+    Build the save directory path of a server.
+
+    Args:
+        server_id (int): The ID of the server.
+
+    Returns:
+        str: The path of the server's save directory.
+    """
+    return os.path.join(SAVES_ROOT, f"server_{server_id}")
+
+
+def normalize(name):
+    """
+    Normalize a character name for lookups.
+
+    Args:
+        name (str): The character name as typed by the user.
+
+    Returns:
+        str: The lowercased name without surrounding whitespace.
+    """
+    return name.strip().lower()
+
+
+class GuildCharacterIndex:
+    """
+    Name index of the saved characters of one server.
+
+    Maps normalized names to the name the savefile was stored under, so a
+    lookup is a dict access instead of a filesystem check. The normalized
+    names are also kept sorted, which lets autocomplete find every name
+    starting with a prefix with a binary search.
+    """
+
+    def __init__(self, server_id):
+        """
+        Initialize the index and load it with a single directory listing.
+
+        Args:
+            server_id (int): The ID of the server.
+        """
+        self.server_id = server_id
+        self._names = {}  # normalized name -> stored name
+        self._sorted = []  # normalized names in sorted order
+        self.load()
+
+    def load(self):
+        """Rebuild the index from the server's save directory."""
+        self._names.clear()
+        self._sorted = []
+        try:
+            filenames = listdir(saves_dir(self.server_id))
+        except FileNotFoundError:
+            return  # No saves yet for this server
+        for filename in filenames:
+            if filename.endswith(SAVE_SUFFIX):
+                stored_name = filename[: -len(SAVE_SUFFIX)]
+                self._names[normalize(stored_name)] = stored_name
+        self._sorted = sorted(self._names)
+
+    def resolve(self, name):
+        """
+        Find the stored name of a character.
+
+        Args:
+            name (str): The character name in any casing.
+
+        Returns:
+            str: The name the savefile is stored under, or None if there is none.
+        """
+        return self._names.get(normalize(name))
+
+    def complete(self, prefix, limit=25):
+        """
+        Find the characters whose name starts with a prefix.
+
+        Args:
+            prefix (str): The start of the name in any casing.
+            limit (int): The maximum number of names to return.
+
+        Returns:
+            list: The stored names of the matching characters, sorted.
+        """
+        prefix = normalize(prefix)
+        matches = []
+        position = bisect_left(self._sorted, prefix)
+        while position < len(self._sorted) and len(matches) < limit:
+            key = self._sorted[position]
+            if not key.startswith(prefix):
+                break
+            matches.append(self._names[key])
+            position += 1
+        return matches
+
+    def add(self, name):
+        """Register a newly saved character."""
+        key = normalize(name)
+        if key not in self._names:
+            insort(self._sorted, key)
+        self._names[key] = name
+
+    def remove(self, name):
+        """Forget a deleted character."""
+        key = normalize(name)
+        if self._names.pop(key, None) is not None:
+            del self._sorted[bisect_left(self._sorted, key)]
+
+    def names(self):
+        """
+        List the stored names of all characters.
+
+        Returns:
+            list: The stored names.
+        """
+        return list(self._names.values())
+
+    def __contains__(self, name):
+        return normalize(name) in self._names
+
+    def __len__(self):
+        return len(self._names)
+
+
+class CharacterIndex:
+    """
+    Character name indexes of all servers, each loaded lazily on first use.
+    """
+
+    def __init__(self):
+        self._guilds = {}  # server_id -> GuildCharacterIndex
+
+    def guild(self, server_id):
+        """
+        Get the index of a server, loading it if needed.
+
+        Args:
+            server_id (int): The ID of the server.
+
+        Returns:
+            GuildCharacterIndex: The server's index.
+        """
+        index = self._guilds.get(server_id)
+        if index is None:
+            index = self._guilds[server_id] = GuildCharacterIndex(server_id)
+        return index
+
+    def warm(self, server_ids):
+        """
+        Load the indexes of some servers ahead of their first use.
+
+        Args:
+            server_ids (iterable): The IDs of the servers.
+        """
+        for server_id in server_ids:
+            self.guild(server_id)
+
+    def resolve(self, server_id, name):
+        """
+        Find the stored name of a character on a server.
+
+        Args:
+            server_id (int): The ID of the server.
+            name (str): The character name in any casing.
+
+        Returns:
+            str: The name the savefile is stored under, or None if there is none.
+        """
+        return self.guild(server_id).resolve(name)
+
+    def filepath(self, server_id, name):
+        """
+        Find the savefile of a character on a server.
+
+        Args:
+            server_id (int): The ID of the server.
+            name (str): The character name in any casing.
+
+        Returns:
+            str: The path of the savefile, or None if the character doesn't exist.
+        """
+        stored_name = self.resolve(server_id, name)
+        if stored_name is None:
+            return None
+        return os.path.join(saves_dir(server_id), f"{stored_name}{SAVE_SUFFIX}")
+
+    def complete(self, server_id, prefix, limit=25):
+        """
+        Find the characters on a server whose name starts with a prefix.
+
+        Args:
+            server_id (int): The ID of the server.
+            prefix (str): The start of the name in any casing.
+            limit (int): The maximum number of names to return.
+
+        Returns:
+            list: The stored names of the matching characters, sorted.
+        """
+        return self.guild(server_id).complete(prefix, limit)
+
+    def add(self, server_id, name):
+        """Register a newly saved character on a server."""
+        self.guild(server_id).add(name)
+
+    def remove(self, server_id, name):
+        """Forget a deleted character on a server."""
+        self.guild(server_id).remove(name)
+
+    def forget(self, server_id):
+        """Drop the loaded index of a server, it's reloaded on next use."""
+        self._guilds.pop(server_id, None)
+
+
+# Shared index used by the commands and views
+characters = CharacterIndex()
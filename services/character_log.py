@@ -0,0 +1,490 @@
+import asyncio
+import csv
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from services.character_index import SAVE_SUFFIX, normalize
+from services.io_stats import exists, open_file, remove, stat
+from services.storage import atomic_write, file_lock
+
+
+logger = logging.getLogger(__name__)
+
+# Event log of the recent character changes of a server, next to its savefiles
+EVENTS_NAME = "events.jsonl"
+# Events already compacted into the savefiles, one archive per character in this subdirectory
+HISTORY_DIR = "history"
+HISTORY_SUFFIX = ".jsonl.gz"
+
+# Kinds of events
+CREATED = "created"
+LEVELED = "leveled"
+STATS_INCREASED = "stats_increased"
+DELETED = "deleted"
+UNDONE = "undone"
+
+
+def name_of(filepath):
+    """Get the character name of a savefile path."""
+    return os.path.basename(filepath)[: -len(SAVE_SUFFIX)]
+
+
+def read_snapshot(filepath):
+    """
+    Read the rows of a savefile as they were at the last compaction.
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist.
+    """
+    with open_file(filepath, newline="") as file:
+        return list(csv.DictReader(file))
+
+
+def history_path(directory, name):
+    """Build the path of the archived events of a character."""
+    return os.path.join(directory, HISTORY_DIR, f"{normalize(name)}{HISTORY_SUFFIX}")
+
+
+def read_archive(path):
+    """Read the archived events of a character, oldest first, none if there is no archive."""
+    try:
+        with open_file(path, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return []
+    return [json.loads(line) for line in gzip.decompress(data).decode("utf-8").splitlines()]
+
+
+def write_archive(path, events):
+    """Replace the archived events of a character."""
+    data = "".join(json.dumps(event, separators=(",", ":")) + "\n" for event in events)
+    with atomic_write(path, mode="wb") as file:
+        file.write(gzip.compress(data.encode("utf-8")))
+
+
+def write_snapshot(filepath, rows):
+    """Write the rows of a character to its savefile."""
+    with atomic_write(filepath) as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def apply(rows, event):
+    """
+    Apply an event to the rows of a character.
+
+    Events hold the values after the change, not the difference, so
+    applying one to rows that already have it changes nothing. That makes
+    a compaction interrupted between writing the savefiles and emptying
+    the log safe to repeat.
+
+    Args:
+        rows (list): The rows of the character, None if it doesn't exist. Changed in place.
+        event (dict): The event.
+
+    Returns:
+        list: The rows after the event, None if the character doesn't exist afterwards.
+    """
+    kind = event.get("kind", event["type"])
+    if kind == CREATED:
+        return [dict(row) for row in event["rows"]]
+    if kind == DELETED or rows is None:
+        return None
+    if kind == LEVELED:
+        after = event["after"]
+        for row in rows:
+            if row["Class"] and row["Level"]:
+                row["Level"] = after["Level"]
+            row["Health"] = after["Health"]
+    elif kind == STATS_INCREASED:
+        for row in rows:
+            values = event["after"].get(row["Attribute"])
+            if values is not None:
+                row["Value"], row["Modifier"] = values
+    return rows
+
+
+def inverse(event):
+    """
+    Build the fields of the event reverting another one.
+
+    Args:
+        event (dict): The event to revert.
+
+    Returns:
+        dict: The kind of change that reverts it and its values.
+    """
+    kind = event.get("kind", event["type"])
+    if kind == CREATED:
+        return {"kind": DELETED, "rows": event["rows"]}
+    if kind == DELETED:
+        return {"kind": CREATED, "rows": event["rows"]}
+    return {"kind": kind, "before": event["after"], "after": event["before"]}
+
+
+# What /history calls the changes that get undone
+_CHANGES = {
+    CREATED: "creation",
+    LEVELED: "level up",
+    STATS_INCREASED: "attribute points",
+    DELETED: "deletion",
+}
+
+
+def describe(event):
+    """Describe an event in one line, e.g. "leveled 3 -> 5, 24 -> 38 HP"."""
+    kind = event.get("kind", event["type"])
+    if kind == LEVELED:
+        before, after = event["before"], event["after"]
+        text = f"leveled {before['Level']} -> {after['Level']}, {before['Health']} -> {after['Health']} HP"
+    elif kind == STATS_INCREASED:
+        text = ", ".join(
+            f"{stat} {event['before'][stat][0]} -> {value}"
+            for stat, (value, _) in event["after"].items()
+        )
+    else:
+        text = kind
+    if event["type"] == UNDONE:
+        change = f"undid {_CHANGES.get(event['of'], event['of'])}"
+        return change if kind in (CREATED, DELETED) else f"{change} ({text})"
+    return text
+
+
+class CharacterLog:
+    """
+    Append-only log of the character changes of every server.
+
+    Creating and deleting a character writes or removes its savefile like
+    before, leveling up and ability score improvements only append an event
+    to the server's `events.jsonl`. The savefiles are snapshots: loading a
+    character reads its savefile and replays the events after it. Once a
+    server's log holds `compact_after` events, a worker thread applies them
+    to the savefiles, moves them to the archives in `history/` and starts
+    the log empty again. Each archive keeps the last `history_keep` events
+    of its character, which is as far back as /history and /undo reach.
+
+    The log is guarded by the same directory lock as the savefiles, so a
+    read-modify-write holding `file_lock` of a savefile sees every event.
+    A compaction holds that lock while it writes, so the commands take it
+    in worker threads too, never on the event loop.
+    """
+
+    def __init__(self, compact_after=64, maxsize=1024, history_keep=200):
+        """
+        Initialize the CharacterLog.
+
+        Args:
+            compact_after (int): Events in a server's log that trigger a compaction.
+            maxsize (int): Number of servers whose parsed log is kept.
+            history_keep (int): Archived events kept per character.
+        """
+        self.compact_after = compact_after
+        self.maxsize = maxsize
+        self.history_keep = history_keep
+        self._tails = OrderedDict()  # directory -> (version, events)
+        self._tails_lock = threading.Lock()  # Compactions read the tails in worker threads
+        self._compacting = {}  # directory -> compaction task
+        self.appends = 0
+        self.compactions = 0
+
+    def version(self, directory):
+        """
+        Get the version of a server's log, which changes whenever it's written.
+
+        Returns:
+            tuple: The modification time in nanoseconds and the size, None if there is no log.
+        """
+        try:
+            result = stat(os.path.join(directory, EVENTS_NAME))
+        except FileNotFoundError:
+            return None
+        return (result.st_mtime_ns, result.st_size)
+
+    def tail(self, directory):
+        """
+        Read the events of a server not compacted yet, parsed once per change of the log.
+
+        Args:
+            directory (str): The save directory of the server.
+
+        Returns:
+            list: The events, oldest first. Don't change them.
+        """
+        version = self.version(directory)
+        if version is None:
+            return []
+        with self._tails_lock:
+            cached = self._tails.get(directory)
+            if cached is not None and cached[0] == version:
+                self._tails.move_to_end(directory)
+                return cached[1]
+        events = []
+        with open_file(os.path.join(directory, EVENTS_NAME)) as file:
+            for line in file:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # A line torn by a crash while appending
+                    logger.warning("Skipping unreadable event in %s: %r", directory, line)
+        with self._tails_lock:
+            self._tails[directory] = (version, events)
+            self._tails.move_to_end(directory)
+            if len(self._tails) > self.maxsize:
+                self._tails.popitem(last=False)
+        return events
+
+    def load(self, filepath):
+        """
+        Load the current rows of a character: its savefile plus the events after it.
+
+        Args:
+            filepath (str): The path of the savefile.
+
+        Returns:
+            list: The rows of the character.
+
+        Raises:
+            FileNotFoundError: If the character doesn't exist.
+        """
+        key = normalize(name_of(filepath))
+        # Read the log before the savefile, a compaction in between can make the result
+        # stale for a moment but never loses events. Writers hold the lock anyway.
+        events = [
+            event
+            for event in self.tail(os.path.dirname(filepath))
+            if normalize(event["name"]) == key
+        ]
+        # Creating or deleting the character replaces its whole state
+        start = None
+        for position, event in enumerate(events):
+            if event.get("kind", event["type"]) in (CREATED, DELETED):
+                start = position
+        if start is None:
+            rows = read_snapshot(filepath)
+        else:
+            rows = None
+            events = events[start:]
+        for event in events:
+            rows = apply(rows, event)
+        if rows is None:
+            raise FileNotFoundError(filepath)
+        return rows
+
+    def append(self, filepath, event_type, user_id, **fields):
+        """
+        Record a change of a character.
+
+        Created characters get their savefile written right away and deleted
+        ones have it removed, so the savefiles always list the characters.
+        Hold `file_lock` of the savefile from loading the character to here.
+
+        Args:
+            filepath (str): The path of the savefile.
+            event_type (str): The kind of event, e.g. LEVELED.
+            user_id (int): The user making the change.
+            **fields: The values of the event, see `apply`.
+
+        Returns:
+            dict: The event.
+        """
+        directory = os.path.dirname(filepath)
+        path = os.path.join(directory, EVENTS_NAME)
+        event = {
+            "time": round(time.time(), 3),
+            "type": event_type,
+            "name": name_of(filepath),
+            "user": str(user_id),
+            **fields,
+        }
+        with file_lock(path):
+            with open_file(path, "a") as file:
+                file.write(json.dumps(event, separators=(",", ":")) + "\n")
+            self.appends += 1
+            change = event.get("kind", event_type)
+            if change == CREATED:
+                write_snapshot(filepath, event["rows"])
+            elif change == DELETED and exists(filepath):
+                remove(filepath)
+            if len(self.tail(directory)) >= self.compact_after:
+                self.schedule_compaction(directory)
+        return event
+
+    def schedule_compaction(self, directory):
+        """
+        Compact the log of a server in a worker thread.
+
+        Outside the event loop, e.g. in a worker thread already, it compacts
+        right away instead.
+
+        Args:
+            directory (str): The save directory of the server.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.compact(directory)
+            return
+        if directory in self._compacting:
+            return
+        task = loop.create_task(asyncio.to_thread(self.compact, directory))
+        self._compacting[directory] = task
+        task.add_done_callback(partial(self._compacted, directory))
+
+    def _compacted(self, directory, task):
+        """Forget a finished compaction and log its error, if any."""
+        del self._compacting[directory]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(
+                "Compacting the character events in %s failed.", directory, exc_info=task.exception()
+            )
+
+    def compact(self, directory):
+        """
+        Apply the log of a server to its savefiles and start a new log.
+
+        Blocks on the files, so call it from a worker thread. Repeating a
+        compaction interrupted before emptying the log changes nothing.
+
+        Args:
+            directory (str): The save directory of the server.
+
+        Returns:
+            int: Number of events compacted.
+        """
+        path = os.path.join(directory, EVENTS_NAME)
+        with file_lock(path):
+            events = self.tail(directory)
+            if not events:
+                return 0
+            names = {normalize(event["name"]): event["name"] for event in events}
+            for key, name in names.items():
+                filepath = os.path.join(directory, f"{name}{SAVE_SUFFIX}")
+                try:
+                    write_snapshot(filepath, self.load(filepath))
+                except FileNotFoundError:
+                    if exists(filepath):
+                        remove(filepath)
+                archive = history_path(directory, name)
+                archived = read_archive(archive)
+                # Skip the events an interrupted compaction already archived
+                seen = {json.dumps(event, sort_keys=True) for event in archived}
+                archived += [
+                    event
+                    for event in events
+                    if normalize(event["name"]) == key
+                    and json.dumps(event, sort_keys=True) not in seen
+                ]
+                write_archive(archive, archived[-self.history_keep:])
+            with atomic_write(path):
+                pass
+            self.compactions += 1
+        logger.info("Compacted %s character events in %s.", len(events), directory)
+        return len(events)
+
+    def history(self, filepath):
+        """
+        List the changes of a character, the archived ones included.
+
+        Blocks on the files, so call it from a worker thread.
+
+        Args:
+            filepath (str): The path of the savefile.
+
+        Returns:
+            list: The events of the character, oldest first.
+        """
+        directory = os.path.dirname(filepath)
+        key = normalize(name_of(filepath))
+        with file_lock(filepath):
+            events = read_archive(history_path(directory, key))
+            events += [event for event in self.tail(directory) if normalize(event["name"]) == key]
+        return events
+
+    def pending(self, filepath):
+        """
+        List the changes of a character that can still be undone, and its creator.
+
+        Only the character as it exists now counts: a character deleted and
+        later created again under the same name is another character, so
+        the changes stop at its latest creation.
+
+        Args:
+            filepath (str): The path of the savefile.
+
+        Returns:
+            tuple: The changes not undone yet, oldest first, and the ID of the creator, None if unknown.
+        """
+        events = self.history(filepath)
+        start = 0
+        for position, event in enumerate(events):
+            if event["type"] == CREATED:
+                start = position
+        pending = []
+        for event in events[start:]:
+            if event["type"] != UNDONE:
+                pending.append(event)
+            elif pending and pending[-1]["time"] == event["undoes"]:
+                # Reverts of changes older than the archive keeps have nothing to pop
+                pending.pop()
+        # The creator is in the created or deleted rows, or in the savefile of an older character
+        creator_id = next(
+            (event["rows"][0]["CreatorID"] for event in events[start:] if event.get("rows")), None
+        )
+        if creator_id is None:
+            try:
+                creator_id = self.load(filepath)[0]["CreatorID"]
+            except (FileNotFoundError, IndexError):
+                pass
+        return pending, creator_id
+
+    def undo(self, filepath, user_id, allowed):
+        """
+        Revert the last change of a character that isn't reverted yet.
+
+        Undoing again reverts the change before that one. The revert is an
+        event itself, so the history keeps both. Blocks on the files, so
+        call it from a worker thread.
+
+        Args:
+            filepath (str): The path of the savefile.
+            user_id (int): The user undoing the change.
+            allowed (callable): Called with the ID of the character's creator, returns whether the user may undo.
+
+        Returns:
+            tuple: The reverted event and the reverting one, None if there is nothing to undo.
+
+        Raises:
+            PermissionError: If `allowed` returns False.
+        """
+        with file_lock(filepath):
+            pending, creator_id = self.pending(filepath)
+            if not pending:
+                return None
+            if not allowed(creator_id):
+                raise PermissionError(creator_id)
+            target = pending[-1]
+            # Undo under the name the reverted event was stored under
+            filepath = os.path.join(os.path.dirname(filepath), f"{target['name']}{SAVE_SUFFIX}")
+            event = self.append(
+                filepath, UNDONE, user_id, of=target["type"], undoes=target["time"], **inverse(target)
+            )
+        return target, event
+
+    def collect_metrics(self):
+        """Metrics of the character log for the metrics endpoint."""
+        yield "dicebot_character_events_total", "counter", "Character changes appended to the event logs.", [
+            ({}, self.appends)
+        ]
+        yield "dicebot_character_compactions_total", "counter", "Compactions of a server's event log into its savefiles.", [
+            ({}, self.compactions)
+        ]
+
+
+# Shared log every character change goes through
+character_log = CharacterLog()
@@ -0,0 +1,264 @@
+import asyncio
+import logging
+import time
+import discord
+
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitBucket:
+    """
+    Token bucket for one rate limit route.
+
+    Starts full and refills continuously, so a burst of `rate` requests goes
+    out at once and anything beyond that is spread over `per` seconds.
+    """
+
+    __slots__ = ("rate", "per", "tokens", "updated", "waits")
+
+    def __init__(self, rate, per):
+        """
+        Initialize the RateLimitBucket.
+
+        Args:
+            rate (int): Number of requests allowed per window.
+            per (float): Length of the window in seconds.
+        """
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.waits = 0  # Number of times a request had to wait for a token
+
+    def _refill(self):
+        """Add the tokens earned since the last update."""
+        now = time.monotonic()
+        self.tokens = min(
+            self.rate, self.tokens + (now - self.updated) * self.rate / self.per
+        )
+        self.updated = now
+
+    def delay(self):
+        """
+        Get the time until a token is available.
+
+        Returns:
+            float: Seconds to wait, 0 if a request can be sent right away.
+        """
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * self.per / self.rate
+
+    def idle(self, now):
+        """
+        Tell whether the bucket has refilled completely, so a new one would be the same.
+
+        Args:
+            now (float): The current `time.monotonic()`.
+        """
+        return self.tokens + (now - self.updated) * self.rate / self.per >= self.rate
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        delay = self.delay()
+        if delay:
+            self.waits += 1
+            await asyncio.sleep(delay)
+            self._refill()
+        self.tokens -= 1
+
+
+class RateLimitBuckets:
+    """
+    Rate limit buckets per route, created on first use.
+
+    Message edits share a bucket per channel. Edits of interaction messages
+    go through the webhook of their interaction, limited per interaction
+    token, so they get a bucket per interaction. Interactions come and go,
+    so buckets that have refilled completely are dropped every
+    `SWEEP_INTERVAL` seconds.
+    """
+
+    # Requests per window for each kind of route, kept below Discord's limits
+    LIMITS = {
+        "channel": (5, 5.0),
+        "webhook": (5, 2.0),
+    }
+    # Seconds between two sweeps for idle buckets
+    SWEEP_INTERVAL = 60.0
+
+    def __init__(self):
+        self._buckets = {}  # (route, channel or interaction ID) -> RateLimitBucket
+        self._next_sweep = time.monotonic() + self.SWEEP_INTERVAL
+
+    @staticmethod
+    def route(message):
+        """
+        Get the rate limit route of a message edit.
+
+        Args:
+            message (discord.Message): The message being edited.
+
+        Returns:
+            tuple: The kind of route and the channel ID, or the interaction ID for webhook edits.
+        """
+        if isinstance(message, (discord.InteractionMessage, discord.WebhookMessage)):
+            # Each interaction has its own token, and so its own webhook limit
+            metadata = message.interaction_metadata
+            if metadata is not None:
+                return ("webhook", metadata.id)
+            return ("webhook", message.channel.id)
+        return ("channel", message.channel.id)
+
+    def get(self, route):
+        """
+        Get the bucket of a route.
+
+        Args:
+            route (tuple): The route as returned by `route`.
+
+        Returns:
+            RateLimitBucket: The route's bucket.
+        """
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self.sweep(now)
+        bucket = self._buckets.get(route)
+        if bucket is None:
+            bucket = self._buckets[route] = RateLimitBucket(*self.LIMITS[route[0]])
+        return bucket
+
+    def sweep(self, now):
+        """
+        Drop the buckets that have refilled completely.
+
+        Args:
+            now (float): The current `time.monotonic()`.
+        """
+        self._buckets = {
+            route: bucket for route, bucket in self._buckets.items() if not bucket.idle(now)
+        }
+        self._next_sweep = now + self.SWEEP_INTERVAL
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class _PendingEdit:
+    """An edit waiting to be sent, updated in place by newer edits."""
+
+    __slots__ = ("message", "fields", "task")
+
+    def __init__(self, message, fields):
+        self.message = message
+        self.fields = fields
+        self.task = None
+
+
+class EditQueue:
+    """
+    Outbound layer for message edits.
+
+    Edits to the same message within `window` seconds are merged and only the
+    latest state is sent. Before sending, the edit waits for a token of its
+    route's rate limit bucket, so the bot slows down before Discord answers
+    with a 429. Edits arriving while it waits are merged as well.
+    """
+
+    def __init__(self, window=0.25):
+        """
+        Initialize the EditQueue.
+
+        Args:
+            window (float): Seconds to wait for newer edits before sending.
+        """
+        self.window = window
+        self.buckets = RateLimitBuckets()
+        self._pending = {}  # message_id -> _PendingEdit
+        self.counters = {"requested": 0, "sent": 0, "coalesced": 0, "superseded": 0}
+
+    async def edit(self, message, **fields):
+        """
+        Queue an edit of a message.
+
+        Returns right away, the edit is sent in the background.
+
+        Args:
+            message (discord.Message): The message to edit.
+            **fields: The keyword arguments for `discord.Message.edit`.
+        """
+        self.counters["requested"] += 1
+        pending = self._pending.get(message.id)
+        if pending is not None:
+            # Merge into the edit that's already waiting, newer fields win
+            pending.fields.update(fields)
+            self.counters["coalesced"] += 1
+            return
+        pending = self._pending[message.id] = _PendingEdit(message, fields)
+        pending.task = asyncio.create_task(self._send(pending))
+
+    async def respond(self, interaction: discord.Interaction, **fields):
+        """
+        Answer a component interaction by editing its message.
+
+        The response carries the newest state of the message, so any queued
+        edit of that message is dropped instead of being sent afterwards.
+
+        Args:
+            interaction (discord.Interaction): The component interaction.
+            **fields: The keyword arguments for `discord.InteractionResponse.edit_message`.
+        """
+        if interaction.message is not None:
+            self.supersede(interaction.message.id)
+        await interaction.response.edit_message(**fields)
+
+    def supersede(self, message_id):
+        """
+        Drop the queued edit of a message.
+
+        Args:
+            message_id (int): The ID of the message.
+        """
+        pending = self._pending.pop(message_id, None)
+        if pending is not None:
+            pending.task.cancel()
+            self.counters["superseded"] += 1
+
+    async def flush(self):
+        """Wait until every queued edit has been sent."""
+        tasks = [pending.task for pending in self._pending.values()]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _send(self, pending):
+        """
+        Send a queued edit once the window has passed and the route allows it.
+
+        Args:
+            pending (_PendingEdit): The queued edit.
+        """
+        try:
+            await asyncio.sleep(self.window)
+            await self.buckets.get(self.buckets.route(pending.message)).acquire()
+            # Newer edits from here on start a new pending edit
+            self._forget(pending)
+            await pending.message.edit(**pending.fields)
+            self.counters["sent"] += 1
+        except discord.HTTPException as e:
+            logger.warning("Couldn't edit message %s: %s", pending.message.id, e)
+        except Exception:
+            # Nothing awaits this task, so an error would only surface when it's collected
+            logger.exception("Editing message %s failed.", pending.message.id)
+        finally:
+            self._forget(pending)
+
+    def _forget(self, pending):
+        """Stop merging newer edits into a queued edit."""
+        if self._pending.get(pending.message.id) is pending:
+            del self._pending[pending.message.id]
+
+
+# Shared queue used by the commands and views
+edit_queue = EditQueue()
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import os
+
+
+logger = logging.getLogger(__name__)
+
+
+class LoopSettings:
+    """How the event loop of the bot is created and tuned."""
+
+    __slots__ = ("name", "debug", "slow_callback")
+
+    def __init__(self, name="asyncio", debug=False, slow_callback=0.1):
+        """
+        Initialize the LoopSettings.
+
+        Args:
+            name (str): "uvloop" or "asyncio".
+            debug (bool): Run the loop in asyncio's debug mode.
+            slow_callback (float): Seconds after which debug mode logs a callback as slow.
+        """
+        self.name = name
+        self.debug = debug
+        self.slow_callback = slow_callback
+
+    @classmethod
+    def from_env(cls):
+        """
+        Read the settings from the environment.
+
+        EVENT_LOOP picks the loop, LOOP_DEBUG turns on debug mode and
+        SLOW_CALLBACK_MS sets the threshold for slow callback warnings,
+        which asyncio only logs in debug mode.
+
+        Returns:
+            LoopSettings: The settings.
+
+        Raises:
+            ValueError: If EVENT_LOOP names an unknown loop.
+        """
+        name = os.getenv("EVENT_LOOP", "asyncio").strip().lower()
+        if name not in ("asyncio", "uvloop"):
+            raise ValueError("EVENT_LOOP must be 'asyncio' or 'uvloop'")
+        debug = os.getenv("LOOP_DEBUG", "").strip().lower() in ("1", "true", "yes")
+        slow_callback = float(os.getenv("SLOW_CALLBACK_MS", "100")) / 1000
+        return cls(name, debug, slow_callback)
+
+    def loop_factory(self):
+        """
+        Get the function creating the event loop.
+
+        Falls back to the default loop if uvloop is asked for but not installed.
+
+        Returns:
+            callable: A function returning a new event loop.
+        """
+        if self.name == "uvloop":
+            try:
+                import uvloop
+            except ImportError:
+                logger.warning("uvloop is not installed, using the asyncio event loop")
+            else:
+                return uvloop.new_event_loop
+        return asyncio.new_event_loop
+
+    def run(self, main):
+        """
+        Run a coroutine on a new loop created from the settings.
+
+        Args:
+            main (coroutine): The coroutine to run.
+
+        Returns:
+            The return value of the coroutine.
+        """
+        with asyncio.Runner(debug=self.debug, loop_factory=self.loop_factory()) as runner:
+            loop = runner.get_loop()
+            loop.slow_callback_duration = self.slow_callback
+            logger.info(
+                "Running on %s.%s (debug %s)",
+                type(loop).__module__,
+                type(loop).__name__,
+                "on" if self.debug else "off",
+            )
+            return runner.run(main)
@@ -0,0 +1,221 @@
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class IOStats:
+    """Counts of the filesystem operations of one handler."""
+
+    __slots__ = ("opens", "bytes_read", "bytes_written", "listdirs", "removes", "stats")
+
+    def __init__(self):
+        self.opens = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.listdirs = 0
+        self.removes = 0
+        self.stats = 0
+
+    def add(self, other):
+        """Add the counts of another IOStats to these."""
+        for slot in self.__slots__:
+            setattr(self, slot, getattr(self, slot) + getattr(other, slot))
+
+    def summary(self, calls=1):
+        """
+        Describe the counts, e.g. "1 listdir, 4,812 opens, 3.1 MB read".
+
+        Args:
+            calls (int): Divide the counts by this to get them per call.
+
+        Returns:
+            str: The non-zero counts, or "no I/O".
+        """
+        parts = []
+        for count, name in (
+            (self.listdirs, "listdir"),
+            (self.opens, "open"),
+            (self.stats, "stat"),
+            (self.removes, "remove"),
+        ):
+            count = round(count / calls)
+            if count:
+                parts.append(f"{count:,} {name}{'s' if count != 1 else ''}")
+        for count, name in ((self.bytes_read, "read"), (self.bytes_written, "written")):
+            if count:
+                parts.append(f"{format_bytes(count / calls)} {name}")
+        return ", ".join(parts) or "no I/O"
+
+
+def format_bytes(count):
+    """Format a byte count as B, KB or MB."""
+    if count >= 1_000_000:
+        return f"{count / 1_000_000:.1f} MB"
+    if count >= 1_000:
+        return f"{count / 1_000:.1f} KB"
+    return f"{round(count)} B"
+
+
+# The counts of the command or callback the current task is running
+_current = ContextVar("io_stats", default=None)
+
+
+class IOAccounting:
+    """
+    Storage operations attributed to the command or callback that caused them.
+
+    The invoke hooks and the `timed` callbacks start a fresh IOStats in the
+    running task's context, the storage helpers below count into it, and
+    the finished counts are added to the handler's totals. Operations outside
+    any handler, like warming the caches, count as "(background)".
+    """
+
+    def __init__(self):
+        self.handlers = {}  # name -> [calls, IOStats]
+        self.background = IOStats()
+
+    def current(self):
+        """Get the counts of the running handler, or the background counts."""
+        return _current.get() or self.background
+
+    def begin(self):
+        """
+        Start counting for a handler in the current context.
+
+        Returns:
+            tuple: The token restoring the previous counts and the new counts.
+        """
+        stats = IOStats()
+        return _current.set(stats), stats
+
+    def end(self, name, started):
+        """
+        Stop counting and add the counts to the handler's totals.
+
+        Args:
+            name (str): The name of the command or callback.
+            started (tuple): What `begin` returned.
+        """
+        token, stats = started
+        try:
+            _current.reset(token)
+        except ValueError:
+            _current.set(None)  # Ended in another context than it began in
+        totals = self.handlers.get(name)
+        if totals is None:
+            totals = self.handlers[name] = [0, IOStats()]
+        totals[0] += 1
+        totals[1].add(stats)
+
+    async def before_invoke(self, ctx):
+        """Command hook starting to count the command's I/O."""
+        ctx.io_started = self.begin()
+
+    async def after_invoke(self, ctx):
+        """Command hook adding the command's I/O to its totals."""
+        started = getattr(ctx, "io_started", None)
+        if started is not None:
+            self.end(f"/{ctx.command.qualified_name}", started)
+
+    def report(self):
+        """
+        Describe the I/O of every handler, most bytes read first.
+
+        Returns:
+            list: Lines like "/showall (3 calls): 1 listdir, 4,812 opens, 3.1 MB read per call".
+        """
+        rows = sorted(
+            self.handlers.items(), key=lambda item: item[1][1].bytes_read, reverse=True
+        )
+        lines = [
+            f"{name} ({calls:,} call{'s' if calls != 1 else ''}): {stats.summary(calls)} per call"
+            for name, (calls, stats) in rows
+        ]
+        lines.append(f"(background): {self.background.summary()}")
+        return lines
+
+    def collect_metrics(self):
+        """Metrics of the storage operations for the metrics endpoint."""
+        handlers = [(name, stats) for name, (_, stats) in self.handlers.items()]
+        handlers.append(("(background)", self.background))
+        yield "dicebot_storage_operations_total", "counter", "Filesystem operations by handler.", [
+            ({"handler": name, "operation": operation}, getattr(stats, operation))
+            for name, stats in handlers
+            for operation in ("opens", "listdirs", "removes", "stats")
+        ]
+        yield "dicebot_storage_bytes_total", "counter", "Bytes read and written by handler.", [
+            ({"handler": name, "direction": direction}, getattr(stats, f"bytes_{direction}"))
+            for name, stats in handlers
+            for direction in ("read", "written")
+        ]
+
+
+# Shared accounting used by the hooks and the storage helpers
+io_stats = IOAccounting()
+
+
+def _raw(file):
+    """Get the unbuffered file under a text or binary file, None if there is none."""
+    return getattr(getattr(file, "buffer", file), "raw", None)
+
+
+@contextmanager
+def open_file(file, mode="r", **kwargs):
+    """
+    Open a file like `open`, counting the open and the bytes read or written.
+
+    Bytes are counted at the OS level, so a partly read file only counts
+    the blocks that were actually read.
+
+    Args:
+        file (str or int): The path or file descriptor to open.
+        mode (str): Passed to `open`.
+        **kwargs: Passed to `open`.
+
+    Yields:
+        file: The open file.
+    """
+    stats = io_stats.current()
+    with open(file, mode, **kwargs) as handle:
+        stats.opens += 1
+        raw = _raw(handle)
+        start = raw.tell() if raw is not None else 0
+        try:
+            yield handle
+        finally:
+            if raw is not None and not handle.closed:
+                if "r" in mode and "+" not in mode:
+                    stats.bytes_read += raw.tell() - start
+                else:
+                    handle.flush()
+                    stats.bytes_written += raw.tell() - start
+
+
+def listdir(path):
+    """List a directory like `os.listdir`, counting it."""
+    io_stats.current().listdirs += 1
+    return os.listdir(path)
+
+
+def remove(path):
+    """Delete a file like `os.remove`, counting it."""
+    io_stats.current().removes += 1
+    os.remove(path)
+
+
+def stat(path):
+    """Stat a file like `os.stat`, counting it."""
+    io_stats.current().stats += 1
+    return os.stat(path)
+
+
+def exists(path):
+    """Check a path like `os.path.exists`, counting it as a stat."""
+    io_stats.current().stats += 1
+    return os.path.exists(path)
+
+
+def isfile(path):
+    """Check a path like `os.path.isfile`, counting it as a stat."""
+    io_stats.current().stats += 1
+    return os.path.isfile(path)
@@ -0,0 +1,135 @@
+import math
+from random import randint
+
+
+# Sides of the hit die of every class, classes not listed use a d12
+HIT_DICE = {
+    "Sorcerer": 6,
+    "Wizard": 6,
+    "Artificer": 8,
+    "Bard": 8,
+    "Cleric": 8,
+    "Druid": 8,
+    "Monk": 8,
+    "Rogue": 8,
+    "Warlock": 8,
+    "Fighter": 10,
+    "Paladin": 10,
+    "Ranger": 10,
+    "Barbarian": 12,
+}
+# Levels granting an ability score improvement, Rogues and Fighters get extra ones
+ASI_LEVELS = frozenset({4, 8, 12, 16, 19})
+CLASS_ASI_LEVELS = {
+    "Rogue": ASI_LEVELS | {10},
+    "Fighter": ASI_LEVELS | {6, 14},
+}
+# Attribute points every ability score improvement grants
+POINTS_PER_ASI = 2
+MAX_LEVEL = 20
+
+# Ways to increase the health on a level up
+METHOD_AVERAGE = "avg"
+METHOD_ROLL = "roll"
+
+
+def hp_gains(dndclass, const_modifier, levels, method, roll=randint):
+    """
+    Compute the health gained on each of several level ups.
+
+    The Constitution modifier is the one before leveling, ability score
+    improvements chosen afterwards don't change the gains.
+
+    Args:
+        dndclass (str): The class of the character.
+        const_modifier (int): The character's Constitution modifier.
+        levels (int): Number of levels gained.
+        method (str): METHOD_AVERAGE or METHOD_ROLL.
+        roll (callable): Rolls a die, called with 1 and the number of sides.
+
+    Returns:
+        list: The die result or average of every level, the gains are these plus the modifier.
+    """
+    sides = HIT_DICE.get(dndclass, 12)
+    if method == METHOD_ROLL:
+        return [roll(1, sides) for _ in range(levels)]
+    return [math.ceil((1 + sides) / 2)] * levels
+
+
+def asi_count(dndclass, old_level, new_level):
+    """Count the ability score improvements reached going from one level to another."""
+    levels = CLASS_ASI_LEVELS.get(dndclass, ASI_LEVELS)
+    return sum(1 for level in range(old_level + 1, new_level + 1) if level in levels)
+
+
+class LevelUp:
+    """
+    Several level ups of one character, computed in one pass over its savefile.
+
+    Holds the new rows, so the savefile is written once however many
+    levels are gained.
+    """
+
+    __slots__ = ("name", "rows", "dndclass", "old_level", "new_level", "dice", "hp_gain", "points")
+
+    def __init__(self, name, rows, levels, method, roll=randint):
+        """
+        Level up the rows of a savefile in memory.
+
+        Args:
+            name (str): The name of the character.
+            rows (list): The rows of the savefile, updated in place.
+            levels (int): Number of levels to gain, capped at MAX_LEVEL.
+            method (str): METHOD_AVERAGE or METHOD_ROLL.
+            roll (callable): Rolls a die, called with 1 and the number of sides.
+
+        Raises:
+            ValueError: If the savefile has no class, level or Constitution.
+        """
+        first = next((row for row in rows if row["Class"] and row["Level"]), None)
+        if first is None:
+            raise ValueError("Error: Class or level not found - Can't level up.")
+        const = next((row for row in rows if row["Attribute"] == "Constitution"), None)
+        if const is None:
+            raise ValueError("Error: Constitution modifier not found - Can't calculate HP.")
+        self.name = name
+        self.rows = rows
+        self.dndclass = first["Class"]
+        self.old_level = int(first["Level"])
+        self.new_level = min(MAX_LEVEL, self.old_level + levels)
+        gained = self.new_level - self.old_level
+        const_modifier = int(const["Modifier"])
+        self.dice = hp_gains(self.dndclass, const_modifier, gained, method, roll)
+        self.hp_gain = sum(self.dice) + const_modifier * gained
+        self.points = POINTS_PER_ASI * asi_count(self.dndclass, self.old_level, self.new_level)
+        for row in rows:
+            if row["Class"] and row["Level"]:
+                row["Level"] = str(self.new_level)
+            row["Health"] = str(int(row["Health"]) + self.hp_gain)
+
+    @property
+    def gained(self):
+        """int: Number of levels actually gained."""
+        return self.new_level - self.old_level
+
+    def summary(self, method):
+        """
+        Describe the level up, e.g. "Bob: level 3 -> 5, +14 HP (rolled 6, 4)".
+
+        Args:
+            method (str): The method the health was increased with.
+
+        Returns:
+            str: One line for the character.
+        """
+        if not self.gained:
+            return f"{self.name} is already level {MAX_LEVEL}."
+        how = (
+            f"rolled {', '.join(map(str, self.dice))}"
+            if method == METHOD_ROLL
+            else f"average {self.dice[0]} per level"
+        )
+        line = f"{self.name}: level {self.old_level} -> {self.new_level}, +{self.hp_gain} HP ({how})"
+        if self.points:
+            line += f", {self.points} attribute points to spend"
+        return line
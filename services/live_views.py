@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import sys
+import types
+import weakref
+from collections import Counter
+import discord
+from discord.ext import commands
+
+
+logger = logging.getLogger(__name__)
+
+# Objects shared by every view, not counted towards a view's size
+_SHARED_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+    weakref.ref,
+    asyncio.AbstractEventLoop,
+    discord.Client,
+    discord.state.ConnectionState,
+    discord.Guild,
+    discord.abc.GuildChannel,
+    discord.User,
+    discord.Member,
+    commands.Cog,
+    commands.Command,
+    discord.app_commands.CommandTree,
+)
+
+
+def retained_size(obj, depth=4):
+    """
+    Approximate the memory a view keeps alive.
+
+    Follows the attributes and containers of the object a few levels deep,
+    counting each object once and skipping ones every view shares, like
+    the bot, guilds, channels, members, cogs, commands and functions. A
+    view's context therefore counts with its message and arguments, but
+    not the bot or the guild it points to.
+
+    Args:
+        obj (object): The object to measure.
+        depth (int): How many references deep to follow.
+
+    Returns:
+        int: Approximate size in bytes.
+    """
+    seen = set()
+    total = 0
+    level = [obj]
+    for _ in range(depth + 1):
+        following = []
+        for item in level:
+            if id(item) in seen or isinstance(item, _SHARED_TYPES):
+                continue
+            seen.add(id(item))
+            total += sys.getsizeof(item, 0)
+            if isinstance(item, (str, bytes, int, float, bool)) or item is None:
+                continue
+            if isinstance(item, dict):
+                following.extend(item.keys())
+                following.extend(item.values())
+            elif isinstance(item, (list, tuple, set, frozenset)):
+                following.extend(item)
+            else:
+                following.extend(getattr(item, "__dict__", {}).values())
+                for slot in getattr(type(item), "__slots__", ()):
+                    following.append(getattr(item, slot, None))
+        level = following
+    return total
+
+
+def guild_of(view):
+    """Get the ID of the guild a view belongs to, from its context or session."""
+    ctx = getattr(view, "ctx", None)
+    if ctx is not None and getattr(ctx, "guild", None) is not None:
+        return ctx.guild.id
+    session = getattr(view, "session", None)
+    if session is not None:
+        return session.guild_id
+    return getattr(view, "guild_id", None)
+
+
+class LiveViews:
+    """
+    Registry of the views that are still alive, by type.
+
+    Views register themselves when created and drop out by themselves once
+    they are garbage collected, so the registry never keeps one alive. A
+    view that lives long after it timed out points at a leak, like a flow
+    abandoned while something still holds its view. Logs a warning when
+    the live views of one type exceed `warn_at`.
+    """
+
+    def __init__(self, warn_at=500):
+        """
+        Initialize the LiveViews.
+
+        Args:
+            warn_at (int): Live views of one type above which a warning is logged, 0 turns it off.
+        """
+        self.warn_at = warn_at
+        self._views = {}  # type name -> WeakSet of views
+        self.created = Counter()  # type name -> views created
+        self._warned = set()  # Types over the threshold, warned about once until they drop below
+
+    def add(self, view):
+        """Track a new view."""
+        name = type(view).__qualname__
+        views = self._views.get(name)
+        if views is None:
+            views = self._views[name] = weakref.WeakSet()
+        views.add(view)
+        self.created[name] += 1
+        if not self.warn_at:
+            return
+        live = len(views)
+        if live > self.warn_at and name not in self._warned:
+            self._warned.add(name)
+            logger.warning(
+                "%s live %s views, more than %s. Abandoned flows may be leaking them.",
+                live,
+                name,
+                self.warn_at,
+            )
+        elif live <= self.warn_at // 2:
+            self._warned.discard(name)
+
+    def counts(self):
+        """
+        Count the live views.
+
+        Returns:
+            dict: Live views by type name.
+        """
+        return {name: len(views) for name, views in self._views.items()}
+
+    def report(self, sample=50):
+        """
+        Describe the live views of every type, most first.
+
+        Measuring every view would take long with many of them, so the size
+        is extrapolated from a sample.
+
+        Args:
+            sample (int): Views measured per type.
+
+        Returns:
+            list: Rows of type, live views, views created, approximate KiB and the
+                guild with the most live views of that type.
+        """
+        rows = []
+        for name, views in self._views.items():
+            live = list(views)
+            measured = live[:sample]
+            size = sum(retained_size(view) for view in measured)
+            if measured:
+                size = size * len(live) / len(measured)
+            guilds = Counter(guild_of(view) for view in live)
+            top = guilds.most_common(1)
+            rows.append(
+                [
+                    name,
+                    len(live),
+                    self.created[name],
+                    round(size / 1024, 1),
+                    f"{top[0][0]} ({top[0][1]})" if top else "",
+                ]
+            )
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return rows
+
+    def collect_metrics(self):
+        """Metrics of the live views for the metrics endpoint."""
+        yield "dicebot_live_views", "gauge", "Views not garbage collected yet, by type.", [
+            ({"type": name}, live) for name, live in self.counts().items()
+        ]
+        yield "dicebot_live_view_bytes", "gauge", "Approximate memory the live views keep, by type.", [
+            ({"type": row[0]}, round(row[3] * 1024)) for row in self.report(sample=10)
+        ]
+        yield "dicebot_views_created_total", "counter", "Views created, by type.", [
+            ({"type": name}, count) for name, count in self.created.items()
+        ]
+
+
+# Shared registry every TrackedView registers with
+live_views = LiveViews()
+
+
+class TrackedView(discord.ui.View):
+    """A view that registers itself with the live view registry."""
+
+    def __init__(self, *args, guild_id=None, **kwargs):
+        """
+        Initialize the TrackedView.
+
+        Args:
+            *args: Passed to discord.ui.View.
+            guild_id (int, optional): The guild of a view without a context or session.
+            **kwargs: Passed to discord.ui.View.
+        """
+        super().__init__(*args, **kwargs)
+        if guild_id is not None:
+            self.guild_id = guild_id
+        live_views.add(self)
@@ -0,0 +1,196 @@
+import copy
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import sys
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+
+logger = logging.getLogger(__name__)
+
+# Guild and command of the handler the current task is running, added to every record
+_log_context = ContextVar("log_context", default=None)
+
+# Record attributes every LogRecord has, anything else was passed as `extra`
+_STANDARD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message",
+    "asctime",
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats every record as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _RecordQueueHandler(QueueHandler):
+    """
+    Queues records with their message and traceback rendered to text.
+
+    Unlike QueueHandler, keeps the traceback apart from the message, so the
+    listener's formatters still show it as a traceback.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class ContextFilter(logging.Filter):
+    """Adds the guild and command of the running handler to records logged in it."""
+
+    def filter(self, record):
+        context = _log_context.get()
+        if context is not None:
+            for key, value in context.items():
+                if not hasattr(record, key):
+                    setattr(record, key, value)
+        return True
+
+
+def gzip_rotator(source, dest):
+    """Compress a rotated log file."""
+    with open(source, "rb") as plain, gzip.open(dest, "wb") as compressed:
+        shutil.copyfileobj(plain, compressed)
+    os.remove(source)
+
+
+class LogSettings:
+    """Where and how the bot logs, read from the environment."""
+
+    __slots__ = ("path", "max_bytes", "backups", "json", "level")
+
+    def __init__(self, path, max_bytes=10_000_000, backups=5, json=True, level=logging.INFO):
+        """
+        Initialize the LogSettings.
+
+        Args:
+            path (str): The log file, rotated files get .1.gz, .2.gz and so on.
+            max_bytes (int): Size after which the log file is rotated.
+            backups (int): Number of rotated files kept.
+            json (bool): Write JSON records instead of plain text.
+            level (int): The lowest level logged.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.json = json
+        self.level = level
+
+    @classmethod
+    def from_env(cls):
+        """
+        Read the settings from the environment.
+
+        LOG_PATH sets the log file, LOG_MAX_BYTES and LOG_BACKUPS the
+        rotation, LOG_FORMAT=text turns off JSON and LOG_LEVEL sets the level.
+        Every process of a cluster logs to its own file by default.
+
+        Returns:
+            LogSettings: The settings.
+        """
+        cluster_id = os.getenv("CLUSTER_ID")
+        log_name = "discord.log" if cluster_id is None else f"discord-{cluster_id}.log"
+        path = os.getenv("LOG_PATH") or os.path.join("Bot", "Dice-Bot", "logs", log_name)
+        level = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").strip().upper())
+        return cls(
+            path,
+            max_bytes=int(os.getenv("LOG_MAX_BYTES", "10000000")),
+            backups=int(os.getenv("LOG_BACKUPS", "5")),
+            json=os.getenv("LOG_FORMAT", "json").strip().lower() != "text",
+            level=level if isinstance(level, int) else logging.INFO,
+        )
+
+    def file_handler(self):
+        """
+        Create the rotating handler of the log file.
+
+        Returns:
+            RotatingFileHandler: Appends to the log file and compresses rotated files.
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        handler = RotatingFileHandler(
+            self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8"
+        )
+        handler.namer = lambda name: f"{name}.gz"
+        handler.rotator = gzip_rotator
+        if self.json:
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(
+                logging.Formatter("%(asctime)s %(levelname)-8s %(name)s: %(message)s")
+            )
+        return handler
+
+    def start(self):
+        """
+        Route every log record through a queue to the file and the console.
+
+        The loop thread only puts records on the queue, a listener thread
+        formats and writes them, so logging never waits on the disk.
+
+        Returns:
+            QueueListener: The running listener, stop it to flush the queue on exit.
+        """
+        console = logging.StreamHandler(sys.stderr)
+        console.setFormatter(logging.Formatter("%(asctime)s %(levelname)-8s %(name)s: %(message)s"))
+        records = queue.SimpleQueue()
+        queue_handler = _RecordQueueHandler(records)
+        queue_handler.addFilter(ContextFilter())
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(self.level)
+        listener = QueueListener(records, self.file_handler(), console, respect_handler_level=True)
+        listener.start()
+        return listener
+
+
+async def before_invoke(ctx):
+    """Command hook adding the guild and command to the records logged while it runs."""
+    _log_context.set(
+        {
+            "guild": ctx.guild.id if ctx.guild else None,
+            "command": ctx.command.qualified_name,
+        }
+    )
+
+
+async def after_invoke(ctx):
+    """Command hook logging the command's latency."""
+    started_at = getattr(ctx, "started_at", None)
+    latency_ms = round((time.perf_counter() - started_at) * 1000, 1) if started_at else None
+    logger.info(
+        "/%s %s in %s ms",
+        ctx.command.qualified_name,
+        "failed" if ctx.command_failed else "finished",
+        latency_ms,
+        extra={"latency_ms": latency_ms, "failed": ctx.command_failed},
+    )
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from services.metrics import Histogram
+
+
+logger = logging.getLogger(__name__)
+
+# Folders holding the code of the commands and buttons, used to find who blocked the loop
+HANDLER_DIRS = tuple(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), folder) + os.sep
+    for folder in ("commands", "components")
+)
+
+
+class LoopMonitor:
+    """
+    Measures how late the event loop wakes up and finds out what blocked it.
+
+    A task on the loop wakes up every `interval` seconds and records how late
+    it was. A watchdog thread notices when the loop hasn't woken up for longer
+    than `threshold` and looks at the loop thread's stack while it is still
+    blocked, to name the command or callback that is running.
+    """
+
+    def __init__(self, bot, threshold=0.25, interval=0.05, sample_stacks=False):
+        """
+        Initialize the LoopMonitor.
+
+        Args:
+            bot (discord.ext.commands.Bot): The bot, used to name commands.
+            threshold (float): Seconds of lag after which a stall is reported.
+            interval (float): Seconds between two wakeups of the loop task.
+            sample_stacks (bool): Log the loop thread's stack with every stall.
+        """
+        self.bot = bot
+        self.threshold = threshold
+        self.interval = interval
+        self.sample_stacks = sample_stacks
+        self.lag = Histogram()
+        self.worst = 0.0
+        self.stalls = Counter()  # handler -> stalls
+        self.stall_seconds = Counter()  # handler -> seconds blocked
+        self._last_beat = time.perf_counter()
+        self._culprit = None  # (handler, stack) seen by the watchdog during the current stall
+        self._loop_thread = None
+        self._task = None
+        self._watchdog = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_env(cls, bot):
+        """
+        Create the monitor from the environment.
+
+        LOOP_LAG_MS sets the threshold, 0 turns the monitor off. LOOP_STACKS=1
+        logs the stack of every stall.
+
+        Returns:
+            LoopMonitor: The monitor, or None if it's turned off.
+        """
+        threshold = float(os.getenv("LOOP_LAG_MS", "250")) / 1000
+        if threshold <= 0:
+            return None
+        sample_stacks = os.getenv("LOOP_STACKS", "").strip().lower() in ("1", "true", "yes")
+        return cls(bot, threshold=threshold, sample_stacks=sample_stacks)
+
+    def start(self):
+        """Start the loop task and the watchdog thread, must be called on the loop."""
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._beat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        """Stop the loop task and the watchdog thread."""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _beat(self):
+        """Wake up regularly and record how late every wakeup was."""
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - self._last_beat - self.interval)
+            self._last_beat = now
+            self.lag.observe(lag)
+            self.worst = max(self.worst, lag)
+            if lag >= self.threshold:
+                self._report(lag)
+
+    def _report(self, lag):
+        """Log a stall and charge it to the handler the watchdog saw."""
+        handler, stack = self._culprit or ("unknown", None)
+        self._culprit = None
+        self.stalls[handler] += 1
+        self.stall_seconds[handler] += lag
+        if stack:
+            logger.warning("Event loop blocked for %.0f ms by %s\n%s", lag * 1000, handler, stack)
+        else:
+            logger.warning("Event loop blocked for %.0f ms by %s", lag * 1000, handler)
+
+    def _watch(self):
+        """Look at the loop thread's stack while it is blocked."""
+        while not self._stop.wait(self.interval):
+            if self._culprit is not None:
+                continue  # Already seen this stall
+            if time.perf_counter() - self._last_beat - self.interval < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame)) if self.sample_stacks else None
+            self._culprit = (self.handler_of(frame), stack)
+
+    def handler_of(self, frame):
+        """
+        Name the command or callback a stack belongs to.
+
+        Args:
+            frame (frame): The innermost frame of the stack.
+
+        Returns:
+            str: The command's name, the callback's qualified name or "unknown".
+        """
+        commands_by_code = {
+            command.callback.__code__: command.qualified_name
+            for command in self.bot.walk_commands()
+        }
+        handler = "unknown"
+        # The outermost frame inside the command or button code is the handler
+        while frame is not None:
+            code = frame.f_code
+            if code in commands_by_code:
+                return commands_by_code[code]
+            if code.co_filename.startswith(HANDLER_DIRS):
+                handler = code.co_qualname
+            frame = frame.f_back
+        return handler
+
+    def report(self):
+        """
+        Get the handlers that blocked the loop the longest.
+
+        Returns:
+            list: Rows of handler, stalls and milliseconds blocked, longest first.
+        """
+        return [
+            [handler, self.stalls[handler], round(seconds * 1000)]
+            for handler, seconds in self.stall_seconds.most_common()
+        ]
+
+    def collect_metrics(self):
+        """Metrics of the loop for the metrics endpoint."""
+        yield "dicebot_loop_lag_seconds_max", "gauge", "Longest the event loop woke up late.", [
+            ({}, self.worst)
+        ]
+        yield "dicebot_loop_wakeups_total", "counter", "Wakeups of the loop monitor.", [
+            ({}, self.lag.count)
+        ]
+        yield "dicebot_loop_lag_seconds_total", "counter", "Total lag of the loop monitor's wakeups.", [
+            ({}, self.lag.total)
+        ]
+        yield "dicebot_loop_stalls_total", "counter", "Times a handler blocked the event loop.", [
+            ({"handler": handler}, count) for handler, count in self.stalls.items()
+        ]
+        yield "dicebot_loop_stall_seconds_total", "counter", "Seconds a handler blocked the event loop.", [
+            ({"handler": handler}, seconds) for handler, seconds in self.stall_seconds.items()
+        ]
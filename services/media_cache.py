@@ -0,0 +1,167 @@
+import json
+import logging
+import os
+import time
+from urllib.parse import parse_qs, urlparse
+import discord
+from services.storage import atomic_write, file_lock
+
+
+logger = logging.getLogger(__name__)
+
+# File the uploaded media URLs are persisted in
+MEDIA_CACHE_FILE = os.path.join("resources", "media_cache.json")
+# Seconds before the expiry of a URL at which it's uploaded again
+EXPIRY_MARGIN = 3600
+
+
+def url_expiry(url):
+    """
+    Get the expiry time of a signed Discord CDN URL.
+
+    Args:
+        url (str): The attachment URL.
+
+    Returns:
+        int: The expiry as a Unix timestamp, or None if the URL isn't signed.
+    """
+    values = parse_qs(urlparse(url).query).get("ex")
+    if not values:
+        return None
+    try:
+        return int(values[0], 16)  # The expiry is sent as a hex timestamp
+    except ValueError:
+        return None
+
+
+class MediaCache:
+    """
+    CDN URLs of local media files that have been uploaded to Discord.
+
+    A file is uploaded once, as the image of an embed, and later messages
+    point their embed at the URL Discord gave the attachment. URLs are saved
+    to disk so they survive restarts, and uploaded again shortly before
+    their signature expires.
+    """
+
+    def __init__(self, path=MEDIA_CACHE_FILE):
+        """
+        Initialize the MediaCache and load the saved URLs.
+
+        Args:
+            path (str): The JSON file the URLs are persisted in.
+        """
+        self.path = path
+        self._urls = {}  # media path -> CDN URL
+        self.counters = {"hits": 0, "uploads": 0}
+        self.load()
+
+    def load(self):
+        """Load the saved URLs, starting empty if there are none or the file is broken."""
+        try:
+            with open(self.path) as file:
+                self._urls = json.load(file)
+        except FileNotFoundError:
+            self._urls = {}
+        except (OSError, ValueError) as e:
+            logger.warning("Couldn't read %s, starting empty: %s", self.path, e)
+            self._urls = {}
+
+    def save(self):
+        """Write the URLs to disk, keeping the ones other bot processes saved meanwhile."""
+        with file_lock(self.path):
+            urls = self._urls
+            self.load()
+            self._urls.update(urls)
+            with atomic_write(self.path, newline=None) as file:
+                json.dump(self._urls, file, indent=2)
+
+    def url(self, media_path):
+        """
+        Get the CDN URL of a media file if it's still usable.
+
+        Args:
+            media_path (str): The path of the local file.
+
+        Returns:
+            str: The URL, or None if the file has to be uploaded.
+        """
+        url = self._urls.get(media_path)
+        if url is None:
+            return None
+        expiry = url_expiry(url)
+        if expiry is not None and expiry - EXPIRY_MARGIN <= time.time():
+            return None
+        return url
+
+    def remember(self, media_path, message):
+        """
+        Store the URL Discord gave an uploaded file.
+
+        Args:
+            media_path (str): The path of the local file.
+            message (discord.Message): The message the file was uploaded with.
+        """
+        if message is None or not message.embeds or not message.embeds[0].image.url:
+            return
+        self._urls[media_path] = message.embeds[0].image.url
+        self.counters["uploads"] += 1
+        try:
+            self.save()
+        except OSError as e:
+            logger.warning("Couldn't save %s: %s", self.path, e)
+
+    async def send_embed(self, ctx, media_path, embed):
+        """
+        Send an embed showing a media file, uploading it only if needed.
+
+        Args:
+            ctx (discord.Context): The context to send the embed in.
+            media_path (str): The path of the local file.
+            embed (discord.Embed): The embed, its image is set here.
+
+        Returns:
+            discord.Message: The sent message.
+        """
+        url = self.url(media_path)
+        if url is not None:
+            self.counters["hits"] += 1
+            embed.set_image(url=url)
+            return await ctx.send(embed=embed)
+        filename = os.path.basename(media_path)
+        embed.set_image(url=f"attachment://{filename}")
+        message = await ctx.send(
+            embed=embed, file=discord.File(media_path, filename=filename)
+        )
+        self.remember(media_path, message)
+        return message
+
+    def forget(self, media_path, message):
+        """
+        Drop the URL of an upload that was removed from its message.
+
+        Discord deletes the attachments an edit leaves out, so the URL stops
+        working and the file has to be uploaded again.
+
+        Args:
+            media_path (str): The path of the local file.
+            message (discord.Message): The message the file was uploaded with.
+        """
+        if message is None or not message.embeds or not message.embeds[0].image.url:
+            return
+        url = message.embeds[0].image.url
+        try:
+            with file_lock(self.path):
+                # Keep a newer upload another bot process saved meanwhile
+                self.load()
+                if self._urls.get(media_path) != url:
+                    return
+                del self._urls[media_path]
+                with atomic_write(self.path, newline=None) as file:
+                    json.dump(self._urls, file, indent=2)
+        except OSError as e:
+            logger.warning("Couldn't save %s: %s", self.path, e)
+
+
+# Shared cache used by the commands
+media = MediaCache()
@@ -0,0 +1,292 @@
+import asyncio
+import functools
+import logging
+import time
+from services.io_stats import io_stats
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, cumulative like Prometheus expects."""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        """Record one duration."""
+        self.total += seconds
+        self.count += 1
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+
+    def cumulative(self):
+        """
+        Get the cumulative count of every bucket.
+
+        Returns:
+            list: Tuples of the bucket's upper bound as text and the count, ending with +Inf.
+        """
+        buckets = []
+        running = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            running += count
+            buckets.append((repr(bound), running))
+        buckets.append(("+Inf", self.count))
+        return buckets
+
+
+class HandlerStats:
+    """Latency, errors and in-flight count of one command or component callback."""
+
+    __slots__ = ("latency", "errors", "in_flight")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.in_flight = 0
+
+
+def escape(value):
+    """Escape a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels):
+    """Format a dict of labels as {key="value",...}."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class MetricsRegistry:
+    """
+    Metrics of the commands and component callbacks, in Prometheus text format.
+
+    Disabled until `enable` is called. While disabled, the command hooks
+    aren't registered and `timed` callbacks only count their I/O.
+    Other services add their own metrics through collectors.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.handlers = {}  # (kind, name) -> HandlerStats
+        self._collectors = []
+
+    def enable(self):
+        """Start recording."""
+        self.enabled = True
+
+    def stats(self, kind, name):
+        """Get the stats of a command or callback, creating them on first use."""
+        key = (kind, name)
+        stats = self.handlers.get(key)
+        if stats is None:
+            stats = self.handlers[key] = HandlerStats()
+        return stats
+
+    def started(self, kind, name):
+        """Count a command or callback as running."""
+        self.stats(kind, name).in_flight += 1
+
+    def finished(self, kind, name, seconds, failed):
+        """
+        Record a finished command or callback.
+
+        Args:
+            kind (str): "command" or "component".
+            name (str): The name of the command or callback.
+            seconds (float): How long it ran.
+            failed (bool): Whether it raised an error.
+        """
+        stats = self.stats(kind, name)
+        stats.in_flight -= 1
+        stats.latency.observe(seconds)
+        if failed:
+            stats.errors += 1
+
+    async def before_invoke(self, ctx):
+        """Command hook counting the command as running."""
+        self.started("command", ctx.command.qualified_name)
+
+    async def after_invoke(self, ctx):
+        """Command hook recording the command's latency and outcome."""
+        started_at = getattr(ctx, "started_at", None)
+        seconds = time.perf_counter() - started_at if started_at is not None else 0.0
+        self.finished("command", ctx.command.qualified_name, seconds, ctx.command_failed)
+
+    def add_collector(self, collector):
+        """
+        Add metrics of another service.
+
+        Args:
+            collector (callable): Returns tuples of metric name, type, help
+                text and a list of (labels dict, value) samples.
+        """
+        self._collectors.append(collector)
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text format.
+
+        Returns:
+            str: The exposition text.
+        """
+        lines = [
+            "# HELP dicebot_handler_seconds Time commands and component callbacks took to run.",
+            "# TYPE dicebot_handler_seconds histogram",
+        ]
+        for (kind, name), stats in sorted(self.handlers.items()):
+            labels = {"kind": kind, "name": name}
+            for bound, count in stats.latency.cumulative():
+                lines.append(
+                    f"dicebot_handler_seconds_bucket{format_labels({**labels, 'le': bound})} {count}"
+                )
+            lines.append(f"dicebot_handler_seconds_sum{format_labels(labels)} {stats.latency.total}")
+            lines.append(f"dicebot_handler_seconds_count{format_labels(labels)} {stats.latency.count}")
+        for metric, metric_type, help_text, attribute in (
+            ("dicebot_handler_errors_total", "counter", "Commands and callbacks that raised.", "errors"),
+            ("dicebot_handler_in_flight", "gauge", "Commands and callbacks running right now.", "in_flight"),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {metric_type}")
+            for (kind, name), stats in sorted(self.handlers.items()):
+                value = getattr(stats, attribute)
+                lines.append(f"{metric}{format_labels({'kind': kind, 'name': name})} {value}")
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.warning("Metrics collector %r failed: %s", collector, e)
+                continue
+            for metric, metric_type, help_text, samples in families:
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{metric}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared registry used by the hooks, the views and the endpoint
+metrics = MetricsRegistry()
+
+
+def timed(callback):
+    """
+    Record the latency, errors and in-flight count of a component callback.
+
+    Its storage I/O is always counted, the rest only while metrics are enabled.
+
+    Args:
+        callback (coroutine function): The callback of a button or view.
+
+    Returns:
+        coroutine function: The wrapped callback.
+    """
+    name = callback.__qualname__
+
+    @functools.wraps(callback)
+    async def wrapper(*args, **kwargs):
+        io_started = io_stats.begin()
+        try:
+            if not metrics.enabled:
+                return await callback(*args, **kwargs)
+            metrics.started("component", name)
+            started_at = time.perf_counter()
+            failed = False
+            try:
+                return await callback(*args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                metrics.finished("component", name, time.perf_counter() - started_at, failed)
+        finally:
+            io_stats.end(name, io_started)
+
+    return wrapper
+
+
+def chain(*hooks):
+    """
+    Combine several command hooks into one, run in the given order.
+
+    Args:
+        *hooks (coroutine function): Hooks taking the command context.
+
+    Returns:
+        coroutine function: A hook running every given hook.
+    """
+
+    async def hook(ctx):
+        for each in hooks:
+            await each(ctx)
+
+    return hook
+
+
+class MetricsServer:
+    """Minimal HTTP server answering GET /metrics with the registry's metrics."""
+
+    def __init__(self, registry, host="127.0.0.1", port=9100):
+        """
+        Initialize the MetricsServer.
+
+        Args:
+            registry (MetricsRegistry): The metrics to serve.
+            host (str): The address to listen on, local only by default.
+            port (int): The port to listen on.
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        """Start listening."""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info("Serving metrics on http://%s:%s/metrics", self.host, self.port)
+
+    async def close(self):
+        """Stop listening."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        """Answer one request and close the connection."""
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Skip the headers
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status = "200 OK"
+                body = self.registry.render().encode()
+            else:
+                status = "404 Not Found"
+                body = b"Not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
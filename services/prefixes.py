@@ -0,0 +1,118 @@
+import csv
+import os
+from services.io_stats import open_file
+
+
+# CSV file holding the custom prefix of every server
+PREFIXES_FILE = os.path.join("resources", "prefixes.csv")
+# Prefix of servers without a custom one
+DEFAULT_PREFIX = "/"
+
+
+def shard_for(server_id, shard_count):
+    """
+    Get the shard a server is connected through, same formula as Discord.
+
+    Args:
+        server_id (int): The ID of the server.
+        shard_count (int): The total number of shards, None if the bot isn't sharded.
+
+    Returns:
+        int: The shard ID.
+    """
+    if not shard_count:
+        return 0
+    return (server_id >> 22) % shard_count
+
+
+class PrefixCache:
+    """
+    Custom prefixes of the servers, partitioned by shard.
+
+    Every shard loads the prefixes of its own servers from the CSV file the
+    first time it needs them, usually when it becomes ready. Looking up the
+    prefix of a message is a dict access instead of a read of the file.
+    """
+
+    def __init__(self, path=PREFIXES_FILE, shard_count=None):
+        """
+        Initialize the PrefixCache.
+
+        Args:
+            path (str): The CSV file holding the prefixes.
+            shard_count (int): The total number of shards, None if the bot isn't sharded.
+        """
+        self.path = path
+        self.shard_count = shard_count
+        self._shards = {}  # shard_id -> {server_id: prefix}
+
+    def _read(self):
+        """
+        Read every prefix from the CSV file.
+
+        Returns:
+            dict: The prefix of every server with a custom one.
+        """
+        prefixes = {}
+        try:
+            with open_file(self.path, newline="") as file:
+                for row in csv.DictReader(file):
+                    prefixes[int(row["ServerID"])] = row["Prefix"]
+        except FileNotFoundError:
+            pass  # No custom prefixes yet
+        return prefixes
+
+    def warm(self, shard_id):
+        """
+        Load the prefixes of the servers on a shard.
+
+        Args:
+            shard_id (int): The shard ID.
+
+        Returns:
+            int: The number of custom prefixes loaded.
+        """
+        self._shards[shard_id] = {
+            server_id: prefix
+            for server_id, prefix in self._read().items()
+            if shard_for(server_id, self.shard_count) == shard_id
+        }
+        return len(self._shards[shard_id])
+
+    def _partition(self, server_id):
+        """Get the prefixes of a server's shard, loading them if needed."""
+        shard_id = shard_for(server_id, self.shard_count)
+        if shard_id not in self._shards:
+            self.warm(shard_id)
+        return self._shards[shard_id]
+
+    def get(self, server_id):
+        """
+        Get the prefix of a server.
+
+        Args:
+            server_id (int): The ID of the server.
+
+        Returns:
+            str: The custom prefix, or the default one if the server has none.
+        """
+        return self._partition(server_id).get(server_id, DEFAULT_PREFIX)
+
+    def set(self, server_id, prefix):
+        """Update the cached prefix of a server after it has been saved."""
+        self._partition(server_id)[server_id] = prefix
+
+    def remove(self, server_id):
+        """Drop the cached prefix of a server after it has been removed."""
+        self._partition(server_id).pop(server_id, None)
+
+    def forget(self, shard_id):
+        """Drop the loaded prefixes of a shard, they're reloaded on next use."""
+        self._shards.pop(shard_id, None)
+
+    def __len__(self):
+        return sum(len(partition) for partition in self._shards.values())
+
+
+# Shared cache used by the prefix lookup and /setprefix
+prefixes = PrefixCache()
@@ -0,0 +1,191 @@
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+
+logger = logging.getLogger(__name__)
+
+# The repository root, stripped from file names in the report
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+
+
+def describe(code):
+    """Name a code object like "commands/dice.py:42 Dice.norm_roll"."""
+    filename = code.co_filename
+    if filename.startswith(ROOT):
+        filename = filename[len(ROOT):]
+    return f"{filename}:{code.co_firstlineno} {code.co_qualname}"
+
+
+class Profiler:
+    """
+    Sampling CPU profiler and allocation tracer for the running bot.
+
+    While started, a thread looks at the event loop thread's stack every
+    `interval` seconds and counts the functions on it, and tracemalloc
+    traces new allocations. Sampling costs the loop nothing but the GIL
+    for a moment, tracing slows allocations down, so a window is bounded
+    and stops by itself after `max_seconds`.
+    """
+
+    def __init__(self, interval=0.01, max_seconds=300, frames=5):
+        """
+        Initialize the Profiler.
+
+        Args:
+            interval (float): Seconds between two stack samples.
+            max_seconds (float): Longest a window may run before it stops by itself.
+            frames (int): Frames tracemalloc keeps per allocation.
+        """
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.frames = frames
+        self.samples = 0
+        self.own = Counter()  # code -> samples it was running in
+        self.total = Counter()  # code -> samples it was on the stack in
+        self.started_at = None
+        self.stopped_at = None
+        self._loop_thread = None
+        self._sampler = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()  # Guards the counters against dumping while sampling
+        self._baseline = None  # tracemalloc snapshot at the start of the window
+        self._snapshot = None  # tracemalloc snapshot at the end of the window
+        self._started_tracing = False
+
+    @property
+    def running(self):
+        """Whether a window is being sampled right now."""
+        return self._sampler is not None and self._sampler.is_alive()
+
+    def start(self, seconds=None):
+        """
+        Start a window, must be called on the loop. Forgets the last window.
+
+        Args:
+            seconds (float): Stop after this many seconds, at most `max_seconds`.
+
+        Returns:
+            float: The length of the window in seconds.
+        """
+        if self.running:
+            raise RuntimeError("The profiler is already running")
+        seconds = min(seconds or self.max_seconds, self.max_seconds)
+        self.samples = 0
+        self.own.clear()
+        self.total.clear()
+        self._snapshot = None
+        # Leave tracing on at the end if it was already on, e.g. by PYTHONTRACEMALLOC
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start(self.frames)
+        self._baseline = tracemalloc.take_snapshot()
+        self._loop_thread = threading.get_ident()
+        self.started_at = time.perf_counter()
+        self.stopped_at = None
+        self._stop.clear()
+        self._sampler = threading.Thread(
+            target=self._sample, args=(self.started_at + seconds,), name="profiler", daemon=True
+        )
+        self._sampler.start()
+        logger.info("Profiling for up to %s seconds.", seconds)
+        return seconds
+
+    def stop(self):
+        """
+        End the window, keeping its results for `dump`.
+
+        Returns:
+            bool: False if no window was running.
+        """
+        if self._sampler is None:
+            return False
+        self._stop.set()
+        self._sampler.join()
+        self._sampler = None
+        return True
+
+    def _finish(self):
+        """Take the final snapshot and stop tracing, called by the sampler thread."""
+        self.stopped_at = time.perf_counter()
+        if tracemalloc.is_tracing():
+            self._snapshot = tracemalloc.take_snapshot()
+            if self._started_tracing:
+                tracemalloc.stop()
+        logger.info("Profiling stopped after %.1f seconds.", self.stopped_at - self.started_at)
+
+    def _sample(self, deadline):
+        """Count the functions on the loop thread's stack until stopped or the deadline."""
+        try:
+            while not self._stop.wait(self.interval) and time.perf_counter() < deadline:
+                frame = sys._current_frames().get(self._loop_thread)
+                if frame is None:
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                with self._lock:
+                    self.samples += 1
+                    self.own[codes[0]] += 1
+                    self.total.update(set(codes))
+        finally:
+            self._finish()
+
+    def dump(self, top=30):
+        """
+        Describe the hottest functions and the biggest allocation sites of the last window.
+
+        Takes a snapshot of a running window without stopping it. Comparing
+        snapshots takes a while with many allocations, so call it off the loop.
+
+        Args:
+            top (int): Number of functions and allocation sites listed.
+
+        Returns:
+            str: The report, or None if no window was started yet.
+        """
+        if self.started_at is None:
+            return None
+        end = self.stopped_at or time.perf_counter()
+        with self._lock:
+            samples = self.samples
+            own = self.own.most_common(top)
+            total = Counter(self.total)
+        lines = [
+            f"Sampled the event loop thread {samples:,} times over "
+            f"{end - self.started_at:.1f} s, every {self.interval * 1000:.0f} ms"
+            + ("" if self.stopped_at else " (still running)"),
+            "",
+            f"Top {top} functions by samples they were running in:",
+            f"{'own %':>7} {'total %':>7}  function",
+        ]
+        samples = max(1, samples)
+        for code, count in own:
+            lines.append(f"{count / samples:>7.1%} {total[code] / samples:>7.1%}  {describe(code)}")
+        lines += ["", f"Top {top} functions by samples they were on the stack in:"]
+        for code, count in total.most_common(top):
+            lines.append(f"{count / samples:>7.1%}  {describe(code)}")
+
+        snapshot = self._snapshot
+        if snapshot is None and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+        lines += ["", f"Top {top} allocation sites by memory still held since the start:"]
+        if snapshot is None or self._baseline is None:
+            lines.append("(tracemalloc wasn't running)")
+        else:
+            lines.append(f"{'KiB':>10} {'blocks':>9}  site")
+            stats = snapshot.compare_to(self._baseline, "lineno")
+            for stat in stats[:top]:
+                frame = stat.traceback[0]
+                filename = frame.filename
+                if filename.startswith(ROOT):
+                    filename = filename[len(ROOT):]
+                lines.append(
+                    f"{stat.size_diff / 1024:>+10.1f} {stat.count_diff:>+9,}  {filename}:{frame.lineno}"
+                )
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import time
+from collections import deque
+import discord
+from discord.ext import commands
+
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseContext(commands.Context):
+    """
+    Context that knows when its interaction got its first response.
+
+    Sending and deferring share a lock, so the pipeline can't defer an
+    interaction while the command is in the middle of answering it.
+
+    The pipeline defers ephemerally, since the first followup after a
+    deferral replaces its "thinking" message and takes its visibility. An
+    ephemeral reply then simply takes the placeholder's place. A public one
+    resolves and deletes the placeholder first, so it goes out as a
+    followup of its own and stays public.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.response_lock = asyncio.Lock()
+        self.started_at = time.perf_counter()
+        self.first_byte_at = None  # When the first response or deferral went out
+        self.auto_deferred = False
+        self.placeholder_pending = False  # An ephemeral auto-deferral nothing has replaced yet
+        self.defer_task = None
+        self.finished = False
+
+    def mark_first_byte(self):
+        """Record the time of the first response, later calls are ignored."""
+        if self.first_byte_at is None:
+            self.first_byte_at = time.perf_counter()
+
+    async def send(self, *args, **kwargs):
+        """Send a message and record it as the first response if it is one."""
+        async with self.response_lock:
+            if self.placeholder_pending:
+                self.placeholder_pending = False
+                if not kwargs.get("ephemeral", False) and not self.interaction.is_expired():
+                    await self._drop_placeholder()
+            message = await super().send(*args, **kwargs)
+        self.mark_first_byte()
+        return message
+
+    async def _drop_placeholder(self):
+        """Resolve and delete the ephemeral "thinking" message of an auto-deferral."""
+        try:
+            await self.interaction.edit_original_response(content="Done.")
+            await self.interaction.delete_original_response()
+        except discord.HTTPException as e:
+            logger.warning("Couldn't remove the deferral of /%s: %s", self.command.qualified_name, e)
+
+    async def defer(self, *, ephemeral=False):
+        """
+        Defer the interaction and record it as the first response.
+
+        Returns:
+            bool: True if the interaction was deferred, False if it had already been answered.
+        """
+        async with self.response_lock:
+            if self.interaction is None or self.interaction.response.is_done():
+                return False
+            await super().defer(ephemeral=ephemeral)
+        self.mark_first_byte()
+        return True
+
+
+class CommandTiming:
+    """Time-to-first-byte statistics of one command."""
+
+    __slots__ = ("count", "deferred", "total", "slowest", "recent")
+
+    def __init__(self, keep=256):
+        """
+        Initialize the CommandTiming.
+
+        Args:
+            keep (int): Number of recent samples kept for percentiles.
+        """
+        self.count = 0
+        self.deferred = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.recent = deque(maxlen=keep)
+
+    def add(self, seconds, deferred):
+        """Record one invocation."""
+        self.count += 1
+        self.deferred += deferred
+        self.total += seconds
+        self.slowest = max(self.slowest, seconds)
+        self.recent.append(seconds)
+
+    def percentile(self, fraction):
+        """
+        Get a percentile of the recent samples.
+
+        Args:
+            fraction (float): The percentile between 0 and 1, e.g. 0.95.
+
+        Returns:
+            float: The time in seconds, 0 if there are no samples.
+        """
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ResponsePipeline:
+    """
+    Defers slow interactions before Discord's 3 second deadline.
+
+    Runs as the bot's before and after invoke hook. When a command invoked
+    through a slash command hasn't answered within `budget` seconds, the
+    interaction gets deferred ephemerally and everything the command sends
+    afterwards is delivered as a followup, with the visibility it asked for. The time to the first response is recorded
+    per command.
+    """
+
+    def __init__(self, budget=2.0):
+        """
+        Initialize the ResponsePipeline.
+
+        Args:
+            budget (float): Seconds a command may take before it gets deferred.
+        """
+        self.budget = budget
+        self.timings = {}  # command name -> CommandTiming
+
+    async def before_invoke(self, ctx):
+        """Start the deferral timer of an interaction based command."""
+        if ctx.interaction is not None and isinstance(ctx, ResponseContext):
+            ctx.defer_task = asyncio.create_task(self._defer_after_budget(ctx))
+
+    async def after_invoke(self, ctx):
+        """Stop the deferral timer and record the time to the first response."""
+        self.finish(ctx)
+
+    def finish(self, ctx):
+        """
+        Stop the deferral timer of a command, safe to call more than once.
+
+        Args:
+            ctx (ResponseContext): The context of the finished command.
+        """
+        if not isinstance(ctx, ResponseContext) or ctx.finished:
+            return
+        ctx.finished = True
+        if ctx.defer_task is not None:
+            ctx.defer_task.cancel()
+            ctx.defer_task = None
+        if ctx.first_byte_at is not None and ctx.command is not None:
+            name = ctx.command.qualified_name
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = CommandTiming()
+            timing.add(ctx.first_byte_at - ctx.started_at, ctx.auto_deferred)
+
+    async def _defer_after_budget(self, ctx):
+        """Defer the interaction if the command hasn't answered within the budget."""
+        await asyncio.sleep(self.budget)
+        try:
+            # Ephemeral, so ephemeral replies stay private, see ResponseContext
+            if not await ctx.defer(ephemeral=True):
+                return
+            ctx.auto_deferred = True
+            ctx.placeholder_pending = True
+            logger.info(
+                "Deferred /%s after %.2fs without a response",
+                ctx.command.qualified_name,
+                self.budget,
+            )
+        except Exception as e:
+            logger.warning("Couldn't defer /%s: %s", ctx.command.qualified_name, e)
+
+    def report(self):
+        """
+        Build a table of the recorded timings, slowest commands first.
+
+        Returns:
+            list: Rows of command name, count, deferred count, p50, p95 and max in milliseconds.
+        """
+        rows = []
+        for name, timing in self.timings.items():
+            rows.append(
+                [
+                    name,
+                    timing.count,
+                    timing.deferred,
+                    round(timing.percentile(0.5) * 1000),
+                    round(timing.percentile(0.95) * 1000),
+                    round(timing.slowest * 1000),
+                ]
+            )
+        rows.sort(key=lambda row: row[4], reverse=True)
+        return rows
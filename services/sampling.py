@@ -0,0 +1,292 @@
+import math
+import os
+import random
+
+
+# Default random number generator, reseeded in forked worker processes like `random`'s own
+_rng = random.Random()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_rng.seed)
+# Largest number of trials the binomial draws stay accurate for, lgamma loses precision beyond it
+MAX_TRIALS = 10**12
+# Largest range summarized with a count per value
+MAX_COUNTED_VALUES = 1000
+
+
+def binomial(n, p, rng=_rng):
+    """
+    Draw the number of successes in n independent trials.
+
+    Same algorithm as `random.binomialvariate` from Python 3.12: the
+    geometric method while n * p is small and BTRS (transformed rejection
+    with squeeze, Hörmann 1993) otherwise. Both are exact and the expected
+    time doesn't grow with n.
+
+    Args:
+        n (int): The number of trials.
+        p (float): The probability of success of each trial.
+        rng (random.Random): The random number generator.
+
+    Returns:
+        int: The number of successes.
+
+    Raises:
+        ValueError: If n is negative or p isn't between 0 and 1.
+    """
+    if n < 0:
+        raise ValueError("n must be a non-negative integer")
+    if p <= 0.0 or p >= 1.0:
+        if p == 0.0:
+            return 0
+        if p == 1.0:
+            return n
+        raise ValueError("p must be in the range 0.0 <= p <= 1.0")
+    if n == 1:
+        return int(rng.random() < p)
+    # Only p <= 0.5 is sampled directly, the rest by symmetry
+    if p > 0.5:
+        return n - binomial(n, 1.0 - p, rng)
+
+    if n * p < 10.0:
+        # Skip from success to success with geometric jumps, O(n * p)
+        successes = trial = 0
+        c = math.log2(1.0 - p)
+        if not c:
+            return successes
+        while True:
+            trial += math.floor(math.log2(rng.random()) / c) + 1
+            if trial > n:
+                return successes
+            successes += 1
+
+    spq = math.sqrt(n * p * (1.0 - p))  # Standard deviation of the distribution
+    b = 1.15 + 2.53 * spq
+    a = -0.0873 + 0.0248 * b + 0.01 * p
+    c = n * p + 0.5
+    vr = 0.92 - 4.2 / b
+    setup_complete = False
+    while True:
+        u = rng.random() - 0.5
+        us = 0.5 - abs(u)
+        k = math.floor((2.0 * a / us + b) * u + c)
+        if k < 0 or k > n:
+            continue
+        # The squeeze accepts most candidates without the expensive test
+        v = rng.random()
+        if us >= 0.07 and v <= vr:
+            return k
+        if not setup_complete:
+            alpha = (2.83 + 5.1 / b) * spq
+            lpq = math.log(p / (1.0 - p))
+            mode = math.floor((n + 1) * p)
+            h = math.lgamma(mode + 1) + math.lgamma(n - mode + 1)
+            setup_complete = True
+        v *= alpha / (a / (us * us) + b)
+        if math.log(v) <= (
+            h - math.lgamma(k + 1) - math.lgamma(n - k + 1) + (k - mode) * lpq
+        ):
+            return k
+
+
+def multinomial(n, weights, rng=_rng):
+    """
+    Distribute n independent draws over outcomes with the given weights.
+
+    Each outcome's count is a binomial draw conditioned on the counts before
+    it, so the time depends on the number of outcomes but not on n.
+
+    Args:
+        n (int): The number of draws.
+        weights (list): The relative weight of every outcome.
+        rng (random.Random): The random number generator.
+
+    Returns:
+        list: The number of draws that landed on each outcome.
+    """
+    counts = []
+    remaining_weight = sum(weights)
+    for weight in weights:
+        if n == 0 or remaining_weight <= 0:
+            counts.append(0)
+            continue
+        count = binomial(n, min(1.0, weight / remaining_weight), rng)
+        counts.append(count)
+        n -= count
+        remaining_weight -= weight
+    return counts
+
+
+def split_range(low, high, parts):
+    """
+    Split the integer range low..high into up to `parts` contiguous buckets.
+
+    Args:
+        low (int): The smallest value.
+        high (int): The largest value.
+        parts (int): The maximum number of buckets.
+
+    Returns:
+        list: Tuples of the first and last value of every bucket.
+    """
+    size = high - low + 1
+    parts = min(parts, size)
+    bounds = [low + size * i // parts for i in range(parts + 1)]
+    return [(bounds[i], bounds[i + 1] - 1) for i in range(parts)]
+
+
+def extreme(low, high, n, smallest=True, rng=_rng):
+    """
+    Draw the minimum or maximum of n uniform draws from low..high.
+
+    Halves the range with a binomial split each step, so it takes
+    O(log(high - low)) binomial draws.
+
+    Args:
+        low (int): The smallest value.
+        high (int): The largest value.
+        n (int): The number of draws, at least 1.
+        smallest (bool): True for the minimum, False for the maximum.
+        rng (random.Random): The random number generator.
+
+    Returns:
+        int: The smallest or largest value drawn.
+    """
+    while low < high:
+        middle = (low + high) // 2
+        in_lower = binomial(n, (middle - low + 1) / (high - low + 1), rng)
+        if smallest:
+            if in_lower:
+                high, n = middle, in_lower
+            else:
+                low = middle + 1
+        else:
+            if in_lower < n:
+                low, n = middle + 1, n - in_lower
+            else:
+                high = middle
+    return low
+
+
+def sample_unique(low, high, k, rng=_rng):
+    """
+    Draw k distinct values from low..high without materializing the range.
+
+    Uses Floyd's algorithm, which needs exactly k random numbers and O(k)
+    memory however large the range is.
+
+    Args:
+        low (int): The smallest value.
+        high (int): The largest value.
+        k (int): The number of values, at most the size of the range.
+        rng (random.Random): The random number generator.
+
+    Returns:
+        list: The drawn values, sorted.
+
+    Raises:
+        ValueError: If k is larger than the range.
+    """
+    size = high - low + 1
+    if k > size:
+        raise ValueError("Can't draw more unique values than the range holds")
+    chosen = set()
+    for j in range(size - k, size):
+        value = rng.randint(0, j)
+        chosen.add(j if value in chosen else value)
+    return sorted(low + value for value in chosen)
+
+
+def summarize_draws(low, high, n, buckets=10, max_counted=MAX_COUNTED_VALUES, rng=_rng):
+    """
+    Summarize n uniform draws from low..high without drawing them one by one.
+
+    Ranges of up to `max_counted` values get an exact count per value, which
+    also gives the mean. Larger ranges only get a count per bucket, and the
+    minimum and maximum are drawn inside the outermost non-empty buckets.
+
+    Args:
+        low (int): The smallest value.
+        high (int): The largest value.
+        n (int): The number of draws, at least 1.
+        buckets (int): The maximum number of buckets.
+        max_counted (int): The largest range that's counted per value.
+        rng (random.Random): The random number generator.
+
+    Returns:
+        tuple: Tuples of first value, last value and count of every bucket,
+            the smallest and largest value drawn and the mean, which is None
+            for ranges that weren't counted per value.
+    """
+    ranges = split_range(low, high, buckets)
+    size = high - low + 1
+    if size <= max_counted:
+        counts = multinomial(n, [1] * size, rng)
+        drawn = [low + i for i, count in enumerate(counts) if count]
+        mean = sum((low + i) * count for i, count in enumerate(counts)) / n
+        summary = [
+            (first, last, sum(counts[first - low : last - low + 1]))
+            for first, last in ranges
+        ]
+        return summary, drawn[0], drawn[-1], mean
+
+    counts = multinomial(n, [last - first + 1 for first, last in ranges], rng)
+    summary = [(first, last, count) for (first, last), count in zip(ranges, counts)]
+    filled = [bucket for bucket in summary if bucket[2]]
+    smallest = extreme(*filled[0], smallest=True, rng=rng)
+    largest = extreme(*filled[-1], smallest=False, rng=rng)
+    return summary, smallest, largest, None
+
+
+# Dice with up to this many sides get a count per face in roll summaries
+MAX_COUNTED_FACES = 20
+
+
+def roll_dice(num_dice, sides, rng=_rng):
+    """
+    Roll dice one by one and summarize them.
+
+    Args:
+        num_dice (int): The number of dice.
+        sides (int): The number of sides of each die.
+        rng (random.Random): The random number generator.
+
+    Returns:
+        tuple: The total, the lowest and highest roll and the count of every
+            face, the counts are None for dice with more than MAX_COUNTED_FACES sides.
+    """
+    randrange = rng.randrange
+    total = 0
+    lowest = sides
+    highest = 1
+    counts = [0] * sides if sides <= MAX_COUNTED_FACES else None
+    for _ in range(num_dice):
+        roll = randrange(sides) + 1
+        total += roll
+        if roll < lowest:
+            lowest = roll
+        if roll > highest:
+            highest = roll
+        if counts is not None:
+            counts[roll - 1] += 1
+    return total, lowest, highest, counts
+
+
+def roll_dice_counts(num_dice, sides, rng=_rng):
+    """
+    Roll dice by drawing how many land on each face.
+
+    Same distribution as `roll_dice`, but the time depends on the number of
+    sides instead of the number of dice.
+
+    Args:
+        num_dice (int): The number of dice.
+        sides (int): The number of sides of each die.
+        rng (random.Random): The random number generator.
+
+    Returns:
+        tuple: Same as `roll_dice`.
+    """
+    counts = multinomial(num_dice, [1] * sides, rng)
+    faces = [face for face, count in enumerate(counts, start=1) if count]
+    total = sum(face * count for face, count in enumerate(counts, start=1))
+    return total, faces[0], faces[-1], counts if sides <= MAX_COUNTED_FACES else None
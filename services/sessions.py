@@ -0,0 +1,300 @@
+import itertools
+import sys
+import time
+from collections import OrderedDict
+from character import Character
+
+
+# Stages a creation session moves through, in order
+STAGE_RACE = "race"
+STAGE_CLASS = "class"
+STAGE_CONFIRM = "confirm"
+STAGE_COMPLETED = "completed"
+STAGE_ABANDONED = "abandoned"
+
+# Allowed transitions of the session state machine
+TRANSITIONS = {
+    STAGE_RACE: (STAGE_CLASS, STAGE_ABANDONED),
+    STAGE_CLASS: (STAGE_CONFIRM, STAGE_ABANDONED),
+    STAGE_CONFIRM: (STAGE_CONFIRM, STAGE_COMPLETED, STAGE_ABANDONED),
+    STAGE_COMPLETED: (),
+    STAGE_ABANDONED: (),
+}
+
+
+class SessionLimitError(Exception):
+    """Raised when a user already has the maximum number of pending creations."""
+
+
+class CreationSession:
+    """
+    State of one in-progress /roll_char character creation.
+
+    The race, class and reroll views only render this object and advance it,
+    so nothing is copied from view to view.
+    """
+
+    __slots__ = (
+        "session_id",
+        "store",
+        "ctx",
+        "message",
+        "guild_id",
+        "invoker_id",
+        "character_name",
+        "num_dice",
+        "sides",
+        "race_name",
+        "dndclass",
+        "player",
+        "hp",
+        "lvl",
+        "stage",
+        "created_at",
+        "touched_at",
+    )
+
+    def __init__(self, session_id, store, ctx, character_name, num_dice, sides):
+        """
+        Initialize a CreationSession.
+
+        Args:
+            session_id (int): The unique ID of the session.
+            store (SessionStore): The store holding the session.
+            ctx: The context object representing the invocation context.
+            character_name (str): The name of the character being created.
+            num_dice (int): Number of dice for rolling stats.
+            sides (int): Number of sides for rolling stats.
+        """
+        self.session_id = session_id
+        self.store = store
+        self.ctx = ctx
+        self.message = None  # The message the creation flow is rendered in
+        self.guild_id = ctx.guild.id
+        self.invoker_id = ctx.author.id
+        self.character_name = character_name
+        self.num_dice = num_dice
+        self.sides = sides
+        self.race_name = None
+        self.dndclass = None
+        self.player = None
+        self.hp = None
+        self.lvl = 1
+        self.stage = STAGE_RACE
+        self.created_at = time.monotonic()
+        self.touched_at = self.created_at
+
+    @property
+    def active(self):
+        """bool: True while the session has neither been completed nor abandoned."""
+        return self.stage not in (STAGE_COMPLETED, STAGE_ABANDONED)
+
+    def advance(self, stage):
+        """
+        Move the session to the given stage.
+
+        Args:
+            stage (str): The stage to move to.
+
+        Raises:
+            ValueError: If the transition is not allowed from the current stage.
+        """
+        if stage not in TRANSITIONS[self.stage]:
+            raise ValueError(f"Can't go from '{self.stage}' to '{stage}'.")
+        self.stage = stage
+        self.store.touch(self)
+
+    def choose_race(self, race_name):
+        """Store the selected race and move on to class selection."""
+        self.race_name = race_name
+        self.advance(STAGE_CLASS)
+
+    async def choose_class(self, dndclass):
+        """
+        Store the selected class and roll the first set of stats.
+
+        Returns:
+            str: The formatted stats table.
+        """
+        self.dndclass = dndclass
+        return await self.roll()
+
+    async def roll(self):
+        """
+        Roll a fresh set of stats for the character.
+
+        Returns:
+            str: The formatted stats table.
+        """
+        self.player = Character(self.character_name, self.guild_id)
+        await self.player.roll_stats(self.num_dice, self.sides)
+        self.hp = int(await self.player.determine_start_hp(self.dndclass))
+        self.advance(STAGE_CONFIRM)
+        return await self.render_stats()
+
+    async def render_stats(self):
+        """
+        Render the current stats of the character.
+
+        Returns:
+            str: The formatted stats table.
+        """
+        return await self.player.show_stats(
+            self.ctx, self.race_name, self.dndclass, self.lvl, self.hp
+        )
+
+    async def save(self):
+        """
+        Save the character and complete the session.
+
+        Returns:
+            str: The confirmation message from saving the character.
+        """
+        result = await self.player.save_to_csv(
+            self.character_name,
+            self.race_name,
+            self.ctx,
+            self.dndclass,
+            self.invoker_id,
+            self.lvl,
+            self.hp,
+        )
+        self.store.complete(self)
+        return result
+
+
+class SessionStore:
+    """
+    Holds all pending character creations with TTL eviction and a per-user cap.
+
+    Sessions are kept in least-recently-touched order, so evicting the expired
+    ones only ever looks at the front of the store.
+    """
+
+    def __init__(self, ttl=120, max_per_user=2):
+        """
+        Initialize the SessionStore.
+
+        Args:
+            ttl (float): Seconds of inactivity after which a session is abandoned.
+            max_per_user (int): Maximum number of concurrent sessions per user.
+        """
+        self.ttl = ttl
+        self.max_per_user = max_per_user
+        self._sessions = OrderedDict()  # session_id -> CreationSession
+        self._per_user = {}  # invoker_id -> number of active sessions
+        self._ids = itertools.count(1)
+        self.counters = {"started": 0, "completed": 0, "abandoned": 0}
+
+    def __len__(self):
+        self.evict_expired()
+        return len(self._sessions)
+
+    def start(self, ctx, character_name, num_dice, sides):
+        """
+        Start a new creation session.
+
+        Args:
+            ctx: The context object representing the invocation context.
+            character_name (str): The name of the character being created.
+            num_dice (int): Number of dice for rolling stats.
+            sides (int): Number of sides for rolling stats.
+
+        Returns:
+            CreationSession: The new session.
+
+        Raises:
+            SessionLimitError: If the user already has too many pending creations.
+        """
+        self.evict_expired()
+        if self._per_user.get(ctx.author.id, 0) >= self.max_per_user:
+            raise SessionLimitError(
+                f"You already have {self.max_per_user} character creations in progress. "
+                "Finish one of them or wait for it to time out."
+            )
+        session = CreationSession(
+            next(self._ids), self, ctx, character_name, num_dice, sides
+        )
+        self._sessions[session.session_id] = session
+        self._per_user[session.invoker_id] = (
+            self._per_user.get(session.invoker_id, 0) + 1
+        )
+        self.counters["started"] += 1
+        return session
+
+    def get(self, session_id):
+        """Return the active session with the given ID, or None."""
+        self.evict_expired()
+        return self._sessions.get(session_id)
+
+    def touch(self, session):
+        """Reset the TTL of a session after activity."""
+        if session.session_id in self._sessions:
+            session.touched_at = time.monotonic()
+            self._sessions.move_to_end(session.session_id)
+
+    def complete(self, session):
+        """Mark a session as completed and remove it from the store."""
+        if session.active:
+            session.stage = STAGE_COMPLETED
+            self._remove(session)
+            self.counters["completed"] += 1
+
+    def abandon(self, session, stage=None):
+        """
+        Mark a session as abandoned and remove it from the store.
+
+        Args:
+            session (CreationSession): The session to abandon.
+            stage (str, optional): Only abandon if the session is still in this stage.
+
+        Returns:
+            bool: True if the session was abandoned.
+        """
+        if not session.active or (stage is not None and session.stage != stage):
+            return False
+        session.stage = STAGE_ABANDONED
+        self._remove(session)
+        self.counters["abandoned"] += 1
+        return True
+
+    def evict_expired(self):
+        """Abandon every session that hasn't been touched within the TTL."""
+        deadline = time.monotonic() - self.ttl
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.touched_at > deadline:
+                break
+            self.abandon(session)
+
+    def _remove(self, session):
+        """Drop a finished session and release its slot for the user."""
+        self._sessions.pop(session.session_id, None)
+        remaining = self._per_user.get(session.invoker_id, 0) - 1
+        if remaining > 0:
+            self._per_user[session.invoker_id] = remaining
+        else:
+            self._per_user.pop(session.invoker_id, None)
+
+    def memory_usage(self):
+        """
+        Approximate the memory held by pending sessions.
+
+        Returns:
+            int: Size in bytes of the session objects and their own fields.
+        """
+        total = sys.getsizeof(self._sessions)
+        for session in self._sessions.values():
+            total += sys.getsizeof(session)
+            for slot in ("character_name", "race_name", "dndclass", "hp"):
+                total += sys.getsizeof(getattr(session, slot))
+        return total
+
+    def stats(self):
+        """
+        Return the session counters.
+
+        Returns:
+            dict: Started, completed, abandoned and active session counts plus memory in bytes.
+        """
+        return dict(self.counters, active=len(self), memory_bytes=self.memory_usage())
@@ -0,0 +1,159 @@
+import os
+import time
+from collections import deque
+from discord.ext import commands
+
+
+def shard_settings():
+    """
+    Read the sharding settings from the environment.
+
+    SHARDING=auto lets Discord pick the number of shards. SHARD_COUNT sets
+    it explicitly and SHARD_IDS ("0,1" or "0-3") limits this process to some
+    of them.
+
+    Returns:
+        dict: Keyword arguments for AutoShardedBot, None if sharding is off.
+
+    Raises:
+        ValueError: If the settings are invalid.
+    """
+    sharding = os.getenv("SHARDING", "").strip().lower()
+    count = os.getenv("SHARD_COUNT", "").strip()
+    ids = os.getenv("SHARD_IDS", "").strip()
+    if sharding not in ("", "auto", "off") or (sharding == "off" and (count or ids)):
+        raise ValueError("SHARDING must be 'auto' or 'off' without shard settings")
+    if sharding != "auto" and not count and not ids:
+        return None
+    settings = {}
+    if count:
+        settings["shard_count"] = int(count)
+    if ids:
+        if not count:
+            raise ValueError("SHARD_IDS needs SHARD_COUNT")
+        settings["shard_ids"] = parse_shard_ids(ids)
+    return settings
+
+
+def parse_shard_ids(text):
+    """
+    Parse a list of shard IDs like "0,1,4-7".
+
+    Args:
+        text (str): Comma separated shard IDs and ranges.
+
+    Returns:
+        list: The shard IDs, sorted.
+    """
+    shard_ids = set()
+    for part in text.split(","):
+        first, _, last = part.strip().partition("-")
+        shard_ids.update(range(int(first), int(last or first) + 1))
+    return sorted(shard_ids)
+
+
+class ShardStats:
+    """Event counts of one shard."""
+
+    __slots__ = ("events", "recent")
+
+    def __init__(self, window=60):
+        """
+        Initialize the ShardStats.
+
+        Args:
+            window (int): Seconds the event rate is averaged over.
+        """
+        self.events = 0
+        self.recent = deque(maxlen=window)  # [second, events] per second
+
+    def add(self, now):
+        """Count one event at the given time."""
+        self.events += 1
+        second = int(now)
+        if self.recent and self.recent[-1][0] == second:
+            self.recent[-1][1] += 1
+        else:
+            self.recent.append([second, 1])
+
+    def rate(self, now):
+        """
+        Get the events per second over the window.
+
+        Args:
+            now (float): The current time.
+
+        Returns:
+            float: The average rate.
+        """
+        window = self.recent.maxlen
+        events = sum(count for second, count in self.recent if second > now - window)
+        return events / window
+
+
+class ShardMetrics:
+    """
+    Per-shard latency, event rate and guild count.
+
+    Events are counted through the guild they belong to, events without a
+    guild count towards shard 0 like Discord routes them.
+    """
+
+    def __init__(self, bot):
+        """
+        Initialize the ShardMetrics.
+
+        Args:
+            bot (commands.Bot): The bot, sharded or not.
+        """
+        self.bot = bot
+        self.stats = {}  # shard_id -> ShardStats
+
+    def record(self, guild):
+        """
+        Count one event.
+
+        Args:
+            guild (discord.Guild): The guild the event belongs to, or None.
+        """
+        shard_id = guild.shard_id if guild is not None else 0
+        stats = self.stats.get(shard_id)
+        if stats is None:
+            stats = self.stats[shard_id] = ShardStats()
+        stats.add(time.time())
+
+    def latencies(self):
+        """
+        Get the heartbeat latency of every shard of this process.
+
+        Returns:
+            list: Tuples of shard ID and latency in seconds.
+        """
+        if isinstance(self.bot, commands.AutoShardedBot):
+            return self.bot.latencies
+        return [(0, self.bot.latency)]
+
+    def report(self):
+        """
+        Build a table of every shard of this process.
+
+        Returns:
+            list: Rows of shard ID, guilds, latency in milliseconds, events and events per second.
+        """
+        guilds = {}
+        for guild in self.bot.guilds:
+            guilds[guild.shard_id] = guilds.get(guild.shard_id, 0) + 1
+        now = time.time()
+        rows = []
+        for shard_id, latency in self.latencies():
+            stats = self.stats.get(shard_id)
+            rows.append(
+                [
+                    shard_id,
+                    guilds.get(shard_id, 0),
+                    round(latency * 1000) if latency == latency else None,  # NaN before the first heartbeat
+                    stats.events if stats else 0,
+                    round(stats.rate(now), 2) if stats else 0.0,
+                ]
+            )
+        return rows
@@ -0,0 +1,190 @@
+import os
+from collections import OrderedDict
+from functools import lru_cache
+from services.io_stats import stat
+from services.character_log import character_log
+
+
+# Headers of the stats table
+HEADERS = ("Attribute", "Value", "Modifier")
+# Extra width tabulate reserves around every header
+MIN_PADDING = 2
+
+
+def format_modifier(modifier):
+    """
+    Format an ability score modifier for display.
+
+    Args:
+        modifier (int): The modifier.
+
+    Returns:
+        str: The modifier with a plus sign if it's positive.
+    """
+    return f"+{modifier}" if modifier >= 1 else str(modifier)
+
+
+def _is_int(value):
+    """Check if a cell holds an integer, the way tabulate detects numeric columns."""
+    try:
+        int(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _is_plain(value):
+    """Check if a cell is non-empty printable ASCII without surrounding whitespace."""
+    return (
+        value != ""
+        and value.isascii()
+        and value.isprintable()
+        and value == value.strip()
+    )
+
+
+def render_stats_table(rows):
+    """
+    Render the stats of a character as a grid table.
+
+    Produces exactly what `tabulate(rows, headers=HEADERS, tablefmt="grid")`
+    returns for a stats table, without importing tabulate. Rendered tables
+    are memoized by their content, so an unchanged character is rendered
+    once.
+
+    Args:
+        rows (list): Rows of attribute name, value and formatted modifier.
+
+    Returns:
+        str: The rendered table.
+    """
+    return _render(tuple(tuple(str(cell) for cell in row) for row in rows))
+
+
+@lru_cache(maxsize=4096)
+def _render(rows):
+    """Render a table of string cells, see `render_stats_table`."""
+    # Anything but the plain attribute/number/number layout goes to tabulate
+    if (
+        not rows
+        or any(len(row) != len(HEADERS) for row in rows)
+        or not all(_is_plain(cell) for row in rows for cell in row)
+    ):
+        return _tabulate(rows)
+    columns = list(zip(*rows))
+    numeric = [all(_is_int(cell) for cell in column) for column in columns]
+    if numeric != [False, True, True]:
+        return _tabulate(rows)
+
+    # Numeric columns are right aligned, text columns left aligned
+    widths = [
+        max(len(header) + MIN_PADDING, max(len(cell) for cell in column))
+        for header, column in zip(HEADERS, columns)
+    ]
+
+    def line(cells):
+        padded = [
+            cell.rjust(width) if is_numeric else cell.ljust(width)
+            for cell, width, is_numeric in zip(cells, widths, numeric)
+        ]
+        return "| " + " | ".join(padded) + " |"
+
+    separator = "+" + "+".join("-" * (width + 2) for width in widths) + "+"
+    header_separator = "+" + "+".join("=" * (width + 2) for width in widths) + "+"
+    lines = [separator, line(HEADERS), header_separator]
+    for row in rows:
+        lines.append(line(row))
+        lines.append(separator)
+    return "\n".join(lines)
+
+
+def _tabulate(rows):
+    """Fallback for tables the fixed renderer doesn't handle."""
+    from tabulate import tabulate
+
+    return tabulate(rows, headers=HEADERS, tablefmt="grid")
+
+
+def file_version(filepath):
+    """
+    Get the version of a savefile, which changes whenever the character changes.
+
+    Changes are appended to the server's event log before they reach the
+    savefile, so the version covers both.
+
+    Args:
+        filepath (str): The path of the savefile.
+
+    Returns:
+        tuple: The modification time in nanoseconds and the size of the file and of the log.
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist.
+    """
+    result = stat(filepath)
+    return (result.st_mtime_ns, result.st_size, character_log.version(os.path.dirname(filepath)))
+
+
+class StatsBlockCache:
+    """
+    Rendered stats blocks of savefiles, keyed by the version of the file.
+
+    A repeated /stats for an unchanged character costs two `os.stat` calls
+    instead of reading and parsing the file and rendering the table again.
+    """
+
+    def __init__(self, maxsize=1024):
+        """
+        Initialize the StatsBlockCache.
+
+        Args:
+            maxsize (int): Number of rendered blocks to keep.
+        """
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # (filepath, kind) -> (version, text)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, filepath, kind, build):
+        """
+        Get the rendered block of a savefile, building it if the file changed.
+
+        Args:
+            filepath (str): The path of the savefile.
+            kind (str): Which rendering of the file, e.g. "stats" or "lvl".
+            build (callable): Function taking the path and returning the rendered block.
+
+        Returns:
+            str: The rendered block.
+
+        Raises:
+            FileNotFoundError: If the file doesn't exist.
+        """
+        version = file_version(filepath)
+        key = (filepath, kind)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        text = build(filepath)
+        self._entries[key] = (version, text)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return text
+
+    def invalidate(self, filepath):
+        """
+        Drop every rendered block of a savefile after it has been written.
+
+        Args:
+            filepath (str): The path of the savefile.
+        """
+        for key in [key for key in self._entries if key[0] == filepath]:
+            del self._entries[key]
+
+
+# Shared cache used by the stats displays
+stats_blocks = StatsBlockCache()
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from services.io_stats import open_file
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# Name of the lock file guarding the files of a directory
+LOCK_NAME = ".lock"
+
+_held = {}  # (thread ID, lock path) -> [file, depth] for the locks this process holds
+
+
+def _acquire(file):
+    """Block until the lock on an open lock file is ours."""
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+    else:
+        file.seek(0)
+        # LK_LOCK retries for 10 seconds before giving up
+        while True:
+            try:
+                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+
+def _release(file):
+    """Release the lock on an open lock file."""
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+    else:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Hold the cross-process lock of the directory a file is in.
+
+    Every process of a cluster shares the savefiles, so a read-modify-write
+    of one has to hold this lock from the read to the write. The lock is
+    reentrant within a thread and also excludes the other threads of the
+    process. It blocks, so don't await while holding it.
+
+    Args:
+        path (str): The path of the file about to be read and written.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    lock_path = os.path.join(directory, LOCK_NAME)
+    key = (threading.get_ident(), lock_path)
+    held = _held.get(key)
+    if held is not None:
+        held[1] += 1
+        try:
+            yield
+        finally:
+            held[1] -= 1
+        return
+    file = open(lock_path, "a+")
+    try:
+        _acquire(file)
+        _held[key] = [file, 1]
+        try:
+            yield
+        finally:
+            del _held[key]
+            _release(file)
+    finally:
+        file.close()
+
+
+@contextmanager
+def atomic_write(path, newline="", mode="w"):
+    """
+    Write a file so other processes see either the old or the new content.
+
+    The content goes to a temporary file next to the target, which replaces
+    the target once it's complete. Holds the file's lock while writing.
+
+    Args:
+        path (str): The path of the file to write.
+        newline (str): Passed to `open`, "" for CSV files.
+        mode (str): Passed to `open`, "wb" to write bytes.
+
+    Yields:
+        file: The temporary file to write to.
+    """
+    with file_lock(path):
+        directory = os.path.dirname(path) or "."
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        try:
+            kwargs = {} if "b" in mode else {"newline": newline}
+            with open_file(fd, mode, **kwargs) as file:
+                yield file
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
@@ -0,0 +1,36 @@
+import asyncio
+import logging
+import os
+from discord.ext import commands
+
+
+logger = logging.getLogger(__name__)
+
+
+async def run_stub_gateway(bot):
+    """
+    Start a bot without connecting to Discord.
+
+    Runs the setup hook and dispatches the shard ready events the real gateway
+    would, then idles until the process is stopped. Lets the launcher be
+    tried out locally. STUB_CRASH_AFTER makes the bot exit with an error
+    after that many seconds, to exercise the launcher's restarts.
+
+    Args:
+        bot (commands.Bot): The bot to start.
+    """
+    crash_after = os.getenv("STUB_CRASH_AFTER")
+    async with bot:
+        # Logging in would run the setup hook, loading the extensions
+        await bot.setup_hook()
+        if isinstance(bot, commands.AutoShardedBot):
+            shard_ids = bot.shard_ids or list(range(bot.shard_count or 1))
+            for shard_id in shard_ids:
+                bot.dispatch("shard_ready", shard_id)
+        else:
+            shard_ids = [0]
+        logger.info("Stub gateway serving shards %s.", shard_ids)
+        if crash_after:
+            await asyncio.sleep(float(crash_after))
+            raise RuntimeError("Stub gateway crashed on purpose")
+        await asyncio.Event().wait()
@@ -0,0 +1,177 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import secrets
+import time
+import discord
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from services.log_config import gzip_rotator
+
+
+# Format version of the traffic log, written in its header line
+TRAFFIC_VERSION = 1
+
+# Arguments made of numbers and dice notation only are kept, anything else is hashed
+SAFE_ARGUMENT = re.compile(r"[\d\s+\-dx]*(unique)?", re.IGNORECASE)
+
+
+class TrafficRecorder:
+    """
+    Records a sanitized stream of commands and button clicks for replaying.
+
+    Every event is one JSON line: milliseconds since the recording started,
+    "c" for a command or "i" for a click, the command name or the button's
+    custom ID, the arguments, and hashes of the server and the user. Names
+    and other free text only appear as salted hashes, so the log can be
+    shared without the users' data but still tells apart different values.
+    Lines are written by a background thread to a file rotated like the logs.
+    """
+
+    def __init__(self, path, salt, max_bytes=50_000_000, backups=10):
+        """
+        Initialize the TrafficRecorder.
+
+        Args:
+            path (str): The traffic log, rotated files get .1.gz, .2.gz and so on.
+            salt (str): Salt of the hashes, a random one makes them irreversible.
+            max_bytes (int): Size after which the file is rotated.
+            backups (int): Number of rotated files kept.
+        """
+        self.path = path
+        self.salt = salt.encode()
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.events = 0
+        self._started = time.monotonic()
+        self._logger = logging.getLogger("dicebot.traffic")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._listener = None
+
+    @classmethod
+    def from_env(cls):
+        """
+        Create the recorder from the environment.
+
+        TRAFFIC_LOG sets the file and turns recording on. TRAFFIC_SALT fixes
+        the salt, so hashes of several processes or days match.
+
+        Returns:
+            TrafficRecorder: The recorder, or None if recording is off.
+        """
+        path = os.getenv("TRAFFIC_LOG")
+        if not path:
+            return None
+        cluster_id = os.getenv("CLUSTER_ID")
+        if cluster_id is not None:
+            root, extension = os.path.splitext(path)
+            path = f"{root}-{cluster_id}{extension}"
+        return cls(path, os.getenv("TRAFFIC_SALT") or secrets.token_hex(16))
+
+    def start(self):
+        """Open the file and start the writer thread."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        handler = RotatingFileHandler(
+            self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8"
+        )
+        handler.namer = lambda name: f"{name}.gz"
+        handler.rotator = gzip_rotator
+        records = queue.SimpleQueue()
+        self._logger.addHandler(QueueHandler(records))
+        self._listener = QueueListener(records, handler)
+        self._listener.start()
+        self._started = time.monotonic()
+        self._write({"version": TRAFFIC_VERSION, "started": time.time()})
+
+    def stop(self):
+        """Write out the queued events and stop the writer thread."""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+            for handler in self._logger.handlers[:]:
+                self._logger.removeHandler(handler)
+
+    def hash(self, value):
+        """
+        Hash a value with the salt.
+
+        Returns:
+            str: 12 hex digits, or None for None.
+        """
+        if value is None:
+            return None
+        return hashlib.blake2b(str(value).encode(), key=self.salt[:64], digest_size=6).hexdigest()
+
+    def sanitize(self, value):
+        """Keep numbers and dice notation, replace anything else by its hash."""
+        if isinstance(value, bool) or value is None:
+            return value
+        if isinstance(value, (int, float)):
+            return value
+        if isinstance(value, str) and SAFE_ARGUMENT.fullmatch(value):
+            return value
+        if isinstance(value, str):
+            return "#" + self.hash(value.lower())
+        return "?"
+
+    def _write(self, event):
+        self._logger.info(json.dumps(event, separators=(",", ":")))
+
+    def _record(self, kind, name, args, guild, user):
+        self.events += 1
+        self._write(
+            [
+                round((time.monotonic() - self._started) * 1000),
+                kind,
+                name,
+                args,
+                self.hash(guild.id if guild else None),
+                self.hash(user.id if user else None),
+            ]
+        )
+
+    async def before_invoke(self, ctx):
+        """Command hook recording the command and its arguments by parameter name."""
+        params = list(ctx.command.clean_params)
+        # Prefix commands pass positional arguments after the cog and the context
+        positional = ctx.args[2:] if ctx.command.cog is not None else ctx.args[1:]
+        values = dict(zip(params, positional))
+        values.update(ctx.kwargs)
+        args = {name: self.sanitize(values[name]) for name in params if name in values}
+        self._record("c", ctx.command.qualified_name, args, ctx.guild, ctx.author)
+
+    def record_interaction(self, interaction):
+        """
+        Record a button click, slash commands are recorded by the command hook.
+
+        The custom IDs are the bot's own, so they are kept as they are.
+        """
+        if interaction.type is discord.InteractionType.component and interaction.data:
+            custom_id = interaction.data.get("custom_id")
+            self._record("i", custom_id, None, interaction.guild, interaction.user)
+
+
+def read_traffic(path):
+    """
+    Read a traffic log, plain or gzipped.
+
+    Args:
+        path (str): The file to read.
+
+    Returns:
+        list: The events, oldest first, without the header lines.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    events = []
+    with opener(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                event = json.loads(line)
+                if isinstance(event, list):
+                    events.append(event)
+    return events
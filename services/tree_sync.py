@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+import os
+import discord
+from services.storage import atomic_write, file_lock
+
+
+logger = logging.getLogger(__name__)
+
+# File holding the hash of the last synced command tree of every scope
+TREE_HASHES_FILE = os.path.join("resources", "command_tree.json")
+
+
+def sync_guilds():
+    """
+    Read the guilds to sync to from the environment.
+
+    SYNC_GUILDS ("123,456") syncs the commands to those guilds only, where
+    changes show up right away, instead of globally. Meant for testing.
+
+    Returns:
+        list: The guild IDs, empty to sync globally.
+    """
+    return [
+        int(guild_id)
+        for guild_id in os.getenv("SYNC_GUILDS", "").split(",")
+        if guild_id.strip()
+    ]
+
+
+def scope_key(guild_id):
+    """Get the key a scope's hash is stored under."""
+    return "global" if guild_id is None else f"guild:{guild_id}"
+
+
+def tree_hash(tree, guild=None):
+    """
+    Hash the commands of a scope the way Discord receives them.
+
+    Covers names, descriptions, options, choices and permissions, anything
+    that changes the payload of a sync.
+
+    Args:
+        tree (discord.app_commands.CommandTree): The command tree.
+        guild (discord.abc.Snowflake): The guild scope, None for the global commands.
+
+    Returns:
+        str: The hex digest of the scope's commands.
+    """
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands(guild=guild)),
+        key=lambda command: (command.get("type", 1), command["name"]),
+    )
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    ).hexdigest()
+
+
+class TreeSync:
+    """
+    Syncs the command tree only when it changed since the last sync.
+
+    The hash of every synced scope is kept in a file, so restarts and
+    deploys without command changes don't spend the rate limited sync. The
+    processes of a cluster share the file: the first one stores the new
+    hash before syncing, so the others find it and skip.
+    """
+
+    def __init__(self, path=TREE_HASHES_FILE):
+        """
+        Initialize the TreeSync.
+
+        Args:
+            path (str): The JSON file the hashes are persisted in.
+        """
+        self.path = path
+        self.counters = {"synced": 0, "skipped": 0}
+
+    def _load(self):
+        """Read the stored hashes, empty if there are none."""
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning("Couldn't read %s, syncing everything: %s", self.path, e)
+            return {}
+
+    def _store(self, key, digest, expected=None):
+        """
+        Store the hash of a scope.
+
+        Args:
+            key (str): The key of the scope.
+            digest (str): The hash to store, None to remove it.
+            expected (str): Only store if this is the stored hash, None to always store.
+
+        Returns:
+            str: The hash stored before.
+        """
+        with file_lock(self.path):
+            # Read again, another process may have stored a scope meanwhile
+            hashes = self._load()
+            previous = hashes.get(key)
+            if expected is not None and previous != expected:
+                return previous
+            if digest is None:
+                hashes.pop(key, None)
+            else:
+                hashes[key] = digest
+            with atomic_write(self.path, newline=None) as file:
+                json.dump(hashes, file, indent=2)
+        return previous
+
+    async def sync(self, tree, guild_id=None, force=False):
+        """
+        Sync a scope of the command tree if its commands changed.
+
+        Args:
+            tree (discord.app_commands.CommandTree): The command tree.
+            guild_id (int): The guild to sync to, None for the global commands.
+            force (bool): Sync even if the hash didn't change.
+
+        Returns:
+            bool: True if the scope was synced, False if it was up to date.
+        """
+        guild = None if guild_id is None else discord.Object(id=guild_id)
+        if guild is not None:
+            tree.copy_global_to(guild=guild)
+        digest = tree_hash(tree, guild)
+        key = scope_key(guild_id)
+        with file_lock(self.path):
+            if not force and self._load().get(key) == digest:
+                self.counters["skipped"] += 1
+                logger.info("Command tree of %s unchanged, not syncing", key)
+                return False
+            # Claim the sync before letting go of the lock, the other processes skip it
+            previous = self._store(key, digest)
+        try:
+            await tree.sync(guild=guild)
+        except BaseException:
+            # Give the sync back so the next start tries again
+            self._store(key, previous, expected=digest)
+            raise
+        self.counters["synced"] += 1
+        logger.info("Synced command tree of %s", key)
+        return True
+
+    async def sync_all(self, tree, force=False):
+        """
+        Sync every configured scope whose commands changed.
+
+        Args:
+            tree (discord.app_commands.CommandTree): The command tree.
+            force (bool): Sync even if the hashes didn't change.
+
+        Returns:
+            list: The keys of the scopes that were synced.
+        """
+        guild_ids = sync_guilds() or [None]
+        synced = []
+        for guild_id in guild_ids:
+            if await self.sync(tree, guild_id, force):
+                synced.append(scope_key(guild_id))
+        return synced
+
+
+# Shared syncer used at startup and by the sync command
+tree_sync = TreeSync()
@@ -0,0 +1,285 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds between two checks of a worker whether its bot process is still there
+PARENT_CHECK_INTERVAL = 1.0
+
+
+def _exit_with_parent(parent_pid):
+    """Exit a worker once the bot process that started it is gone, e.g. killed by the launcher."""
+    while os.getppid() == parent_pid:
+        time.sleep(PARENT_CHECK_INTERVAL)
+    os._exit(1)
+
+
+def _watch_parent(parent_pid):
+    """Initializer of the workers, watches the bot process from a daemon thread."""
+    threading.Thread(
+        target=_exit_with_parent, args=(parent_pid,), name="parent-watch", daemon=True
+    ).start()
+
+
+class JobRejected(Exception):
+    """Raised when a job is too expensive or the queue is full."""
+
+
+class _Job:
+    """A job waiting for a worker."""
+
+    __slots__ = ("func", "args", "cost", "future", "enqueued_at")
+
+    def __init__(self, func, args, cost, future):
+        self.func = func
+        self.args = args
+        self.cost = cost
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class WorkerPool:
+    """
+    Process pool for commands doing real computation.
+
+    Every job comes with an estimate of its cost. Jobs too cheap to be worth
+    sending to another process run inline, jobs over the budget are
+    rejected, and a job can offer cheaper alternatives that are used
+    instead (a downgrade). Queued jobs are taken from the servers in turn,
+    so one busy server can't starve the others, and both the whole queue
+    and every server's share of it are bounded.
+    """
+
+    def __init__(
+        self,
+        workers=2,
+        max_queue=64,
+        max_per_guild=8,
+        budget=2_000_000,
+        inline_below=10_000,
+    ):
+        """
+        Initialize the WorkerPool.
+
+        Args:
+            workers (int): Number of worker processes.
+            max_queue (int): Most jobs waiting for a worker.
+            max_per_guild (int): Most jobs of one server waiting for a worker.
+            budget (int): Highest cost accepted for a job.
+            inline_below (int): Jobs cheaper than this run on the event loop.
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_per_guild = max_per_guild
+        self.budget = budget
+        self.inline_below = inline_below
+        self._executor = None  # Started on the first job that needs it
+        self._queues = OrderedDict()  # guild_id -> deque of _Job, in serving order
+        self._queued = 0
+        self._running = 0
+        self.waits = deque(maxlen=256)  # Seconds recent jobs waited for a worker
+        self.counters = {
+            "submitted": 0,
+            "inline": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "downgraded": 0,
+        }
+
+    @property
+    def executor(self):
+        """The process pool, created on first use."""
+        if self._executor is None:
+            # Spawned workers would import bot_main again, so fork where possible
+            method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+            self._executor = ProcessPoolExecutor(
+                self.workers,
+                mp_context=multiprocessing.get_context(method),
+                initializer=_watch_parent,
+                initargs=(os.getpid(),),
+            )
+        return self._executor
+
+    def start(self):
+        """
+        Start the worker processes right away.
+
+        Call before the bot connects, so the workers are forked before there
+        are gateway threads and a running event loop to copy.
+        """
+        self.executor.submit(int).result()
+
+    async def run(self, guild_id, *options):
+        """
+        Run a job, choosing the first option within the budget.
+
+        Args:
+            guild_id (int): The server the job is for, None for direct messages.
+            *options: Tuples of estimated cost, function and arguments, best first.
+                The functions need to be importable by the worker processes.
+
+        Returns:
+            The return value of the chosen function.
+
+        Raises:
+            JobRejected: If every option is over the budget or the queue is full.
+        """
+        for index, (cost, func, args) in enumerate(options):
+            if cost <= self.budget:
+                break
+        else:
+            self.counters["rejected"] += 1
+            raise JobRejected("That's too much work for one command, please ask for less.")
+        if index:
+            self.counters["downgraded"] += 1
+        self.counters["submitted"] += 1
+        if cost < self.inline_below:
+            self.counters["inline"] += 1
+            return func(*args)
+
+        queue = self._queues.get(guild_id)
+        if self._queued >= self.max_queue or (
+            queue is not None and len(queue) >= self.max_per_guild
+        ):
+            self.counters["rejected"] += 1
+            raise JobRejected("The bot is busy, please try again in a moment.")
+        job = _Job(func, args, cost, asyncio.get_running_loop().create_future())
+        if queue is None:
+            queue = self._queues[guild_id] = deque()
+        queue.append(job)
+        self._queued += 1
+        self._dispatch()
+        return await job.future
+
+    def _dispatch(self):
+        """Hand queued jobs to free workers, one server at a time."""
+        while self._running < self.workers and self._queues:
+            guild_id, queue = next(iter(self._queues.items()))
+            job = queue.popleft()
+            # The server moves to the back of the line
+            del self._queues[guild_id]
+            if queue:
+                self._queues[guild_id] = queue
+            self._queued -= 1
+            if job.future.done():
+                continue  # The command was cancelled while waiting
+            try:
+                submitted = self.executor.submit(job.func, *job.args)
+            except BrokenProcessPool as e:
+                # The next job goes to a new pool
+                self.counters["failed"] += 1
+                self._discard_executor(e)
+                job.future.set_exception(e)
+                continue
+            self._running += 1
+            self.waits.append(time.perf_counter() - job.enqueued_at)
+            future = asyncio.wrap_future(submitted)
+            future.add_done_callback(partial(self._finished, job))
+
+    def _discard_executor(self, error):
+        """Drop a pool that lost a worker, the next job starts a new one."""
+        if self._executor is None:
+            return
+        logger.error("A worker process died, restarting the pool: %s", error)
+        executor, self._executor = self._executor, None
+        # Its workers are already stopped by the executor itself
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _finished(self, job, future):
+        """Pass the result of a worker on to the waiting command."""
+        self._running -= 1
+        if future.cancelled():
+            job.future.cancel()
+        elif future.exception() is not None:
+            self.counters["failed"] += 1
+            logger.warning("Job %s failed: %s", job.func.__name__, future.exception())
+            if isinstance(future.exception(), BrokenProcessPool):
+                self._discard_executor(future.exception())
+            if not job.future.done():
+                job.future.set_exception(future.exception())
+        else:
+            self.counters["completed"] += 1
+            if not job.future.done():
+                job.future.set_result(future.result())
+        self._dispatch()
+
+    def stats(self):
+        """
+        Get the state of the pool.
+
+        Returns:
+            dict: Queue depth, running jobs, wait times in milliseconds and the counters.
+        """
+        waits = sorted(self.waits)
+
+        def percentile(fraction):
+            if not waits:
+                return 0
+            return round(waits[min(len(waits) - 1, int(fraction * len(waits)))] * 1000)
+
+        return {
+            "queued": self._queued,
+            "running": self._running,
+            "wait p50 ms": percentile(0.5),
+            "wait p95 ms": percentile(0.95),
+            **self.counters,
+        }
+
+    def collect_metrics(self):
+        """Metrics of the pool for the metrics endpoint."""
+        yield "dicebot_worker_jobs", "gauge", "Jobs waiting for or running in a worker.", [
+            ({"state": "queued"}, self._queued),
+            ({"state": "running"}, self._running),
+        ]
+        yield "dicebot_worker_jobs_total", "counter", "Jobs by outcome.", [
+            ({"outcome": outcome}, count) for outcome, count in self.counters.items()
+        ]
+
+    def shutdown(self, timeout=5.0):
+        """
+        Stop the worker processes, killing the ones still busy after `timeout` seconds.
+
+        Without the kill, a worker stuck in a job keeps the bot process from
+        exiting: multiprocessing joins its children when the interpreter
+        exits, and a crashed process would hang there instead of being
+        restarted by the launcher.
+
+        Args:
+            timeout (float): Seconds to wait for running jobs to finish.
+        """
+        if self._executor is None:
+            return
+        executor, self._executor = self._executor, None
+        # The executor forgets its processes once shut down, so take them first
+        processes = list((executor._processes or {}).values())
+        stopper = threading.Thread(
+            target=executor.shutdown,
+            kwargs={"wait": True, "cancel_futures": True},
+            name="worker-shutdown",
+            daemon=True,
+        )
+        stopper.start()
+        stopper.join(timeout)
+        stuck = [process for process in processes if process.is_alive()]
+        if stuck:
+            logger.warning("Terminating %s workers still busy after %ss.", len(stuck), timeout)
+        for process in stuck:
+            process.terminate()
+        for process in stuck:
+            process.join(1)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        # With its workers gone the executor's manager thread finishes too
+        stopper.join(1)
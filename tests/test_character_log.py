@@ -0,0 +1,158 @@
+import asyncio
+import os
+import pytest
+from services.character_index import SAVE_SUFFIX
+from services.character_log import (
+    CREATED,
+    DELETED,
+    EVENTS_NAME,
+    LEVELED,
+    STATS_INCREASED,
+    CharacterLog,
+    history_path,
+    read_archive,
+    read_snapshot,
+)
+
+
+def make_rows(creator_id="1"):
+    return [
+        {"Attribute": "Strength", "Value": "10", "Modifier": "0", "Class": "Wizard", "Level": "1", "Health": "8", "CreatorID": creator_id},
+        {"Attribute": "Dexterity", "Value": "14", "Modifier": "2", "Class": "", "Level": "", "Health": "8", "CreatorID": creator_id},
+    ]
+
+
+def level(log, filepath, user_id, old, new, health):
+    before = {"Level": str(old), "Health": log.load(filepath)[0]["Health"]}
+    log.append(filepath, LEVELED, user_id, before=before, after={"Level": str(new), "Health": str(health)})
+
+
+def allow_all(creator_id):
+    return True
+
+
+@pytest.fixture
+def log():
+    return CharacterLog(compact_after=1000)
+
+
+@pytest.fixture
+def filepath(tmp_path):
+    return os.path.join(tmp_path, f"Bob{SAVE_SUFFIX}")
+
+
+def test_create_level_stats_delete_and_undo(log, filepath):
+    log.append(filepath, CREATED, 1, rows=make_rows())
+    level(log, filepath, 1, 1, 3, 20)
+    log.append(filepath, STATS_INCREASED, 1, before={"Strength": ["10", "0"]}, after={"Strength": ["12", "1"]})
+    rows = log.load(filepath)
+    assert (rows[0]["Level"], rows[0]["Health"], rows[1]["Health"]) == ("3", "20", "20")
+    assert (rows[0]["Value"], rows[0]["Modifier"]) == ("12", "1")
+
+    log.append(filepath, DELETED, 1, rows=rows)
+    assert not os.path.exists(filepath)
+    with pytest.raises(FileNotFoundError):
+        log.load(filepath)
+
+    # Undoing the deletion brings the character back as it was
+    _, event = log.undo(filepath, 1, allow_all)
+    assert event["kind"] == CREATED
+    assert log.load(filepath) == rows
+    assert read_snapshot(filepath) == rows
+
+    # Then the attribute points and the level up are reverted in turn
+    log.undo(filepath, 1, allow_all)
+    assert log.load(filepath)[0]["Value"] == "10"
+    log.undo(filepath, 1, allow_all)
+    assert (log.load(filepath)[0]["Level"], log.load(filepath)[0]["Health"]) == ("1", "8")
+    target, _ = log.undo(filepath, 1, allow_all)
+    assert target["type"] == CREATED
+    assert not os.path.exists(filepath)
+    assert log.undo(filepath, 1, allow_all) is None
+
+
+def test_compaction_keeps_the_state(log, filepath):
+    log.append(filepath, CREATED, 1, rows=make_rows())
+    for old in range(1, 6):
+        level(log, filepath, 1, old, old + 1, 8 * (old + 1))
+    before = log.load(filepath)
+    history = log.history(filepath)
+
+    assert log.compact(os.path.dirname(filepath)) == 6
+    assert log.tail(os.path.dirname(filepath)) == []
+    assert read_snapshot(filepath) == before
+    assert log.load(filepath) == before
+    assert log.history(filepath) == history
+    # Undo reaches into the archive
+    log.undo(filepath, 1, allow_all)
+    assert log.load(filepath)[0]["Level"] == "5"
+
+
+def test_interrupted_compaction_can_be_repeated(log, filepath):
+    directory = os.path.dirname(filepath)
+    log.append(filepath, CREATED, 1, rows=make_rows())
+    level(log, filepath, 1, 1, 2, 14)
+    with open(os.path.join(directory, EVENTS_NAME)) as file:
+        lines = file.read()
+    log.compact(directory)
+    snapshot = read_snapshot(filepath)
+    archive = read_archive(history_path(directory, "Bob"))
+
+    # A crash before emptying the log leaves its events in place
+    with open(os.path.join(directory, EVENTS_NAME), "w") as file:
+        file.write(lines)
+    log.compact(directory)
+    assert read_snapshot(filepath) == snapshot
+    assert read_archive(history_path(directory, "Bob")) == archive
+    assert log.load(filepath) == snapshot
+
+
+def test_undo_stops_at_a_recreated_character(log, filepath):
+    log.append(filepath, CREATED, 1, rows=make_rows("1"))
+    level(log, filepath, 1, 1, 2, 14)
+    log.append(filepath, DELETED, 1, rows=log.load(filepath))
+    log.append(filepath, CREATED, 2, rows=make_rows("2"))
+
+    # The permission check sees the creator of the new character
+    with pytest.raises(PermissionError):
+        log.undo(filepath, 1, lambda creator_id: creator_id == "1")
+    assert log.load(filepath) == make_rows("2")
+
+    target, _ = log.undo(filepath, 2, lambda creator_id: creator_id == "2")
+    assert target["user"] == "2"
+    assert not os.path.exists(filepath)
+    # The old character's changes aren't reachable anymore
+    assert log.undo(filepath, 2, allow_all) is None
+
+
+def test_history_keeps_the_latest_events(tmp_path, filepath):
+    log = CharacterLog(compact_after=1000, history_keep=5)
+    directory = os.path.dirname(filepath)
+    log.append(filepath, CREATED, 1, rows=make_rows())
+    for old in range(1, 10):
+        level(log, filepath, 1, old, old + 1, 8 * (old + 1))
+        log.compact(directory)
+    history = log.history(filepath)
+    assert len(history) == 5
+    assert history[-1]["after"]["Level"] == "10"
+    # Undo still works within what is kept
+    log.undo(filepath, 1, allow_all)
+    assert log.load(filepath)[0]["Level"] == "9"
+
+
+def test_compaction_runs_off_the_event_loop(filepath):
+    log = CharacterLog(compact_after=3)
+    directory = os.path.dirname(filepath)
+
+    async def append():
+        log.append(filepath, CREATED, 1, rows=make_rows())
+        for old in range(1, 4):
+            level(log, filepath, 1, old, old + 1, 8 * (old + 1))
+        task = log._compacting[directory]
+        await task
+        assert not log._compacting
+
+    asyncio.run(append())
+    assert log.tail(directory) == []
+    assert read_snapshot(filepath)[0]["Level"] == "4"
+    assert len(log.history(filepath)) == 4
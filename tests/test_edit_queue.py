@@ -0,0 +1,59 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+import discord
+from services.edit_queue import EditQueue, RateLimitBuckets
+
+
+def interaction_message(channel_id, interaction_id):
+    message = discord.InteractionMessage.__new__(discord.InteractionMessage)
+    message.channel = SimpleNamespace(id=channel_id)
+    message.interaction_metadata = SimpleNamespace(id=interaction_id)
+    return message
+
+
+class BrokenMessage:
+    id = 1
+    channel = SimpleNamespace(id=2)
+
+    async def edit(self, **fields):
+        raise ValueError("broken")
+
+
+def test_interaction_edits_get_a_bucket_per_interaction():
+    first, second = interaction_message(5, 100), interaction_message(5, 101)
+    assert RateLimitBuckets.route(first) == ("webhook", 100)
+    assert RateLimitBuckets.route(first) != RateLimitBuckets.route(second)
+    assert RateLimitBuckets.route(SimpleNamespace(channel=SimpleNamespace(id=5))) == ("channel", 5)
+
+
+def test_failed_edits_are_logged_and_forgotten(caplog):
+    queue = EditQueue(window=0)
+
+    async def edit():
+        await queue.edit(BrokenMessage(), content="hi")
+        await queue.flush()
+
+    with caplog.at_level(logging.ERROR, logger="services.edit_queue"):
+        asyncio.run(edit())
+    assert "Editing message 1 failed." in caplog.text
+    assert not queue._pending
+
+
+def test_idle_buckets_are_dropped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("services.edit_queue.time.monotonic", lambda: now[0])
+    buckets = RateLimitBuckets()
+    used = buckets.get(("webhook", 1))
+    used.tokens = 0
+    buckets.get(("webhook", 2))
+    assert len(buckets) == 2
+
+    # A second later only the used bucket is still refilling
+    now[0] += 1
+    buckets.sweep(now[0])
+    assert list(buckets._buckets) == [("webhook", 1)]
+    # The next sweep finds it full again too
+    now[0] += RateLimitBuckets.SWEEP_INTERVAL
+    buckets.get(("channel", 3))
+    assert list(buckets._buckets) == [("channel", 3)]
@@ -0,0 +1,43 @@
+import asyncio
+import json
+import pytest
+from services.tree_sync import TreeSync
+
+
+class FakeTree:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.syncs = 0
+
+    def get_commands(self, guild=None):
+        return []
+
+    async def sync(self, guild=None):
+        self.syncs += 1
+        await asyncio.sleep(0.05)
+        if self.fail:
+            raise RuntimeError("sync failed")
+
+
+def test_only_one_process_syncs(tmp_path):
+    path = str(tmp_path / "command_tree.json")
+    tree = FakeTree()
+
+    async def start_cluster():
+        # Every process has its own syncer on the shared file
+        return await asyncio.gather(*(TreeSync(path).sync(tree) for _ in range(3)))
+
+    assert sorted(asyncio.run(start_cluster())) == [False, False, True]
+    assert tree.syncs == 1
+    assert asyncio.run(TreeSync(path).sync(tree)) is False
+
+
+def test_failed_sync_is_retried(tmp_path):
+    path = str(tmp_path / "command_tree.json")
+    with pytest.raises(RuntimeError):
+        asyncio.run(TreeSync(path).sync(FakeTree(fail=True)))
+    with open(path) as file:
+        assert json.load(file) == {}
+    tree = FakeTree()
+    assert asyncio.run(TreeSync(path).sync(tree)) is True
+    assert tree.syncs == 1
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from services.workers import WorkerPool
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def slow(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def die():
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def test_pool_recovers_from_a_killed_worker():
+    pool = WorkerPool(workers=1, inline_below=0)
+
+    async def run():
+        killed = asyncio.ensure_future(pool.run(None, (10**6, die, ())))
+        queued = asyncio.ensure_future(pool.run(None, (10**6, slow, (0,))))
+        with pytest.raises(BrokenProcessPool):
+            await asyncio.wait_for(killed, 10)
+        # The queued job runs on a new pool instead of waiting forever
+        assert await asyncio.wait_for(queued, 10) == 0
+        assert await asyncio.wait_for(pool.run(None, (10**6, slow, (0,))), 10) == 0
+
+    try:
+        asyncio.run(run())
+        assert pool.stats()["running"] == 0
+        assert pool.stats()["queued"] == 0
+    finally:
+        pool.shutdown(timeout=0.5)
+
+
+def test_shutdown_kills_busy_workers():
+    pool = WorkerPool(workers=2, inline_below=0)
+    pool.start()
+    processes = list(pool.executor._processes.values())
+
+    async def busy():
+        job = asyncio.ensure_future(pool.run(None, (10**6, slow, (60,))))
+        await asyncio.sleep(0.2)
+        job.cancel()
+
+    asyncio.run(busy())
+    started = time.monotonic()
+    pool.shutdown(timeout=0.5)
+    assert time.monotonic() - started < 5
+    assert not any(process.is_alive() for process in processes)
+
+
+def test_process_exits_after_crash_with_busy_worker():
+    script = textwrap.dedent(
+        """
+        import asyncio
+        from services.workers import WorkerPool
+        from tests.test_workers import slow
+
+        pool = WorkerPool(workers=2, inline_below=0)
+        pool.start()
+
+        async def crash():
+            asyncio.ensure_future(pool.run(None, (10**6, slow, (60,))))
+            await asyncio.sleep(0.2)
+            raise RuntimeError("crash")
+
+        try:
+            asyncio.run(crash())
+        finally:
+            pool.shutdown(timeout=0.5)
+        """
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, timeout=30
+    )
+    assert result.returncode == 1
+    assert "RuntimeError: crash" in result.stderr
+
+
+def test_workers_exit_when_the_bot_process_is_killed():
+    script = textwrap.dedent(
+        """
+        import time
+        from services.workers import WorkerPool
+
+        pool = WorkerPool(workers=2, inline_below=0)
+        pool.start()
+        print(" ".join(str(pid) for pid in pool.executor._processes), flush=True)
+        time.sleep(60)
+        """
+    )
+    bot = subprocess.Popen(
+        [sys.executable, "-c", script], cwd=ROOT, stdout=subprocess.PIPE, text=True
+    )
+    workers = [int(pid) for pid in bot.stdout.readline().split()]
+    assert workers
+    bot.kill()
+    bot.wait()
+    deadline = time.monotonic() + 10
+    while workers and time.monotonic() < deadline:
+        workers = [pid for pid in workers if _alive(pid)]
+        time.sleep(0.1)
+    assert not workers
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True